@@ -1,5 +1,6 @@
 version_info = (0, 3, 3)
 __version__ = ".".join(map(str, version_info))
 
+from .geojsfeature import vectorized
 from .scene import Scene
 from .types import LayerType, FeatureType
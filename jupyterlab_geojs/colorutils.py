@@ -0,0 +1,94 @@
+'''
+Bulk color conversion functions, which require numpy
+'''
+import pkg_resources
+
+try:
+    pkg_resources.get_distribution('numpy')
+except pkg_resources.DistributionNotFound:
+    HAS_NUMPY = False
+else:
+    HAS_NUMPY = True
+    import numpy as np
+
+
+def is_numpy_loaded():
+    return HAS_NUMPY
+
+
+def colors_to_rgba(colors):
+    '''Converts array of colors to (N,4) array of RGBA bytes (numpy uint8)
+
+    @param colors: (N,3) or (N,4) array or list of color tuples.
+    Color components are either doubles (0-1) or bytes (0-255), which is
+    determined from the first color, same as GeoJSFeature._format_colors().
+    Alpha values are either a fraction (<= 1) or byte value; default is opaque.
+    Returns None if the input format is not understood.
+    '''
+    if not is_numpy_loaded():
+        raise Exception('Cannot convert colors because numpy not loaded')
+
+    try:
+        colors = np.asarray(colors, dtype=np.float64)
+    except (TypeError, ValueError):
+        colors = _pad_colors(colors)
+        if colors is None:
+            return None
+    if colors.ndim != 2 or colors.shape[0] == 0 or colors.shape[1] not in [3, 4]:
+        return None
+
+    # Use first item as exemplar
+    max0 = colors[0,:3].max()
+    if max0 <= 1:
+        scale = 255.0
+    elif max0 <= 255:
+        scale = 1.0
+    else:
+        return None  # dont understand format
+
+    rgba = np.empty((colors.shape[0], 4), dtype=np.uint8)
+    rgba[:,:3] = np.clip(scale * colors[:,:3], 0, 255)
+    if colors.shape[1] == 4:
+        alpha = colors[:,3]
+        rgba[:,3] = np.clip(np.where(alpha <= 1, 255.0 * alpha, alpha), 0, 255)
+    else:
+        rgba[:,3] = 255
+    return rgba
+
+
+def _pad_colors(colors):
+    '''Converts list mixing RGB and RGBA tuples to (N,4) array
+
+    Returns None if input cannot be converted.
+    '''
+    try:
+        padded = [tuple(c) + (1.0,) * (4 - len(c)) for c in colors]
+        return np.asarray(padded, dtype=np.float64)
+    except (TypeError, ValueError):
+        return None
+
+
+# Lookup table of ascii hex digits
+_HexDigits = None
+
+def colors_to_hex(colors):
+    '''Converts array of colors to list of hex strings ('#rrggbb')
+
+    Input is the same as colors_to_rgba(); alpha values are ignored.
+    Returns None if the input format is not understood.
+    '''
+    global _HexDigits
+    rgba = colors_to_rgba(colors)
+    if rgba is None:
+        return None
+    if _HexDigits is None:
+        _HexDigits = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+
+    # Build (N,7) array of ascii codes, then view each row as one string
+    n = rgba.shape[0]
+    chars = np.empty((n, 7), dtype=np.uint8)
+    chars[:,0] = ord('#')
+    chars[:,1::2] = _HexDigits[rgba[:,:3] >> 4]
+    chars[:,2::2] = _HexDigits[rgba[:,:3] & 0x0f]
+    hex_strings = chars.view('S7').ravel()
+    return hex_strings.astype('U7').tolist()
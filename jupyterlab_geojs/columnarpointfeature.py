@@ -0,0 +1,172 @@
+from .geojsfeature import GeoJSFeature, is_vectorized
+from .typedarray import encode_typed_array
+
+
+def is_table(data):
+    '''Returns boolean indicating whether data is a pandas DataFrame or Arrow Table
+
+    Uses duck typing, so that neither package needs to be installed
+    '''
+    is_arrow = hasattr(data, 'column_names') and hasattr(data, 'column')
+    is_pandas = hasattr(data, 'columns') and hasattr(data, 'iloc')
+    return is_arrow or is_pandas
+
+
+def is_missing(value):
+    '''Returns boolean indicating whether value is None, NaN, or pandas NA/NaT
+
+    Uses the type name for pandas values, so that pandas need not be installed
+    '''
+    if value is None or type(value).__name__ in ('NAType', 'NaTType'):
+        return True
+    return isinstance(value, float) and value != value
+
+
+def table_to_columns(data):
+    '''Returns dictionary of <column name, numpy array> for input table
+
+    Columns are extracted without converting rows to python objects;
+    numeric columns are typically zero-copy views of the table data.
+    '''
+    if hasattr(data, 'column_names'):
+        # Arrow Table
+        return {name: data.column(name).to_numpy() for name in data.column_names}
+    # pandas DataFrame
+    return {str(name): data[name].to_numpy() for name in data.columns}
+
+
+class ColumnarPointFeature(GeoJSFeature):
+    '''Point feature with data stored as columns (struct-of-arrays)
+
+    @param data dictionary of <column name, sequence or numpy array>,
+                pandas DataFrame, or Arrow Table
+
+    The index of each point is implicit from its position in the columns,
+    so the input data is neither modified nor copied into per-point
+    dictionaries. Vectorized position and style functions are passed the
+    dictionary of columns; other functions are passed one row at a time
+    (as a temporary dictionary).
+
+    Position and style values can also reference columns by name, which
+    sends the column data only once and is resolved by the client:
+      position={'x': 'lon', 'y': 'lat'}
+      style={'radius': {'column': 'size'}}
+
+    Columns are sent as JSON lists by default, which creates a python
+    object for each value. For large data, set typedArrays=True to send
+    numeric columns as (float32) typed arrays instead. Missing values
+    (None, NaN, pandas NA) in list columns are sent as null.
+    '''
+    def __init__(self, data, **kwargs):
+        if is_table(data):
+            data = table_to_columns(data)
+        if not isinstance(data, dict):
+            raise Exception('Input data is not a dictionary of columns: {}'.format(data))
+
+        # Check that all columns are the same length
+        lengths = set(len(column) for column in data.values())
+        if len(lengths) > 1:
+            raise Exception('Columns have different lengths: {}'.format(
+                {name: len(column) for name,column in data.items()}))
+
+        super(ColumnarPointFeature, self).__init__('point', data=data, **kwargs)
+        self._point_count = lengths.pop() if lengths else 0
+        self._column_names = list(data.keys())
+
+    def get_point_count(self):
+        '''Returns number of points
+
+        '''
+        return self._point_count
+
+    def _build_display_model(self):
+        '''Builds point feature with options.data as dictionary of columns'''
+        display_model = super(ColumnarPointFeature, self)._build_display_model()
+        options = display_model['options']
+
+        # Check column references
+        position = options.get('position')
+        if isinstance(position, dict):
+            self._check_column_names([position.get('x'), position.get('y')])
+        for val in options.get('style', {}).values():
+            if isinstance(val, dict) and 'column' in val:
+                self._check_column_names([val['column']])
+
+        typed_arrays = self.typedArrays
+        columns = dict()
+        for name,column in options.get('data', {}).items():
+            columns[name] = self._encode_column(column, typed_arrays)
+        options['data'] = columns
+
+        return display_model
+
+    def _get_item_bounds(self):
+        '''Returns list of (point) bounding boxes, one for each row
+
+        '''
+        data = self._options.get('data')
+        position = getattr(self, 'position', None)
+        if isinstance(position, dict):
+            self._check_column_names([position.get('x'), position.get('y')])
+            coords = zip(data[position['x']], data[position['y']])
+        elif callable(position):
+            coords = self._evaluate(position, data)
+        else:
+            raise Exception('Spatial index requires position columns or function')
+        return self._position_bounds(coords)
+
+    def _cull_data(self, data):
+        '''Returns columns with the rows that intersect the viewport
+
+        '''
+        indices = sorted(self.search(self._viewport))
+        columns = dict()
+        for name,column in data.items():
+            if hasattr(column, 'dtype'):
+                columns[name] = column[indices]
+            else:
+                columns[name] = [column[i] for i in indices]
+        return columns
+
+    def _check_column_names(self, names):
+        '''Raises exception if any name is not a column in the data
+
+        '''
+        for name in names:
+            if name not in self._column_names:
+                raise Exception('Column \"{}\" not in data columns {}'.format(
+                    name, self._column_names))
+
+    def _encode_column(self, column, typed_arrays):
+        '''Converts column to list or typed-array model
+
+        Missing values in lists are converted to None.
+        '''
+        if hasattr(column, 'dtype'):
+            kind = column.dtype.kind
+            if typed_arrays and kind in 'biuf':
+                return encode_typed_array(column, 'float32')
+            values = column.tolist()
+            # Only float (NaN) and object (e.g., pandas NA) columns can have missing values
+            has_missing = kind == 'O' or (kind == 'f' and bool((column != column).any()))
+        else:
+            values = list(column)
+            has_missing = True
+        if has_missing:
+            values = [None if is_missing(value) else value for value in values]
+        return values
+
+    def _evaluate(self, func, data):
+        '''Applies position or style function to the columns
+
+        '''
+        if is_vectorized(func):
+            return func(data)
+
+        # Fall back to calling function with each row. Array columns are
+        # converted with tolist(), so that rows contain python scalars.
+        names = list(data.keys())
+        columns = [data[name].tolist() if hasattr(data[name], 'tolist') else data[name] \
+            for name in names]
+        rows = zip(*columns)
+        return [func(dict(zip(names, row))) for row in rows]
@@ -0,0 +1,65 @@
+'''Modified-time bookkeeping used to cache display models
+
+Each layer and feature records a "modified time" (mtime), taken from a
+global counter, whenever one of its public members is assigned. It also
+counts a "data version", which is incremented when its options or data
+change, but not for view-only changes such as the viewport. The display
+model is only rebuilt when the current mtime or data version differs from
+the ones at which the cached model was built.
+'''
+
+import itertools
+
+# Global, monotonically increasing modified-time counter
+_mtime_counter = itertools.count(1)
+
+
+class DisplayModelCache:
+    '''Mixin class that caches the output of _build_display_model()
+
+    Classes using this mixin must implement _build_display_model().
+    Assigning any public member (name not starting with underscore)
+    marks the instance as modified. Call modified() explicitly after
+    changing data in place, e.g., editing items in a data list.
+    '''
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if not name.startswith('_'):
+            self.modified()
+
+    def modified(self):
+        '''Marks this instance and its data as modified, so that its display model is rebuilt
+
+        '''
+        object.__setattr__(self, '_data_version', self.get_data_version() + 1)
+        self._view_modified()
+
+    def get_mtime(self):
+        '''Returns the modified time
+
+        '''
+        return self.__dict__.get('_mtime', 0)
+
+    def get_data_version(self):
+        '''Returns the data version, for caching values computed from the data
+
+        '''
+        return self.__dict__.get('_data_version', 0)
+
+    def _view_modified(self):
+        '''Marks this instance as modified, without changing the data version
+
+        '''
+        object.__setattr__(self, '_mtime', next(_mtime_counter))
+
+    def _get_display_model(self):
+        '''Returns the display model, rebuilding it only if modified
+
+        '''
+        key = (self.get_mtime(), self.get_data_version())
+        cache = self.__dict__.get('_display_model_cache')
+        if cache is None or cache[0] != key:
+            cache = (key, self._build_display_model())
+            self._display_model_cache = cache
+        return cache[1]
@@ -1,7 +1,11 @@
 '''
 A set of GDAL related utils
 '''
+from collections import OrderedDict
+import json
 import pkg_resources
+import threading
+import uuid
 
 try:
     pkg_resources.get_distribution('gdal')
@@ -9,35 +13,171 @@ except pkg_resources.DistributionNotFound:
     HAS_GDAL = False
 else:
     HAS_GDAL = True
-    from osgeo import gdal, osr
+    from osgeo import gdal, ogr, osr
 
 
 def is_gdal_loaded():
     return HAS_GDAL
 
 
+class SpatialRefCache:
+    '''Size-bounded (LRU) cache of spatial references and coordinate transforms
+
+    @param max_size: (int) maximum number of cached objects
+
+    Coordinate systems are specified as WKT strings or EPSG codes (int).
+    Spatial references are set to use x,y (lon,lat) axis order.
+    OSR objects are not thread-safe, so entries are cached per thread.
+    '''
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_spatial_ref(self, crs):
+        '''Returns osr.SpatialReference for WKT string or EPSG code
+
+        '''
+        key = ('srs', self._normalize(crs), threading.get_ident())
+        return self._get(key, lambda: self._create_spatial_ref(crs))
+
+    def get_transform(self, source_crs, target_crs=4326):
+        '''Returns osr.CoordinateTransformation between coordinate systems
+
+        The default target is lonlat (EPSG:4326).
+        '''
+        key = ('transform', self._normalize(source_crs), self._normalize(target_crs),
+            threading.get_ident())
+        return self._get(key, lambda: osr.CoordinateTransformation(
+            self.get_spatial_ref(source_crs), self.get_spatial_ref(target_crs)))
+
+    def get_stats(self):
+        '''Returns dictionary with hit and miss counts and number of entries
+
+        '''
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+    def clear(self):
+        '''Removes all entries and resets the counters
+
+        '''
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _get(self, key, create):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+
+        # Create outside the lock, because it can be slow (and recursive)
+        value = create()
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+
+    def _create_spatial_ref(self, crs):
+        spatial_ref = osr.SpatialReference()
+        if isinstance(crs, int):
+            error = spatial_ref.ImportFromEPSG(crs)
+        else:
+            error = spatial_ref.ImportFromWkt(crs)
+        if error != 0:
+            raise Exception('Cannot create spatial reference from {}'.format(crs))
+        return set_traditional_axis_order(spatial_ref)
+
+    def _normalize(self, crs):
+        '''Returns cache key for WKT string or EPSG code
+
+        '''
+        if isinstance(crs, int):
+            return 'EPSG:{}'.format(crs)
+        return ' '.join(crs.split())
+
+
+# Process-wide cache, shared by all features
+spatial_ref_cache = SpatialRefCache()
+
+
+# Number of points passed to each TransformPoints() call, which bounds
+# the size of the intermediate python lists for large arrays
+TRANSFORM_CHUNK_SIZE = 65536
+
+
 def convert_points_to_lonlat(points, projection_wkt):
     '''Converts an array of points to lonlat coordinates
 
+    @param points: list of [x,y] (or [x,y,z]) points, or (N,2) or (N,3) numpy array
+    @param projection_wkt: (string) projection of the input points
+    Returns list of [lon,lat] points, or (N,2) numpy array for numpy input
     '''
     if not is_gdal_loaded():
         raise Exception('Cannot convert points because GDAL not loaded')
 
-    from_spatial_ref = osr.SpatialReference()
-    from_spatial_ref.ImportFromWkt(projection_wkt)
+    ref_transform = spatial_ref_cache.get_transform(projection_wkt)
+    return transform_points(points, ref_transform)
 
-    lonlat_ref = osr.SpatialReference()
-    lonlat_ref .ImportFromEPSG(4326)
-    ref_transform = osr.CoordinateTransformation(from_spatial_ref, lonlat_ref)
 
-    n = len(points)
-    lonlat_points = [None] * n
-    for i,point in enumerate(points):
-        input_x = point[0]
-        input_y = point[1]
-        x,y,z = ref_transform.TransformPoint(input_x, input_y)
-        lonlat_points[i] = [x, y]
-    return lonlat_points
+def get_lonlat_ref():
+    '''Returns SpatialReference for lonlat (EPSG:4326) coordinates
+
+    '''
+    return spatial_ref_cache.get_spatial_ref(4326)
+
+
+def set_traditional_axis_order(spatial_ref):
+    '''Sets spatial reference to use x,y (lon,lat) axis order
+
+    GDAL 3 otherwise uses the authority axis order, which is lat,lon
+    for geographic coordinates. Returns the input spatial reference.
+    '''
+    if hasattr(spatial_ref, 'SetAxisMappingStrategy'):
+        spatial_ref.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    return spatial_ref
+
+
+def transform_points(points, ref_transform):
+    '''Transforms points with batched TransformPoints() calls
+
+    @param points: list of [x,y] (or [x,y,z]) points, or (N,2) or (N,3) numpy array
+    @param ref_transform: osr.CoordinateTransformation
+    Returns list of [x,y] points, or (N,2) numpy array for numpy input
+
+    Numpy arrays are passed to TransformPoints() directly. GDAL bindings
+    that don't accept arrays raise TypeError, in which case each chunk is
+    converted to a python list. Most GDAL versions return the transformed
+    points as a list of tuples, which is converted back to an array.
+    '''
+    if hasattr(points, 'shape'):
+        import numpy as np
+        array = np.asarray(points, dtype=np.float64)
+        if array.ndim != 2 or array.shape[1] < 2:
+            raise Exception('Points array must have shape (N,2) or (N,3), not {}'.format(array.shape))
+        result = np.empty((len(array), 2), dtype=np.float64)
+        for start in range(0, len(array), TRANSFORM_CHUNK_SIZE):
+            chunk = array[start:start + TRANSFORM_CHUNK_SIZE, :3]
+            try:
+                transformed = ref_transform.TransformPoints(chunk)
+            except TypeError:
+                transformed = ref_transform.TransformPoints(chunk.tolist())
+            result[start:start + len(chunk)] = np.asarray(transformed)[:, :2]
+        return result
+
+    result = list()
+    for start in range(0, len(points), TRANSFORM_CHUNK_SIZE):
+        chunk = [point[:3] for point in points[start:start + TRANSFORM_CHUNK_SIZE]]
+        transformed = ref_transform.TransformPoints(chunk)
+        result.extend([x, y] for x,y,*z in transformed)
+    return result
 
 def convert_wkt_to_proj(projection_wkt):
     '''Converts projection WKT string to Proj4 string
@@ -49,7 +189,132 @@ def convert_wkt_to_proj(projection_wkt):
     if projection_wkt is None:
         return None
 
-    ref = osr.SpatialReference()
-    ref.ImportFromWkt(wkt)
+    ref = spatial_ref_cache.get_spatial_ref(projection_wkt)
     proj4_string = ref.ExportToProj4()
     return proj4_string
+
+
+def encode_png(dataset, src_win=None, size=None):
+    '''Encodes GDAL dataset as PNG image, returning the PNG file contents (bytes)
+
+    @param src_win: (list) optional source window [xoff, yoff, xsize, ysize]
+    @param size: (list) optional output image size [width, height]
+
+    The image is written to GDAL's in-memory filesystem (/vsimem), so no
+    disk files are created, and datasets can be encoded concurrently.
+    When the output size is smaller than the source window, GDAL reads
+    from the dataset's overviews if it has any.
+    '''
+    if not is_gdal_loaded():
+        raise Exception('Cannot encode png because GDAL not loaded')
+
+    # Use unique name so that concurrent calls don't collide
+    png_path = '/vsimem/jupyterlab_geojs/{}.png'.format(uuid.uuid4().hex)
+    try:
+        if src_win is None and size is None:
+            png_driver = gdal.GetDriverByName('PNG')
+            png_dataset = png_driver.CreateCopy(png_path, dataset, strict=0)
+        else:
+            width, height = size if size is not None else (0, 0)
+            png_dataset = gdal.Translate(
+                png_path, dataset, format='PNG', srcWin=src_win,
+                width=width, height=height)
+        assert(png_dataset)
+        png_dataset = None  # closes & flushes the dataset
+        return read_vsimem_file(png_path)
+    finally:
+        # Remove png file and any auxilliary file created by gdal
+        for path in [png_path, png_path + '.aux.xml']:
+            if gdal.VSIStatL(path) is not None:
+                gdal.Unlink(path)
+
+
+def read_vsimem_file(path):
+    '''Returns contents (bytes) of file in GDAL's in-memory filesystem
+
+    '''
+    stat = gdal.VSIStatL(path)
+    if stat is None:
+        raise Exception('Cannot find in-memory file {}'.format(path))
+    f = gdal.VSIFOpenL(path, 'rb')
+    try:
+        return gdal.VSIFReadL(1, stat.size, f)
+    finally:
+        gdal.VSIFCloseL(f)
+
+
+def read_ogr_features(filename, layer=None, bbox=None, where=None, columns=None):
+    '''Generator that reads features from an OGR data source as GeoJSON features (dict)
+
+    @param filename: (string) any data source OGR can read, e.g., shp,
+           gpkg, or fgb files, or gdb folders
+    @param layer: (string or int) layer name or index (default: first layer)
+    @param bbox: (list) spatial filter [xmin, ymin, xmax, ymax] in lon-lat
+    @param where: (string) attribute filter (OGR SQL), e.g., "pop > 1000"
+    @param columns: (list) names of the fields to read (default: all)
+
+    The filters and field selection are applied by OGR (and pushed down
+    to the driver where supported), so that features and fields that
+    are not selected are never converted to Python objects.
+    Geometries are transformed to lon-lat coordinates.
+    '''
+    if not is_gdal_loaded():
+        raise Exception('Cannot read vector data because GDAL not loaded')
+
+    data_source = ogr.Open(filename, gdal.GA_ReadOnly)
+    if data_source is None:
+        raise Exception('Cannot open vector data source {}'.format(filename))
+    ogr_layer = data_source.GetLayer(layer if layer is not None else 0)
+    if ogr_layer is None:
+        raise Exception('Cannot find layer {} in {}'.format(layer, filename))
+
+    # Set up transform from layer coordinates to lonlat
+    lonlat_ref = get_lonlat_ref()
+    layer_ref = ogr_layer.GetSpatialRef()
+    layer_wkt = None
+    ref_transform = None
+    if layer_ref is not None and not layer_ref.IsSame(lonlat_ref):
+        layer_wkt = layer_ref.ExportToWkt()
+        ref_transform = spatial_ref_cache.get_transform(layer_wkt)
+
+    if bbox is not None:
+        xmin, ymin, xmax, ymax = bbox
+        ring = ogr.Geometry(ogr.wkbLinearRing)
+        for x, y in [(xmin, ymin), (xmax, ymin), (xmax, ymax), (xmin, ymax), (xmin, ymin)]:
+            ring.AddPoint_2D(x, y)
+        bbox_geometry = ogr.Geometry(ogr.wkbPolygon)
+        bbox_geometry.AddGeometry(ring)
+        if ref_transform is not None:
+            # Densify edges, so that the transformed bbox covers the same area
+            bbox_geometry.Segmentize(max(xmax - xmin, ymax - ymin) / 16.0)
+            bbox_geometry.Transform(spatial_ref_cache.get_transform(4326, layer_wkt))
+        ogr_layer.SetSpatialFilter(bbox_geometry)
+
+    if where is not None:
+        if ogr_layer.SetAttributeFilter(where) != 0:
+            raise Exception('Invalid attribute filter: {}'.format(where))
+
+    # Skip reading fields that are not selected
+    layer_defn = ogr_layer.GetLayerDefn()
+    field_names = [layer_defn.GetFieldDefn(i).GetName() for i in range(layer_defn.GetFieldCount())]
+    if columns is None:
+        selected_names = field_names
+    else:
+        selected_names = [name for name in columns if name in field_names]
+        ogr_layer.SetIgnoredFields([name for name in field_names if name not in columns])
+    field_indices = [(name, layer_defn.GetFieldIndex(name)) for name in selected_names]
+
+    ogr_layer.ResetReading()
+    for ogr_feature in ogr_layer:
+        geometry = ogr_feature.GetGeometryRef()
+        if geometry is not None:
+            if ref_transform is not None:
+                geometry.Transform(ref_transform)
+            geometry = json.loads(geometry.ExportToJson())
+        properties = {name: ogr_feature.GetField(index) for name, index in field_indices}
+        yield {
+            'type': 'Feature',
+            'id': ogr_feature.GetFID(),
+            'geometry': geometry,
+            'properties': properties
+        }
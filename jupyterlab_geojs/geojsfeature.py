@@ -1,5 +1,39 @@
-class GeoJSFeature:
+import numbers
+
+from . import colorutils
+from .displaymodelcache import DisplayModelCache
+from .spatialindex import SpatialIndex
+from .typedarray import encode_typed_array
+
+
+def vectorized(func):
+    '''Decorator that marks a position or style function as vectorized
+
+    Vectorized functions are called once per feature with the entire
+    data object (instead of once per data item), and must return a
+    sequence or numpy array with one value per data item. Positions
+    can be returned as an (N,2) array of [x,y] coordinates.
+    '''
+    func.vectorized = True
+    return func
+
+
+def is_vectorized(func):
+    '''Returns boolean indicating whether func is marked as vectorized
+
+    '''
+    return getattr(func, 'vectorized', False)
+
+
+class GeoJSFeature(DisplayModelCache):
     '''Generic/base class for GeoJS features
+
+    Optional keyword arguments:
+    @param viewport (list) bounds [xmin, ymin, xmax, ymax] to cull the
+           data items to before sending them to the client
+    @param typedArrays (boolean) send point positions and per-item style
+           values as packed typed arrays. This only sets how the kernel
+           encodes the options, so it is not a GeoJS feature option.
     '''
 
     # List of options that are common to all GoeJS features
@@ -17,7 +51,18 @@ class GeoJSFeature:
         'quad': ['image', 'imageCrop', 'imageFixedScale']  # omit 'color' 'canvas', 'video'
     }
 
+    # Style components that specify colors
+    ColorStyleNames = ['backgroundColor', 'color', 'fillColor', 'strokeColor']
+
     def __init__(self, feature_type, config_options=True, **kwargs):
+        # Spatial index and viewport are only used in the kernel
+        self._viewport = kwargs.pop('viewport', None)
+        self._spatial_index = None
+        self._spatial_index_key = None
+
+        # Encoding option, which can be changed after the feature is created
+        self.typedArrays = kwargs.pop('typedArrays', False)
+
         # Public members
         option_names = []
         if config_options:
@@ -47,6 +92,7 @@ class GeoJSFeature:
             point_data = self._options.get('data')
             if isinstance(point_data, list) \
                 and len(point_data) > 0 \
+                and isinstance(point_data[0], dict) \
                 and not '__i' in point_data[0]:
 
                 for i in range(len(point_data)):
@@ -59,35 +105,227 @@ class GeoJSFeature:
             if value is not None:
                 self._options[name] = value
 
+        # Work from a copy of the options, so that callables are
+        # preserved for the next time the display model is built
+        options = dict(self._options)
+        if self._viewport is not None and options.get('data') is not None:
+            options['data'] = self._cull_data(options['data'])
+
         # Apply any lambda functions
-        data = self._options.get('data')
+        data = options.get('data')
+        typed_arrays = self.typedArrays
 
         # Check position
-        position = self._options.get('position')
+        position = options.get('position')
         if position is not None and callable(position):
-            position_coords = [position(item) for item in data]
-            self._options['position'] = position_coords
+            position_coords = self._evaluate(position, data)
+            if typed_arrays:
+                position_coords = self._encode_positions(position_coords)
+            elif hasattr(position_coords, 'tolist'):
+                # Convert numpy array to list of {x,y} positions
+                position_coords = [{'x': x, 'y': y} for x,y,*z in position_coords.tolist()]
+            options['position'] = position_coords
 
         # Check style components
-        style = self._options.get('style', {})
+        style = dict(options.get('style') or {})
         for key,val in style.items():
             if callable(val):
-                item_vals = [val(item) for item in data]
+                item_vals = self._evaluate(val, data)
 
+                if typed_arrays:
+                    item_vals = self._encode_style_values(key, item_vals)
                 # Check format for styles that set color
-                if key in ['backgroundColor', 'color', 'fillColor', 'strokeColor']:
+                elif key in self.__class__.ColorStyleNames:
                     item_vals = self._format_colors(item_vals)
+                elif hasattr(item_vals, 'tolist'):
+                    item_vals = item_vals.tolist()
                 style[key] = item_vals
+        if style:
+            options['style'] = style
 
-        display_model['options'] = self._options
+        display_model['options'] = options
 
         return display_model
 
+    def get_spatial_index(self):
+        '''Returns SpatialIndex over the bounding boxes of the data items
+
+        The index is built on first use, and rebuilt when the data version
+        changes (see modified()) or the number of data items changes.
+        Call modified() after changing data items in place, e.g., their
+        positions.
+        '''
+        data = self._options.get('data')
+        key = (self.get_data_version(), len(data) if hasattr(data, '__len__') else None)
+        if self._spatial_index is None or key != self._spatial_index_key:
+            self._spatial_index = SpatialIndex(self._get_item_bounds())
+            self._spatial_index_key = key
+        return self._spatial_index
+
+    def search(self, bbox):
+        '''Returns list of indices of the data items that intersect bbox
+
+        @param bbox (list) [xmin, ymin, xmax, ymax]
+        '''
+        return self.get_spatial_index().search(bbox)
+
+    def nearest(self, x, y, k=1):
+        '''Returns list of indices of the k data items nearest to (x, y)
+
+        '''
+        return self.get_spatial_index().nearest(x, y, k)
+
+    def set_viewport(self, bbox):
+        '''Sets bounds [xmin, ymin, xmax, ymax] to cull data items to
+
+        Only the data items that intersect the viewport are sent to the
+        client. Use None to send all data items.
+        '''
+        self._viewport = bbox
+        self._view_modified()
+
+    def _get_item_bounds(self):
+        '''Returns list of [xmin, ymin, xmax, ymax] for each data item
+
+        '''
+        if self._feature_type != 'point':
+            raise Exception('Spatial index not supported for {} features'.format(
+                self._feature_type))
+        data = self._options.get('data') or []
+        position = getattr(self, 'position', None)
+        if callable(position):
+            coords = self._evaluate(position, data)
+        elif position is None:
+            coords = data  # geojs default is item itself
+        else:
+            raise Exception('Spatial index requires position function')
+        return self._position_bounds(coords)
+
+    def _position_bounds(self, coords):
+        '''Returns list of (point) bounding boxes for position coordinates
+
+        @param coords list of {x,y} dictionaries or [x,y] sequences, or (N,2) numpy array
+        '''
+        if hasattr(coords, 'tolist'):
+            coords = coords.tolist()
+        boxes = list()
+        for coord in coords:
+            if isinstance(coord, dict):
+                x, y = coord['x'], coord['y']
+            else:
+                x, y = coord[0], coord[1]
+            boxes.append([x, y, x, y])
+        return boxes
+
+    def _cull_data(self, data):
+        '''Returns the data items that intersect the viewport
+
+        '''
+        indices = sorted(self.search(self._viewport))
+        # Copy dictionary items, because their __i index changes. (Other
+        # items, e.g., [x,y] sequences, have no index and are not copied.)
+        return [dict(data[i], __i=j) if isinstance(data[i], dict) else data[i] \
+            for j,i in enumerate(indices)]
+
+    def _evaluate(self, func, data):
+        '''Applies position or style function to the data
+
+        Vectorized functions are called once with the full data object;
+        otherwise the function is called for each data item.
+        '''
+        if is_vectorized(func):
+            return func(data)
+        return [func(item) for item in data]
+
+    def _encode_positions(self, position_coords):
+        '''Packs list of position coordinates into float32 typed array
+
+        Positions can be {x,y} dictionaries, [x,y] sequences, or an
+        (N,2) numpy array.
+        '''
+        n = len(position_coords)
+        if n == 0:
+            return position_coords
+        if hasattr(position_coords, 'shape'):
+            return encode_typed_array(position_coords[:, :2], 'float32', [n, 2])
+        if isinstance(position_coords[0], dict):
+            flat_coords = [c for pos in position_coords for c in (pos['x'], pos['y'])]
+        else:
+            flat_coords = [c for pos in position_coords for c in pos[:2]]
+        return encode_typed_array(flat_coords, 'float32', [n, 2])
+
+    def _encode_style_values(self, key, item_vals):
+        '''Packs per-item style values into typed array, if possible
+
+        Numbers are packed as float32 and colors as RGBA uint8.
+        Returns input list for values that cannot be packed.
+        '''
+        if len(item_vals) == 0:
+            return item_vals
+
+        if key in self.__class__.ColorStyleNames:
+            rgba_vals = self._format_rgba(item_vals)
+            if rgba_vals is None:
+                return self._format_colors(item_vals)
+            return encode_typed_array(rgba_vals, 'uint8', [len(item_vals), 4])
+
+        if hasattr(item_vals, 'dtype'):
+            if item_vals.dtype.kind in 'biuf':
+                return encode_typed_array(item_vals, 'float32')
+            item_vals = item_vals.tolist()
+
+        # (numbers.Real includes numpy scalars, e.g., np.int64 and np.float32)
+        is_number = lambda val: \
+            isinstance(val, numbers.Real) and not isinstance(val, bool)
+        if all(map(is_number, item_vals)):
+            return encode_typed_array(item_vals, 'float32')
+
+        return item_vals
+
+    def _format_rgba(self, input_vals):
+        '''Converts input color tuples to RGBA bytes
+
+        Returns (N,4) numpy array if numpy is installed, otherwise a flat list.
+        Returns None if input values are not color tuples.
+        '''
+        if colorutils.is_numpy_loaded():
+            return colorutils.colors_to_rgba(input_vals)
+
+        # Use first item as exemplar
+        input0 = input_vals[0]
+        if not isinstance(input0, (list,tuple)):
+            return None
+        if len(input0) < 3 or len(input0) > 4:
+            return None
+
+        # Double values are scaled to 255, same as _format_colors()
+        if max(input0[:3]) <= 1:
+            scale = 255.0
+        elif max(input0[:3]) <= 255:
+            scale = 1.0
+        else:
+            return None  # dont understand format
+
+        rgba_vals = list()
+        for color in input_vals:
+            rgba_vals.extend(int(scale * val) for val in color[:3])
+            # Alpha is opaque unless specified (as either fraction or byte)
+            alpha = color[3] if len(color) == 4 else 1.0
+            rgba_vals.append(int(255.0 * alpha) if alpha <= 1 else int(alpha))
+        return rgba_vals
+
     def _format_colors(self, input_vals):
         '''Converts input colors to hex format.
 
         This only applies to colors produced by a callable
         '''
+        if colorutils.is_numpy_loaded():
+            hex_vals = colorutils.colors_to_hex(input_vals)
+            if hex_vals is not None:
+                return hex_vals
+        if hasattr(input_vals, 'tolist'):
+            input_vals = input_vals.tolist()
+
         # Use first item as exemplar
         input0 = input_vals[0]
         # Abort for unexpected input
@@ -1,13 +1,16 @@
+from .columnarpointfeature import ColumnarPointFeature, is_table
+from .displaymodelcache import DisplayModelCache
 from .geojsfeature import GeoJSFeature
 from .geojslayer import GeoJSLayer
 from .geojsonfeature import GeoJSONFeature
 from .pointcloudfeature import PointCloudFeature
 from .rasterfeature import RasterFeature
+from .rastermosaicfeature import RasterMosaicFeature, is_glob_pattern
 from .scenevalidator import SceneValidator
 from .types import FeatureType
 
 
-class GeoJSFeatureLayer:
+class GeoJSFeatureLayer(DisplayModelCache):
     """A notebook class for representing feature layers in GeoJS visualizations.
 
     """
@@ -33,18 +36,27 @@ class GeoJSFeatureLayer:
         # Handle special cases first
         if feature_type == FeatureType.GEOJSON:
             feature = GeoJSONFeature(data, **kwargs)
+        elif feature_type == FeatureType.POINT and \
+            (isinstance(data, dict) or is_table(data)):
+            # Special case: point with dictionary or table data represents columns
+            feature = ColumnarPointFeature(data, **kwargs)
         elif feature_type == FeatureType.POINTCLOUD:
             feature = PointCloudFeature(data, **kwargs)
         elif feature_type == FeatureType.POLYGON and isinstance(data, str):
-            # Special case: polygon with string data represents shp file
-            # Load shp file as geojson feature
+            # Special case: polygon with string data represents vector file
+            # (e.g., shp or gpkg), loaded as geojson feature
             feature = GeoJSONFeature(data, **kwargs)
+        elif feature_type == FeatureType.RASTER and \
+            (isinstance(data, (list, tuple)) or is_glob_pattern(data)):
+            # Special case: raster with list or pattern represents mosaic
+            feature = RasterMosaicFeature(data, **kwargs)
         elif feature_type == FeatureType.RASTER:
             feature = RasterFeature(data, **kwargs)
         else:
             feature = GeoJSFeature(feature_type, data=data, **kwargs)
 
         self._features.append(feature)
+        self.modified()
         return feature
 
     def clear(self):
@@ -53,6 +65,16 @@ class GeoJSFeatureLayer:
         '''
         self._validator.clearing_layer(self)
         del self._features[:]
+        self.modified()
+
+    def get_mtime(self):
+        '''Returns the latest modified time of this layer and its features
+
+        '''
+        mtime = super(GeoJSFeatureLayer, self).get_mtime()
+        for feature in self._features:
+            mtime = max(mtime, feature.get_mtime())
+        return mtime
 
 
     def _build_display_model(self):
@@ -69,7 +91,7 @@ class GeoJSFeatureLayer:
 
         feature_data = list()
         for feature in self._features:
-            feature_data.append(feature._build_display_model())
+            feature_data.append(feature._get_display_model())
         display_model['features'] = feature_data
 
         return display_model
@@ -1,16 +1,96 @@
+import hashlib
 import json
+import math
 import os
 from urllib.parse import urlparse
 
-from . import gdalutils
+from . import gdalutils, geometryutils
+from .vectortiles import VectorTiler, get_max_zoom
 from .geojsfeature import GeoJSFeature
+from .geojsonstream import GeoJSONStreamReader
+
+# Name of the file in tile_dir that records the source of the tiles,
+# and the tile files written for it
+TILE_SOURCE_FILENAME = 'source.json'
 
 class GeoJSONFeature(GeoJSFeature):
-    ''''''
+    '''Initialize GeoJSON feature
+
+    @param data GeoJSON object (dict), filename, or url. Files other than
+           .geojson and .json are read with OGR (requires GDAL), which
+           supports shp, gpkg, fgb, gdb, and other vector formats.
+
+    Optional keyword arguments, applied to each feature loaded from file:
+    @param feature_filter (callable) function that takes a GeoJSON feature
+           and returns boolean indicating whether to keep the feature
+    @param properties (list) names of the feature properties to keep
+
+    GeoJSON files are parsed one feature at a time, so that memory use
+    is proportional to the features that are kept, not the file size.
+
+    Optional keyword arguments for reading with OGR, which are applied
+    by OGR before the features are converted to Python objects:
+    @param ogr_layer (string or int) layer name or index (default: 0)
+    @param bbox (list) spatial filter [xmin, ymin, xmax, ymax] in lon-lat
+    @param where (string) attribute filter (OGR SQL), e.g., "pop > 1000"
+    Setting any of these reads .geojson and .json files with OGR too.
+
+    The spatial index methods (search, nearest) and viewport option
+    reference the features by their index in the feature collection.
+
+    Optional keyword arguments for simplifying lines and polygons:
+    @param simplify_zoom (number or list) map zoom level(s) to simplify
+           the geometries for. For a list, one level of detail is built
+           for each zoom level, and the client displays the level with
+           the largest zoom not greater than the map zoom. Levels that
+           are the same as the next lower zoom level are not sent.
+    @param simplify_pixels (number) simplification tolerance, in screen
+           pixels at the simplify_zoom level (default 1.0)
+
+    Optional keyword argument for compact transport to the client:
+    @param quantize (int) send the data as TopoJSON topology, with
+           coordinates quantized to this many grid values along each
+           axis (e.g., 100000) and shared borders stored once
+
+    Optional keyword arguments for tiled display of large data:
+    @param tiled (boolean) cut the data into vector tiles, which the
+           client loads on demand for the current view
+    @param tile_dir (string) folder to write tile files ({z}/{x}/{y}.json) to
+    @param tile_url (string) url prefix the client uses to fetch
+           tiles written to tile_dir, e.g., 'files/tiles'
+    @param tile_zoom_range (list) [min, max] zoom levels to build tiles
+           for (default [0, 10]). The max zoom is lowered to the largest
+           zoom at which the data extent spans no more than
+           vectortiles.MAX_ZOOM_TILES tiles. The max zoom tiles are also
+           used at higher zoom levels.
+    Tiles are simplified with simplify_pixels tolerance at each zoom level,
+    and encoded as topologies quantized to 4096 grid values (or quantize).
+    Tiles already in tile_dir are reused if the data and tile options have
+    not changed since they were written; otherwise the tiles recorded in
+    tile_dir/source.json are removed before new tiles are written. The
+    tile_dir must be empty (or missing) the first time tiles are written.
+    '''
     def __init__(self, data, **kwargs):
+        # Loading options are only used in the kernel
+        self._feature_filter = kwargs.pop('feature_filter', None)
+        self._property_names = kwargs.pop('properties', None)
+        self._ogr_layer = kwargs.pop('ogr_layer', None)
+        self._bbox = kwargs.pop('bbox', None)
+        self._where = kwargs.pop('where', None)
+        self._simplify_zoom = kwargs.pop('simplify_zoom', None)
+        self._simplify_pixels = kwargs.pop('simplify_pixels', 1.0)
+        self._quantize = kwargs.pop('quantize', None)
+        self._tiled = kwargs.pop('tiled', False)
+        self._tile_dir = kwargs.pop('tile_dir', None)
+        self._tile_url = kwargs.pop('tile_url', None)
+        self._tile_zoom_range = kwargs.pop('tile_zoom_range', [0, 10])
+        if self._tiled and (self._tile_dir is None or self._tile_url is None):
+            raise Exception('Tiled display requires tile_dir and tile_url')
+
         super(GeoJSONFeature, self).__init__('geojson', config_options=False, **kwargs)
         self._json_data = None
         self._uri = None
+        self._filename = None
 
         # Determine if input data is filename, uri, or raw data
         filename = None
@@ -32,46 +112,240 @@ class GeoJSONFeature(GeoJSFeature):
             raise Exception('Unrecognized input data not a string or dict: {}'.format(data))
 
         if filename is not None:
+            self._filename = filename
             # Load data here, because javascript cannot load from
             # filesystem due to browser security restriction.
             if not os.path.exists(filename):
                 raise Exception('Cannot find file {}'.format(filename))
 
             root, ext = os.path.splitext(filename)
-            if ext == '.shp':
-                # Convert shape files to geojson format
-                self._json_data = self._convert_shp(filename)
-            else:
+            use_ogr = self._ogr_layer is not None or \
+                self._bbox is not None or self._where is not None
+            if ext.lower() in ['.geojson', '.json'] and not use_ogr:
                 # Logic for standard geojson files
-                with open(filename) as f:
-                    text = f.read()
-                self._json_data = json.loads(text)
+                self._json_data = self._load_geojson(filename)
+            else:
+                # Convert other vector formats to geojson format
+                self._json_data = self._load_ogr(filename)
 
+        if self._json_data is None and (self._simplify_zoom is not None or \
+            self._quantize is not None or self._tiled):
+            raise Exception('Cannot simplify, quantize, or tile geojson loaded from url')
 
-    def _convert_shp(self, filename):
-        '''Convert shp files to geojson data
+    def _load_geojson(self, filename):
+        '''Loads geojson file, one feature at a time
+
+        Returns geojson object
+        '''
+        with open(filename) as f:
+            reader = GeoJSONStreamReader(f)
+            features = list()
+            for feature in reader.iter_features():
+                feature = self._select_feature(feature)
+                if feature is not None:
+                    features.append(feature)
+            json_data = reader.members
+        # Only set features for feature collections
+        if features or json_data.get('type') == 'FeatureCollection':
+            json_data['features'] = features
+        return json_data
+
+    def _select_feature(self, feature):
+        '''Applies feature filter and property selection to one feature
+
+        Returns None if the feature is filtered out
+        '''
+        if self._feature_filter is not None and not self._feature_filter(feature):
+            return None
+        if self._property_names is not None:
+            properties = feature.get('properties') or {}
+            feature['properties'] = {name: properties[name] \
+                for name in self._property_names if name in properties}
+        return feature
+
+
+    def _load_ogr(self, filename):
+        '''Loads vector data source with OGR and converts to geojson data
 
         Returns feature collection object
         '''
         if not gdalutils.is_gdal_loaded():
-            raise Exception('Cannot process .shp files because GDAL is not loaded')
+            raise Exception('Cannot process {} because GDAL is not loaded'.format(filename))
 
-        from osgeo import gdal, ogr
         # Create GeoJSON feature collection
         fc = {
             'type': 'FeatureCollection',
             'features': []
         }
-        dataset = ogr.Open(filename, gdal.GA_ReadOnly)
-        layer = dataset.GetLayer()
-        for feature in layer:
-            fc['features'].append(feature.ExportToJson(as_object=True))
+        features = gdalutils.read_ogr_features(filename, layer=self._ogr_layer,
+            bbox=self._bbox, where=self._where, columns=self._property_names)
+        for feature in features:
+            feature = self._select_feature(feature)
+            if feature is not None:
+                fc['features'].append(feature)
         return fc
 
     def _build_display_model(self):
         display_model = super(GeoJSONFeature, self)._build_display_model()
-        if self._json_data is not None:
-            display_model['data'] = self._json_data
+        if self._tiled:
+            display_model['tiles'] = self._write_tiles()
+        elif self._json_data is not None and isinstance(self._simplify_zoom, (list, tuple)):
+            levels = list()
+            for zoom in sorted(self._simplify_zoom):
+                data = self._get_display_data(zoom)
+                if not levels or data != levels[-1]['data']:
+                    levels.append({'zoom': zoom, 'data': data})
+            display_model['levels'] = levels
+        elif self._json_data is not None:
+            display_model['data'] = self._get_display_data(self._simplify_zoom)
         elif self._url is not None:
             display_model['url'] = self._url
         return display_model
+
+    def _get_display_data(self, zoom):
+        '''Returns geojson data, simplified and/or encoded as topology
+
+        @param zoom: (number) zoom level to simplify for, or None
+        '''
+        data = self._json_data
+        if self._viewport is not None:
+            data = self._cull_data(data)
+        if zoom is not None:
+            latitude = geometryutils.get_max_latitude(data)
+            tolerance = geometryutils.get_zoom_tolerance(
+                zoom, self._simplify_pixels, latitude)
+            data = geometryutils.simplify_geojson(data, tolerance)
+        if self._quantize is not None:
+            data = geometryutils.encode_topology(data, self._quantize)
+        return data
+
+    def _get_item_bounds(self):
+        '''Returns list of bounding boxes, one for each feature
+
+        For feature collections, the items are the features; otherwise
+        the geojson object is the one item.
+        '''
+        if self._json_data is None:
+            raise Exception('Spatial index not supported for geojson loaded from url')
+        if self._json_data.get('type') == 'FeatureCollection':
+            items = self._json_data.get('features', [])
+        else:
+            items = [self._json_data]
+
+        empty_box = [math.inf, math.inf, -math.inf, -math.inf]  # never intersects
+        boxes = list()
+        for item in items:
+            bounds = geometryutils.get_bounds(item)
+            boxes.append(bounds if bounds is not None else empty_box)
+        return boxes
+
+    def _cull_data(self, data):
+        '''Returns geojson data with the features that intersect the viewport
+
+        '''
+        indices = sorted(self.search(self._viewport))
+        if data.get('type') == 'FeatureCollection':
+            features = data.get('features', [])
+            culled = dict(data)
+            culled['features'] = [features[i] for i in indices]
+            return culled
+        elif indices:
+            return data
+        return {'type': 'FeatureCollection', 'features': []}
+
+    def _write_tiles(self):
+        '''Writes vector tiles to tile_dir and returns tiles model
+
+        '''
+        min_zoom, max_zoom = self._tile_zoom_range
+        bounds = geometryutils.get_bounds(self._json_data)
+        if bounds is not None:
+            max_zoom = get_max_zoom(bounds, min_zoom, max_zoom)
+        quantization = self._quantize if self._quantize is not None else 4096
+        tiles_model = {
+            'url': '{}/{{z}}/{{x}}/{{y}}.json'.format(self._tile_url.rstrip('/')),
+            'minZoom': min_zoom,
+            'maxZoom': max_zoom
+        }
+
+        source = self._get_tile_source(min_zoom, max_zoom, quantization)
+        record = self._read_tile_record()
+        if record.get('source') == source:
+            return tiles_model
+        self._remove_tiles(record.get('tiles', []))
+
+        tile_paths = list()
+        tiler = VectorTiler(self._json_data, simplify_pixels=self._simplify_pixels)
+        for zoom in range(min_zoom, max_zoom + 1):
+            for x, y, data in tiler.get_tiles(zoom):
+                topology = geometryutils.encode_topology(data, quantization)
+                tile_path = '{}/{}/{}.json'.format(zoom, x, y)
+                path = os.path.join(self._tile_dir, tile_path)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'w') as f:
+                    json.dump(topology, f, separators=(',', ':'))
+                tile_paths.append(tile_path)
+
+        # Record is written last, so that partial tile sets are not reused
+        os.makedirs(self._tile_dir, exist_ok=True)
+        with open(os.path.join(self._tile_dir, TILE_SOURCE_FILENAME), 'w') as f:
+            json.dump({'source': source, 'tiles': tile_paths}, f)
+        return tiles_model
+
+    def _get_tile_source(self, min_zoom, max_zoom, quantization):
+        '''Returns json-serializable description of the tiles source
+
+        Data loaded from file (without feature_filter) are identified by
+        the file path, modified time and size; otherwise by a hash of the
+        data contents.
+        '''
+        if self._filename is not None and self._feature_filter is None:
+            stat = os.stat(self._filename)
+            data_id = [os.path.abspath(self._filename), stat.st_mtime, stat.st_size]
+        else:
+            data_string = json.dumps(self._json_data, sort_keys=True)
+            data_id = hashlib.sha1(data_string.encode('utf-8')).hexdigest()
+        return [
+            data_id, self._property_names, self._ogr_layer, self._bbox, self._where,
+            min_zoom, max_zoom, self._simplify_pixels, quantization
+        ]
+
+    def _read_tile_record(self):
+        '''Returns the tile record (dict) in tile_dir, or empty dict if none
+
+        Raises exception if tile_dir contains files that were not written
+        by a geojson feature.
+        '''
+        source_path = os.path.join(self._tile_dir, TILE_SOURCE_FILENAME)
+        if os.path.exists(source_path):
+            with open(source_path) as f:
+                return json.load(f)
+        if os.path.isdir(self._tile_dir) and os.listdir(self._tile_dir):
+            raise Exception('Cannot write tiles to tile_dir {}, which is not empty'.format(
+                self._tile_dir))
+        return dict()
+
+    def _remove_tiles(self, tile_paths):
+        '''Removes tile files written to tile_dir, and the tile record
+
+        @param tile_paths: (list) tile file paths, relative to tile_dir
+        '''
+        folders = set()
+        for tile_path in tile_paths:
+            path = os.path.join(self._tile_dir, tile_path)
+            if os.path.exists(path):
+                os.remove(path)
+            folder = os.path.dirname(tile_path)
+            while folder:
+                folders.add(folder)
+                folder = os.path.dirname(folder)
+
+        # Remove folders left empty, deepest first
+        for folder in sorted(folders, key=len, reverse=True):
+            path = os.path.join(self._tile_dir, folder)
+            if os.path.isdir(path) and not os.listdir(path):
+                os.rmdir(path)
+
+        source_path = os.path.join(self._tile_dir, TILE_SOURCE_FILENAME)
+        if os.path.exists(source_path):
+            os.remove(source_path)
@@ -0,0 +1,141 @@
+'''Incremental reader for GeoJSON files
+
+Parses a GeoJSON object one top-level member at a time, and yields the
+items in its "features" array one feature at a time, so that the whole
+file is never held in memory. Malformed input is reported as soon as
+the error is found, instead of buffering the rest of the file.
+'''
+
+import json
+
+# Parse errors this many characters (or more) before the end of the
+# buffer are structural errors, not values truncated at the buffer end
+# (e.g., "tru" or "\\ud83d\\ude")
+TRUNCATION_MARGIN = 16
+
+
+class GeoJSONStreamReader:
+    '''Streaming reader for GeoJSON (text) input streams
+
+    @param f: input stream, opened in text mode
+    @param chunk_size: (int) number of characters to read at a time
+    @param max_value_size: (int) maximum number of characters in one
+           member or feature; larger values raise an exception
+
+    Usage:
+      reader = GeoJSONStreamReader(f)
+      for feature in reader.iter_features():
+          ...
+      reader.members  # other top-level members, e.g., type, crs, bbox
+    '''
+    def __init__(self, f, chunk_size=1024*1024, max_value_size=256*1024*1024):
+        self.members = dict()  # top-level members except "features"
+
+        self._f = f
+        self._chunk_size = chunk_size
+        self._max_value_size = max_value_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def iter_features(self):
+        '''Generator that yields each item in the "features" array
+
+        Top-level members that precede "features" are stored in
+        self.members before the first feature is yielded; members after
+        "features" are stored once iteration completes.
+        '''
+        self._expect('{')
+        while True:
+            c = self._peek()
+            if c == '}':
+                self._pos += 1
+                break
+            elif c == ',':
+                self._pos += 1
+                continue
+
+            key = self._decode_value()
+            self._expect(':')
+            if key != 'features':
+                self.members[key] = self._decode_value()
+                continue
+
+            self._expect('[')
+            while True:
+                c = self._peek()
+                if c == ']':
+                    self._pos += 1
+                    break
+                elif c == ',':
+                    self._pos += 1
+                    continue
+                yield self._decode_value()
+
+    def _decode_value(self):
+        '''Decodes one json value starting at the current position
+
+        '''
+        self._peek()  # raw_decode() does not skip leading whitespace
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as e:
+                truncated = e.msg.startswith('Unterminated string') or \
+                    e.pos >= len(self._buffer) - TRUNCATION_MARGIN
+                if self._eof or not truncated:
+                    raise
+                self._read_more()
+                continue
+
+            # Value at the end of the buffer might be truncated (e.g., a number,
+            # which can also be cut before its fraction or exponent)
+            truncated = end == len(self._buffer) or (
+                isinstance(value, (int, float)) and not isinstance(value, bool) and
+                self._buffer[end] in '.eE+-')
+            if truncated and not self._eof:
+                self._read_more()
+                continue
+
+            self._pos = end
+            return value
+
+    def _expect(self, char):
+        '''Consumes the next non-whitespace character, which must be char
+
+        '''
+        c = self._peek()
+        if c != char:
+            raise Exception('Invalid GeoJSON: expected \"{}\" but found \"{}\"'.format(char, c))
+        self._pos += 1
+
+    def _peek(self):
+        '''Skips whitespace and returns the next character (not consumed)
+
+        '''
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos].isspace():
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if self._eof:
+                raise Exception('Invalid GeoJSON: unexpected end of input')
+            self._read_more()
+
+    def _read_more(self):
+        '''Discards consumed input and appends the next chunk to the buffer
+
+        Reads at least as much as is already buffered, so that values
+        larger than the chunk size are not re-parsed too many times.
+        '''
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+        if len(self._buffer) >= self._max_value_size:
+            raise Exception('Invalid GeoJSON: value exceeds {} characters'.format(
+                self._max_value_size))
+        size = max(self._chunk_size, len(self._buffer))
+        text = self._f.read(size)
+        if not text:
+            self._eof = True
+        self._buffer += text
@@ -1,6 +1,7 @@
+from .displaymodelcache import DisplayModelCache
 from .geojslayer import GeoJSLayer
 
-class GeoJSOSMLayer:
+class GeoJSOSMLayer(DisplayModelCache):
     """A notebook class for representing OSM layers in GeoJS visualizations.
 
     """
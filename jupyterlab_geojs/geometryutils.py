@@ -0,0 +1,553 @@
+'''Geometry simplification and compact encoding for GeoJSON objects
+
+Lines and polygon rings are simplified with the Douglas-Peucker algorithm.
+To preserve topology between adjacent geometries (e.g., county borders),
+lines and rings are first split into arcs at junctions, which are the
+vertices shared by geometries with different neighbor vertices. Each arc
+is simplified independently, in a canonical direction, so that borders
+shared by multiple geometries are simplified the same way for each one.
+
+The same arcs are used to encode GeoJSON objects as TopoJSON topologies,
+with coordinates quantized to an integer grid and arcs delta-encoded,
+which stores each shared border once.
+'''
+
+import math
+
+# Map size (pixels) at zoom level 0, for web mercator maps
+TILE_SIZE = 256
+
+
+def get_zoom_tolerance(zoom, pixels=1.0, latitude=0.0):
+    '''Returns tolerance (degrees) that corresponds to pixels at zoom level
+
+    @param zoom: (number) map zoom level
+    @param pixels: (number) tolerance in screen pixels
+    @param latitude: (number) latitude of the data, because web mercator
+           pixels cover fewer degrees away from the equator
+    '''
+    lat = min(abs(latitude), 85.0)
+    degrees_per_pixel = 360.0 / (TILE_SIZE * 2**zoom)
+    return pixels * degrees_per_pixel * math.cos(math.radians(lat))
+
+
+def get_max_latitude(data):
+    '''Returns the maximum absolute latitude in a GeoJSON object
+
+    '''
+    max_lat = 0.0
+    for geometry in _iter_geometries(data):
+        for position in _iter_positions(geometry.get('coordinates')):
+            max_lat = max(max_lat, abs(position[1]))
+    return max_lat
+
+
+def simplify_points(points, tolerance):
+    '''Returns Douglas-Peucker simplification of a list of positions
+
+    The first and last positions are always kept.
+    '''
+    n = len(points)
+    if n < 3:
+        return list(points)
+
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    tolerance2 = tolerance * tolerance
+    stack = [(0, n-1)]
+    while stack:
+        first, last = stack.pop()
+        x0, y0 = points[first][0], points[first][1]
+        dx = points[last][0] - x0
+        dy = points[last][1] - y0
+        d2 = dx*dx + dy*dy
+
+        # Find the point farthest from segment (first, last)
+        max_dist2 = -1.0
+        index = None
+        for i in range(first+1, last):
+            px = points[i][0] - x0
+            py = points[i][1] - y0
+            if d2 > 0.0:
+                t = max(0.0, min(1.0, (px*dx + py*dy) / d2))
+                px -= t * dx
+                py -= t * dy
+            dist2 = px*px + py*py
+            if dist2 > max_dist2:
+                max_dist2 = dist2
+                index = i
+
+        if index is not None and max_dist2 > tolerance2:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [point for point, k in zip(points, keep) if k]
+
+
+def simplify_geojson(data, tolerance):
+    '''Returns copy of GeoJSON object with simplified geometries
+
+    @param data: GeoJSON object (dict)
+    @param tolerance: (number) maximum distance, in coordinate units,
+           between the original and simplified geometries
+
+    Polygon rings that collapse to fewer than 3 vertices are removed,
+    as are polygons without exterior rings and features whose geometry
+    becomes empty. Point geometries are not changed.
+    '''
+    lines = list()
+    for geometry in _iter_geometries(data):
+        lines.extend(_get_lines(geometry))
+    junctions = _find_junctions(lines)
+    return _Simplifier(tolerance, junctions).simplify_object(data)
+
+
+class _Simplifier:
+    ''''''
+    def __init__(self, tolerance, junctions):
+        self._tolerance = tolerance
+        self._junctions = junctions
+
+    def simplify_object(self, obj):
+        '''Returns simplified copy of GeoJSON object, or None if empty
+
+        '''
+        obj_type = obj.get('type')
+        if obj_type == 'FeatureCollection':
+            result = dict(obj)
+            features = [self.simplify_object(f) for f in obj.get('features', [])]
+            result['features'] = [f for f in features if f is not None]
+            return result
+        elif obj_type == 'Feature':
+            geometry = obj.get('geometry')
+            if geometry is None:
+                return obj
+            geometry = self.simplify_geometry(geometry)
+            if geometry is None:
+                return None
+            result = dict(obj)
+            result['geometry'] = geometry
+            return result
+        return self.simplify_geometry(obj)
+
+    def simplify_geometry(self, geometry):
+        '''Returns simplified copy of geometry, or None if empty
+
+        '''
+        geom_type = geometry.get('type')
+        coords = geometry.get('coordinates')
+        if geom_type == 'LineString':
+            coords = self._simplify_line(coords, False)
+        elif geom_type == 'MultiLineString':
+            coords = [self._simplify_line(line, False) for line in coords]
+        elif geom_type == 'Polygon':
+            coords = self._simplify_polygon(coords)
+        elif geom_type == 'MultiPolygon':
+            polygons = [self._simplify_polygon(polygon) for polygon in coords]
+            coords = [polygon for polygon in polygons if polygon]
+        elif geom_type == 'GeometryCollection':
+            result = dict(geometry)
+            geometries = [self.simplify_geometry(g) for g in geometry.get('geometries', [])]
+            result['geometries'] = [g for g in geometries if g is not None]
+            return result if result['geometries'] else None
+        else:
+            # Points are not simplified
+            return geometry
+
+        if not coords:
+            return None
+        result = dict(geometry)
+        result['coordinates'] = coords
+        return result
+
+    def _simplify_polygon(self, rings):
+        '''Returns simplified rings, or empty list if exterior ring collapses
+
+        '''
+        result = list()
+        for i, ring in enumerate(rings):
+            ring = self._simplify_line(ring, True)
+            if len(ring) >= 4:
+                result.append(ring)
+            elif i == 0:
+                return []
+        return result
+
+    def _simplify_line(self, line, is_ring):
+        '''Simplifies line or ring one arc at a time, keeping junctions
+
+        '''
+        if len(line) < 3:
+            return list(line)
+        arcs = _split_line(line, is_ring, self._junctions)
+        result = [arcs[0][0]]
+        for arc in arcs:
+            result.extend(self._simplify_arc(arc)[1:])
+        return result
+
+    def _simplify_arc(self, arc):
+        '''Simplifies arc in canonical direction, so that shared arcs match
+
+        '''
+        if _key(arc[-1]) < _key(arc[0]):
+            return simplify_points(arc[::-1], self._tolerance)[::-1]
+        return simplify_points(arc, self._tolerance)
+
+
+def encode_topology(data, quantization=100000):
+    '''Returns TopoJSON topology for GeoJSON object
+
+    @param data: GeoJSON object (dict)
+    @param quantization: (int) number of grid values along each axis
+
+    The input is stored as object "data" in the topology, as a geometry
+    collection for feature collections. Coordinates are 2D: z values are
+    not included. Rings that collapse to fewer than 3 grid points are
+    removed, the same as in simplify_geojson().
+    '''
+    quantization = int(quantization)
+    if quantization < 2:
+        raise Exception('Invalid quantization {}'.format(quantization))
+
+    # Transform from grid to data coordinates
+    bounds = get_bounds(data)
+    if bounds is None:
+        translate = [0.0, 0.0]
+        scale = [1.0, 1.0]
+    else:
+        x0, y0, x1, y1 = bounds
+        translate = [x0, y0]
+        scale = [
+            (x1 - x0) / (quantization - 1) if x1 > x0 else 1.0,
+            (y1 - y0) / (quantization - 1) if y1 > y0 else 1.0
+        ]
+    return _TopologyEncoder(translate, scale).encode(data)
+
+
+def decode_topology(topology):
+    '''Returns GeoJSON object for topology created by encode_topology()
+
+    '''
+    scale = topology['transform']['scale']
+    translate = topology['transform']['translate']
+    def decode_position(position):
+        return [position[0]*scale[0] + translate[0], position[1]*scale[1] + translate[1]]
+
+    # Decode arcs from deltas to absolute coordinates
+    arcs = list()
+    for arc in topology['arcs']:
+        x = y = 0
+        decoded = list()
+        for dx, dy in arc:
+            x += dx
+            y += dy
+            decoded.append(decode_position([x, y]))
+        arcs.append(decoded)
+
+    def decode_line(indices):
+        coords = list()
+        for i, index in enumerate(indices):
+            arc = arcs[~index][::-1] if index < 0 else arcs[index]
+            coords.extend(arc if i == 0 else arc[1:])
+        return coords
+
+    def decode_geometry(obj):
+        geom_type = obj.get('type')
+        if geom_type == 'Point':
+            coords = decode_position(obj['coordinates'])
+        elif geom_type == 'MultiPoint':
+            coords = [decode_position(p) for p in obj['coordinates']]
+        elif geom_type == 'LineString':
+            coords = decode_line(obj['arcs'])
+        elif geom_type in ['MultiLineString', 'Polygon']:
+            coords = [decode_line(line) for line in obj['arcs']]
+        elif geom_type == 'MultiPolygon':
+            coords = [[decode_line(ring) for ring in polygon] for polygon in obj['arcs']]
+        elif geom_type == 'GeometryCollection':
+            geometries = [decode_geometry(g) for g in obj['geometries']]
+            return {'type': geom_type, 'geometries': geometries}
+        else:
+            return None
+        return {'type': geom_type, 'coordinates': coords}
+
+    def decode_feature(obj):
+        feature = {
+            'type': 'Feature',
+            'properties': obj.get('properties', {}),
+            'geometry': decode_geometry(obj)
+        }
+        if 'id' in obj:
+            feature['id'] = obj['id']
+        return feature
+
+    obj = topology['objects']['data']
+    if obj.get('type') == 'GeometryCollection':
+        return {
+            'type': 'FeatureCollection',
+            'features': [decode_feature(g) for g in obj['geometries']]
+        }
+    return decode_feature(obj)
+
+
+class _TopologyEncoder:
+    ''''''
+    def __init__(self, translate, scale):
+        self._translate = translate
+        self._scale = scale
+        self._junctions = None
+        self._arcs = list()
+        self._arc_indices = dict()
+
+    def encode(self, data):
+        '''Returns topology for GeoJSON object
+
+        '''
+        # Find junctions between the quantized lines
+        lines = list()
+        for geometry in _iter_geometries(data):
+            for line, is_ring in _get_lines(geometry):
+                line = self._quantize_line(line)
+                if len(line) >= (4 if is_ring else 2):
+                    lines.append((line, is_ring))
+        self._junctions = _find_junctions(lines)
+
+        data_type = data.get('type')
+        if data_type == 'FeatureCollection':
+            obj = {
+                'type': 'GeometryCollection',
+                'geometries': [self._encode_feature(f) for f in data.get('features', [])]
+            }
+        elif data_type == 'Feature':
+            obj = self._encode_feature(data)
+        else:
+            obj = self._encode_geometry(data)
+
+        return {
+            'type': 'Topology',
+            'transform': {'scale': self._scale, 'translate': self._translate},
+            'arcs': self._arcs,
+            'objects': {'data': obj}
+        }
+
+    def _encode_feature(self, feature):
+        ''''''
+        geometry = feature.get('geometry')
+        obj = self._encode_geometry(geometry) if geometry is not None else {'type': None}
+        obj['properties'] = feature.get('properties') or {}
+        if 'id' in feature:
+            obj['id'] = feature['id']
+        return obj
+
+    def _encode_geometry(self, geometry):
+        ''''''
+        geom_type = geometry.get('type')
+        coords = geometry.get('coordinates')
+        obj = {'type': geom_type}
+        if geom_type == 'Point':
+            obj['coordinates'] = list(self._quantize(coords))
+        elif geom_type == 'MultiPoint':
+            obj['coordinates'] = [list(self._quantize(p)) for p in coords]
+        elif geom_type == 'LineString':
+            obj['arcs'] = self._encode_line(coords)
+        elif geom_type == 'MultiLineString':
+            obj['arcs'] = [self._encode_line(line) for line in coords]
+        elif geom_type == 'Polygon':
+            obj['arcs'] = self._encode_polygon(coords)
+        elif geom_type == 'MultiPolygon':
+            polygons = [self._encode_polygon(polygon) for polygon in coords]
+            obj['arcs'] = [polygon for polygon in polygons if polygon]
+        elif geom_type == 'GeometryCollection':
+            obj['geometries'] = [self._encode_geometry(g) for g in geometry.get('geometries', [])]
+        else:
+            raise Exception('Unrecognized geometry type {}'.format(geom_type))
+        return obj
+
+    def _encode_polygon(self, rings):
+        '''Returns list of arc indices for each ring
+
+        Returns empty list if exterior ring collapses
+        '''
+        result = list()
+        for i, ring in enumerate(rings):
+            ring = self._quantize_line(ring)
+            if len(ring) >= 4:
+                result.append(self._encode_arcs(ring, True))
+            elif i == 0:
+                return []
+        return result
+
+    def _encode_line(self, line):
+        '''Returns list of arc indices for line string
+
+        '''
+        line = self._quantize_line(line)
+        if len(line) == 1:
+            line = line * 2
+        return self._encode_arcs(line, False)
+
+    def _encode_arcs(self, line, is_ring):
+        '''Returns list of arc indices for quantized line
+
+        Negative indices (~index) denote arcs that are reversed.
+        '''
+        indices = list()
+        for arc in _split_line(line, is_ring, self._junctions):
+            key = tuple(arc)
+            if key in self._arc_indices:
+                indices.append(self._arc_indices[key])
+                continue
+            reverse_key = key[::-1]
+            if reverse_key in self._arc_indices:
+                indices.append(~self._arc_indices[reverse_key])
+                continue
+
+            # Add delta-encoded arc
+            index = len(self._arcs)
+            self._arc_indices[key] = index
+            deltas = [list(arc[0])]
+            for prev, position in zip(arc, arc[1:]):
+                deltas.append([position[0] - prev[0], position[1] - prev[1]])
+            self._arcs.append(deltas)
+            indices.append(index)
+        return indices
+
+    def _quantize(self, position):
+        '''Returns grid point (tuple) for position
+
+        '''
+        return (
+            int(round((position[0] - self._translate[0]) / self._scale[0])),
+            int(round((position[1] - self._translate[1]) / self._scale[1]))
+        )
+
+    def _quantize_line(self, line):
+        '''Returns list of grid points, without consecutive duplicates
+
+        '''
+        result = list()
+        for position in line:
+            point = self._quantize(position)
+            if not result or point != result[-1]:
+                result.append(point)
+        return result
+
+
+def _key(position):
+    return (position[0], position[1])
+
+
+def get_bounds(data):
+    '''Returns [xmin, ymin, xmax, ymax] of GeoJSON object, or None if empty
+
+    '''
+    bounds = None
+    for geometry in _iter_geometries(data):
+        for position in _iter_positions(geometry.get('coordinates')):
+            x, y = position[0], position[1]
+            if bounds is None:
+                bounds = [x, y, x, y]
+            else:
+                bounds = [min(bounds[0], x), min(bounds[1], y), max(bounds[2], x), max(bounds[3], y)]
+    return bounds
+
+
+def _split_line(line, is_ring, junctions):
+    '''Splits line or ring into arcs at junctions
+
+    Rings are rotated to start at a junction, or else at their smallest
+    vertex, so that the same ring is always split the same way.
+    '''
+    if len(line) < 3:
+        return [list(line)]
+    if is_ring:
+        ring = line[:-1]
+        start = None
+        for i, position in enumerate(ring):
+            if _key(position) in junctions:
+                start = i
+                break
+        if start is None:
+            start = min(range(len(ring)), key=lambda i: _key(ring[i]))
+        ring = ring[start:] + ring[:start]
+        line = ring + [ring[0]]
+
+    last = len(line) - 1
+    splits = [i for i, position in enumerate(line) \
+        if i == 0 or i == last or _key(position) in junctions]
+    return [line[first:end+1] for first, end in zip(splits, splits[1:])]
+
+
+def _find_junctions(lines):
+    '''Returns set of position keys where lines and rings must be split
+
+    A vertex is a junction if it is a line endpoint, or if it has different
+    neighbor vertices in different lines/rings (or in the same one).
+    '''
+    neighbors = dict()
+    junctions = set()
+    for line, is_ring in lines:
+        n = len(line)
+        for i, position in enumerate(line):
+            key = _key(position)
+            if is_ring:
+                if i == n-1:
+                    continue  # closing position is same as first
+                prev_position = line[i-1] if i > 0 else line[n-2]
+            elif i == 0 or i == n-1:
+                junctions.add(key)
+                continue
+            else:
+                prev_position = line[i-1]
+            pair = frozenset([_key(prev_position), _key(line[i+1])])
+            if neighbors.setdefault(key, pair) != pair:
+                junctions.add(key)
+    return junctions
+
+
+def _get_lines(geometry):
+    '''Returns list of (positions, is_ring) for a geometry
+
+    '''
+    geom_type = geometry.get('type')
+    coords = geometry.get('coordinates')
+    if geom_type == 'LineString':
+        return [(coords, False)]
+    elif geom_type == 'MultiLineString':
+        return [(line, False) for line in coords]
+    elif geom_type == 'Polygon':
+        return [(ring, True) for ring in coords if len(ring) > 2]
+    elif geom_type == 'MultiPolygon':
+        return [(ring, True) for polygon in coords for ring in polygon if len(ring) > 2]
+    return []
+
+
+def _iter_geometries(obj):
+    '''Generator yielding each (non-collection) geometry in a GeoJSON object
+
+    '''
+    obj_type = obj.get('type')
+    if obj_type == 'FeatureCollection':
+        for feature in obj.get('features', []):
+            yield from _iter_geometries(feature)
+    elif obj_type == 'Feature':
+        if obj.get('geometry') is not None:
+            yield from _iter_geometries(obj['geometry'])
+    elif obj_type == 'GeometryCollection':
+        for geometry in obj.get('geometries', []):
+            yield from _iter_geometries(geometry)
+    elif obj_type is not None:
+        yield obj
+
+
+def _iter_positions(coords):
+    '''Generator yielding each position in (nested) coordinates
+
+    '''
+    if not coords:
+        return
+    if isinstance(coords[0], (list, tuple)):
+        for item in coords:
+            yield from _iter_positions(item)
+    else:
+        yield coords
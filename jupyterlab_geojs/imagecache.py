@@ -0,0 +1,136 @@
+'''On-disk cache for encoded images
+
+Cache entries are files named by the SHA-1 hash of their key, which is
+any JSON-able list, e.g., source path, mtime, size and encoding options.
+Reading an entry updates its file modified time, so that entries can be
+evicted in least-recently-used order when the cache exceeds its size limit.
+The cache keeps a running total of the entry sizes, so the folder is only
+listed when the total exceeds the size limit, or every RESCAN_PUTS puts
+(to account for entries added or removed by other processes).
+'''
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+# Number of puts between rescans of the cache folder
+RESCAN_PUTS = 100
+
+
+class ImageCache:
+    '''LRU cache of image files (bytes)
+
+    @param folder: (string) directory to store cache files
+    @param max_bytes: (int) size limit for the cache contents
+    '''
+    def __init__(self, folder, max_bytes=256*1024*1024):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._total_bytes = None  # unknown until the folder is scanned
+        self._put_count = 0
+
+    def get(self, key):
+        '''Returns cached bytes for key, or None if not in cache
+
+        '''
+        if not self.enabled:
+            return None
+        path = self._get_path(key)
+        try:
+            with open(path, 'rb') as f:
+                contents = f.read()
+            os.utime(path)  # mark as recently used
+        except OSError:
+            return None
+        return contents
+
+    def put(self, key, contents):
+        '''Adds bytes to the cache, then evicts entries if over the size limit
+
+        '''
+        if not self.enabled:
+            return
+        os.makedirs(self.folder, exist_ok=True)
+
+        # Write to temp file first, so that readers never see partial files
+        path = self._get_path(key)
+        temp_path = '{}.{}.tmp'.format(path, uuid.uuid4().hex)
+        with open(temp_path, 'wb') as f:
+            f.write(contents)
+        try:
+            replaced_bytes = os.stat(path).st_size
+        except OSError:
+            replaced_bytes = 0
+        os.replace(temp_path, path)
+
+        with self._lock:
+            self._put_count += 1
+            if self._total_bytes is not None:
+                self._total_bytes += len(contents) - replaced_bytes
+            rescan = self._total_bytes is None or \
+                self._total_bytes > self.max_bytes or self._put_count % RESCAN_PUTS == 0
+        if rescan:
+            self.evict()
+
+    def clear(self):
+        '''Removes all cache entries
+
+        '''
+        with self._lock:
+            for path, stat in self._list_entries():
+                self._remove(path)
+            self._total_bytes = 0
+
+    def evict(self):
+        '''Removes least-recently-used entries until cache is within max_bytes
+
+        '''
+        with self._lock:
+            entries = self._list_entries()
+            total_bytes = sum(stat.st_size for path,stat in entries)
+            if total_bytes > self.max_bytes:
+                entries.sort(key=lambda entry: entry[1].st_mtime)
+                for path, stat in entries:
+                    if total_bytes <= self.max_bytes:
+                        break
+                    self._remove(path)
+                    total_bytes -= stat.st_size
+            self._total_bytes = total_bytes
+
+    def get_size(self):
+        '''Returns total size (bytes) of cache entries
+
+        '''
+        return sum(stat.st_size for path,stat in self._list_entries())
+
+    def _get_path(self, key):
+        key_string = json.dumps(key, sort_keys=True)
+        digest = hashlib.sha1(key_string.encode('utf-8')).hexdigest()
+        return os.path.join(self.folder, '{}.cache'.format(digest))
+
+    def _list_entries(self):
+        '''Returns list of (path, os.stat_result) for cache entries
+
+        '''
+        if not os.path.isdir(self.folder):
+            return []
+        entries = list()
+        for name in os.listdir(self.folder):
+            if not name.endswith('.cache'):
+                continue
+            path = os.path.join(self.folder, name)
+            try:
+                entries.append((path, os.stat(path)))
+            except OSError:
+                pass  # removed by another process
+        return entries
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # removed by another process
@@ -2,12 +2,56 @@
    LAS/LAZ input data.
 '''
 
+import json
 import os
 import pkg_resources
 import struct
 import sys
+import threading
 import uuid
 
+try:
+    pkg_resources.get_distribution('numpy')
+except pkg_resources.DistributionNotFound:
+    HAS_NUMPY = False
+else:
+    HAS_NUMPY = True
+    import numpy as np
+
+
+try:
+    pkg_resources.get_distribution('laspy')
+except pkg_resources.DistributionNotFound:
+    HAS_LASPY = False
+else:
+    HAS_LASPY = True
+    import laspy
+
+# Default number of point records read at a time
+POINT_CHUNK_SIZE = 1000000
+
+
+def is_numpy_loaded():
+    return HAS_NUMPY
+
+
+def is_laz_supported():
+    '''Returns boolean indicating whether laz data can be decompressed
+
+    Requires numpy and laspy, with a laz backend (lazrs or laszip)
+    '''
+    return HAS_NUMPY and HAS_LASPY and bool(laspy.LazBackend.detect_available())
+
+
+# Precompiled layouts (little endian, no padding) of the public header
+# block fields through version 1.2, the version 1.3 and 1.4 additions,
+# and the variable length record header
+_header_struct = struct.Struct('<4sHH16sBB32s32sHHHIIBHI5I3d3d6d')
+_header_13_struct = struct.Struct('<Q')
+_header_14_struct = struct.Struct('<QIQ5Q')
+_vlr_header_struct = struct.Struct('<H16sHH32s')
+
+
 class LASHeader:
     '''Data representing LAS public header block
 
@@ -80,6 +124,117 @@ class LASMetadata:
         self.header = None
         self.projection_wkt = None
 
+    def to_dict(self):
+        '''Returns json-serializable dictionary of the metadata
+
+        '''
+        header = dict()
+        for key, value in self.header.__dict__.items():
+            if isinstance(value, bytes):
+                value = value.decode('ascii')
+            elif isinstance(value, uuid.UUID):
+                value = str(value)
+            elif isinstance(value, tuple):
+                value = list(value)
+            header[key] = value
+        return {'header': header, 'projection_wkt': self.projection_wkt}
+
+    @classmethod
+    def from_dict(cls, data):
+        '''Returns new LASMetadata instance from to_dict() output
+
+        '''
+        h = LASHeader()
+        for key, value in data['header'].items():
+            if key == 'file_signature':
+                value = value.encode('ascii')
+            elif key == 'project_guid':
+                value = uuid.UUID(value)
+            elif isinstance(value, list):
+                value = tuple(value)
+            setattr(h, key, value)
+
+        metadata = cls()
+        metadata.header = h
+        metadata.projection_wkt = data.get('projection_wkt')
+        return metadata
+
+
+class LASHeaderCache:
+    '''Sidecar file caching the metadata of LAS/LAZ files
+
+    @param path: (string) cache file (json)
+
+    Entries are keyed by file path, and are only used if the file's
+    modified time and size are unchanged. Call save() to write updates.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self._entries = dict()
+        self._modified = False
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            pass  # missing or invalid cache file is rebuilt
+
+    def get(self, filename, stat=None):
+        '''Returns cached LASMetadata for file, or None if not current
+
+        '''
+        stat = os.stat(filename) if stat is None else stat
+        with self._lock:
+            entry = self._entries.get(os.path.abspath(filename))
+        if entry is None or entry.get('mtime') != stat.st_mtime or \
+            entry.get('size') != stat.st_size:
+            return None
+        return LASMetadata.from_dict(entry['metadata'])
+
+    def put(self, filename, metadata, stat=None):
+        '''Adds metadata for file
+
+        '''
+        stat = os.stat(filename) if stat is None else stat
+        entry = {
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'metadata': metadata.to_dict()
+        }
+        with self._lock:
+            self._entries[os.path.abspath(filename)] = entry
+            self._modified = True
+
+    def save(self):
+        '''Writes cache file, if any entries were added
+
+        '''
+        with self._lock:
+            if not self._modified:
+                return
+            # Write to temp file first, so that readers never see partial files
+            temp_path = '{}.{}.tmp'.format(self.path, uuid.uuid4().hex)
+            with open(temp_path, 'w') as f:
+                json.dump(self._entries, f)
+            os.replace(temp_path, self.path)
+            self._modified = False
+
+
+def read_metadata(filename, cache=None):
+    '''Returns LASMetadata for LAS/LAZ file
+
+    @param filename: (string) input file
+    @param cache: (LASHeaderCache) optional cache to check and update
+    '''
+    stat = os.stat(filename) if cache is not None else None
+    metadata = cache.get(filename, stat) if cache is not None else None
+    if metadata is None:
+        with open(filename, 'rb') as f:
+            metadata = LASParser().parse(f)
+        if cache is not None:
+            cache.put(filename, metadata, stat)
+    return metadata
+
 
 class LASParser:
     '''Parser for LAS/LAZ header and vlr blocks
@@ -110,134 +265,75 @@ class LASParser:
         return metadata
 
     def _parse_header(self, f):
-
         '''Reads public header block
 
-        Uses brute force to unpack the contents.
+        Unpacks the contents with precompiled struct layouts.
         Sets input file pointer to the end of the header.
         '''
         h = LASHeader()
 
-        # Read up to header size field
-        first_block_size = 96
-
         f.seek(0, 0)   # make sure stream is reset
-        blob = f.read(first_block_size)
-        pos = 0
-
-        h.file_signature = struct.unpack_from('4s', blob, pos)[0]
-        pos += 4
-        if h.file_signature != 'LASF'.encode():
+        blob = f.read(_header_struct.size)
+        if len(blob) < 4 or blob[:4] != 'LASF'.encode():
             raise Exception('Not a LAS/LAZ file.  Invalid file signature.')
-
-        h.file_source_id,h.global_encoding = struct.unpack_from('HH', blob, pos)
-        pos += 4
-
-        h.project_guid = uuid.UUID(bytes=blob[pos:pos+16])
-        pos += 16
-
-        h.version_major,h.version_minor = struct.unpack_from('BB', blob, pos)
-        pos += 2
-
-        sys_id = struct.unpack_from('32s', blob, pos)[0]
+        if len(blob) < _header_struct.size:
+            raise Exception('Invalid LAS file.  Header is truncated.')
+
+        values = _header_struct.unpack(blob)
+        (h.file_signature, h.file_source_id, h.global_encoding, guid_bytes,
+            h.version_major, h.version_minor, sys_id, gen_sw,
+            h.file_creation_doy, h.file_creation_year, h.header_size,
+            h.offset_to_points, h.number_of_vlr,
+            h.point_data_record_format, h.point_data_record_length,
+            h.legacy_point_count) = values[:16]
+        h.project_guid = uuid.UUID(bytes=guid_bytes)
         h.system_identifier = str(sys_id, encoding='ascii')
-        pos += 32
-
-        gen_sw = struct.unpack_from('32s', blob, pos)[0]
         h.generating_software = str(gen_sw, encoding='ascii')
-        pos += 32
-
-        h.file_creation_doy,h.file_creation_year = struct.unpack_from('HH', blob, pos)
-        pos += 4
-
-        h.header_size = struct.unpack_from('H', blob, pos)[0]
-        pos += 2
-        #print('header size {}, currently at pos {}'.format(h.header_size, pos))
+        h.legacy_number_of_points_by_return = values[16:21]
+        h.x_scale_factor,h.y_scale_factor,h.z_scale_factor = values[21:24]
+        h.x_offset,h.y_offset,h.z_offset = values[24:27]
+        h.max_x,h.min_x,h.max_y,h.min_y,h.max_z,h.min_z = values[27:33]
 
-
-        # Read rest of header and reset pos
-        next_block_size = h.header_size - first_block_size
-        blob = f.read(next_block_size)
+        # Read rest of header (version 1.3 and later fields)
+        blob = f.read(h.header_size - _header_struct.size)
         pos = 0
 
-
-        h.offset_to_points = struct.unpack_from('I', blob, pos)[0]
-        pos += 4
-
-        h.number_of_vlr = struct.unpack_from('I', blob, pos)[0]
-        pos += 4
-
-        h.point_data_record_format,h.point_data_record_length = struct.unpack_from('BH', blob, pos)
-        pos += 3
-
-        h.legacy_point_count = struct.unpack_from('I', blob, pos)[0]
-        pos += 4
-
-        h.legacy_number_of_points_by_return = struct.unpack_from('IIIII', blob, pos)
-        pos += 20
-
-        h.x_scale_factor,h.y_scale_factor,h.z_scale_factor = struct.unpack_from('ddd', blob, pos)
-        pos += 24
-        h.x_offset,h.y_offset,h.z_offset = struct.unpack_from('ddd', blob, pos)
-        pos += 24
-
-        h.max_x,h.min_x,h.max_y,h.min_y,h.max_z,h.min_z = struct.unpack_from('dddddd', blob, pos)
-        pos += 48
-
         if h.version_major >= 1 and h.version_minor >= 3:
-            h.start_of_waveform_packet_records = struct.unpack_from('Q', blob, pos)[0]
-            pos += 8
-            #print('Block1.3 pos', pos)
+            h.start_of_waveform_packet_records = _header_13_struct.unpack_from(blob, pos)[0]
+            pos += _header_13_struct.size
 
         if h.version_major >= 1 and h.version_minor >= 4:
-            h.evlr_offset,h.evlr_length = struct.unpack_from('QI', blob, pos)
-            pos += 12
-
-            h.number_of_point_records = struct.unpack_from('Q', blob, pos)[0]
-            pos += 8
-
-            h.number_of_points_by_return = struct.unpack_from('QQQQQ', blob, pos)
-            pos += 40
+            values = _header_14_struct.unpack_from(blob, pos)
+            h.evlr_offset,h.evlr_length,h.number_of_point_records = values[:3]
+            h.number_of_points_by_return = values[3:8]
 
-        #print('Final pos', pos)
         self._header = h
         return h
 
     def _parse_vlrs(self, f):
         '''Read variable length records looking for spatial coord system
 
+        Reads all of the VLR data in one block, to minimize the number of
+        reads from the input stream.
         NOTE: The input file refernce (f) MUST be set to the start of the VLR records
         '''
-        # Initialize Struct to unpack VLR headers
-        vlr_header_struct = struct.Struct('H16sHH32s')
-        #print('vlr_header_struct.size: {}'.format(vlr_header_struct.size))
+        block = f.read(max(0, self._header.offset_to_points - self._header.header_size))
+        pos = 0
         for i in range(self._header.number_of_vlr):
-            block = f.read(vlr_header_struct.size)
-            vlr_header_tuple = vlr_header_struct.unpack(block)
-            #print('vlr_header_tuple {}'.format(i+1))
-
+            if pos + _vlr_header_struct.size > len(block):
+                break
             reserved, user_id_bytes, record_id, record_length, description_bytes = \
-                vlr_header_tuple
-            # Convert text items (bytes to string)
-            user_id = self._bytes_to_string(user_id_bytes)
-            description = self._bytes_to_string(description_bytes)
-            # print('  user_id:       {}'.format(user_id))
-            # print('  record_id:     {}'.format(record_id))
-            # print('  record_length: {}'.format(record_length))
-            # print('  descripton:    {}'.format(description))
+                _vlr_header_struct.unpack_from(block, pos)
+            pos += _vlr_header_struct.size
 
             # Read record 2112 to get coord system wkt
+            user_id = self._bytes_to_string(user_id_bytes)
             if user_id == 'LASF_Projection' and record_id == 2112:
-                payload = f.read(record_length)
+                payload = block[pos:pos+record_length]
                 self._projection_wkt = self._bytes_to_string(payload)
-                # print('coord_sys wkt:')
-                # print(self._projection_wkt)
-                # print()
 
             # Otherwise skip over
-            else:
-                f.seek(record_length, 1)
-                # payload = f.read(record_length)
+            pos += record_length
 
     def _bytes_to_string(self, input_bytes, rstrip=True, encoding='ascii'):
         '''Convert input bytes to ascii string
@@ -251,6 +347,363 @@ class LASParser:
         return output_string
 
 
+def get_point_count(header):
+    '''Returns number of point records from LASHeader
+
+    '''
+    if header.legacy_point_count:
+        return header.legacy_point_count
+    return header.number_of_point_records or 0
+
+
+def get_point_dtype(point_data_record_format, point_data_record_length=None):
+    '''Returns numpy structured dtype for point data record formats 0-3
+
+    @param point_data_record_format: (int) LAS point format
+    @param point_data_record_length: (int) record size in bytes, which can
+           be larger than the standard size when records have extra bytes
+    The X, Y, Z fields are the raw (unscaled) integer values. The bit
+    fields (return number, number of returns, scan direction flag, edge
+    of flight line) are packed in the "flags" field.
+    '''
+    if not HAS_NUMPY:
+        raise Exception('Cannot read LAS points because numpy not installed')
+    if point_data_record_format not in LASPointFields:
+        raise Exception('Unsupported point record format {}'.format(point_data_record_format))
+
+    names = list()
+    formats = list()
+    offsets = list()
+    offset = 0
+    for name, field_format in LASPointFields[point_data_record_format]:
+        names.append(name)
+        formats.append(field_format)
+        offsets.append(offset)
+        offset += np.dtype(field_format).itemsize
+
+    itemsize = offset
+    if point_data_record_length is not None:
+        if point_data_record_length < offset:
+            raise Exception('Invalid point record length {} for format {}'.format(
+                point_data_record_length, point_data_record_format))
+        itemsize = point_data_record_length
+    return np.dtype(dict(names=names, formats=formats, offsets=offsets, itemsize=itemsize))
+
+
+class LASPointReader:
+    '''Reader for LAS/LAZ point data records (formats 0-3)
+
+    @param filename: (string) LAS or LAZ file
+    @param metadata: (LASMetadata) parsed header, if already available
+
+    For LAS files, the point block is mapped as a numpy structured array,
+    so records are only read from disk when accessed. Coordinates are
+    scaled and offset when requested, and only for the requested points.
+
+    LAZ (compressed) files, which require laspy, only support sequential
+    access: iter_chunks() and iter_selected() decompress one chunk of
+    records at a time, so that memory use is bounded by the chunk size.
+    Records of selected points can be kept in memory with keep_selected(),
+    so that they are not decompressed again.
+    '''
+    def __init__(self, filename, metadata=None):
+        if not HAS_NUMPY:
+            raise Exception('Cannot read LAS points because numpy not installed')
+
+        if metadata is None:
+            metadata = read_metadata(filename)
+        h = metadata.header
+        # LAZ headers add 128 to the point data record format
+        self.compressed = h.point_data_record_format >= 128
+        if self.compressed and not is_laz_supported():
+            raise Exception('Cannot read laz/compressed point data because laspy not installed')
+
+        self.filename = filename
+        self.metadata = metadata
+        self._dtype = get_point_dtype(
+            h.point_data_record_format % 128, h.point_data_record_length)
+        self._point_count = get_point_count(h)
+        self._records = None
+        self._kept = None  # (indices, records) from keep_selected()
+
+    def __len__(self):
+        return self._point_count
+
+    def get_records(self):
+        '''Returns point records as (read-only) numpy structured array
+
+        Not supported for compressed data; use iter_chunks() instead.
+        '''
+        if self.compressed:
+            raise Exception('Random access not supported for laz/compressed point data')
+        if self._records is None:
+            if self._point_count == 0:
+                self._records = np.zeros(0, dtype=self._dtype)
+            else:
+                self._records = np.memmap(self.filename, dtype=self._dtype, mode='r',
+                    offset=self.metadata.header.offset_to_points, shape=(self._point_count,))
+        return self._records
+
+    def iter_chunks(self, chunk_size=POINT_CHUNK_SIZE):
+        '''Generator yielding (start index, records array) for consecutive chunks
+
+        '''
+        if not self.compressed:
+            records = self.get_records()
+            for start in range(0, len(records), chunk_size):
+                yield start, records[start:start + chunk_size]
+            return
+
+        start = 0
+        with laspy.open(self.filename) as las:
+            for points in las.chunk_iterator(chunk_size):
+                yield start, self._convert_laspy_records(points.array)
+                start += len(points)
+
+    def iter_selected(self, indices=None, chunk_size=POINT_CHUNK_SIZE):
+        '''Generator yielding (indices, records array) for selected points
+
+        @param indices: sorted index array (default is all points)
+        Points are read chunk by chunk, and only chunks that contain
+        selected points are returned. Compressed data is only decompressed
+        up to the last selected point, and not at all if the selected
+        points are a subset of the points passed to keep_selected().
+        '''
+        if indices is None:
+            for start, records in self.iter_chunks(chunk_size):
+                yield np.arange(start, start + len(records)), records
+            return
+
+        if not self.compressed:
+            # (Random access, so only the selected records are read)
+            records = self.get_records()
+            for start in range(0, len(indices), chunk_size):
+                chunk_indices = indices[start:start + chunk_size]
+                yield chunk_indices, records[chunk_indices]
+            return
+
+        if len(indices) == 0:
+            return
+        positions = self._find_kept(indices)
+        if positions is not None:
+            records = self._kept[1]
+            for start in range(0, len(indices), chunk_size):
+                yield indices[start:start + chunk_size], \
+                    records[positions[start:start + chunk_size]]
+            return
+
+        chunks = self.iter_chunks(chunk_size)
+        try:
+            for start, records in chunks:
+                lo, hi = np.searchsorted(indices, [start, start + len(records)])
+                if lo < hi:
+                    chunk_indices = indices[lo:hi]
+                    yield chunk_indices, records[chunk_indices - start]
+                if hi == len(indices):
+                    break
+        finally:
+            chunks.close()
+
+    def keep_selected(self, indices, records):
+        '''Keeps records of selected points in memory, for compressed data
+
+        @param indices: sorted index array of the points
+        @param records: records array of the points
+        Later calls to iter_selected() with these points (or a subset)
+        use the kept records, instead of decompressing the file again.
+        One selection is kept, which is only replaced by selections that
+        are not a subset of it. Uncompressed data is not kept, because it
+        supports random access.
+        '''
+        if not self.compressed:
+            return
+        if len(indices) == 0 or self._find_kept(indices) is not None:
+            return
+        self._kept = (indices, records)
+
+    def _find_kept(self, indices):
+        '''Returns positions of indices in the kept selection, or None if not kept
+
+        '''
+        if self._kept is None or len(self._kept[0]) == 0:
+            return None
+        kept_indices = self._kept[0]
+        positions = np.searchsorted(kept_indices, indices)
+        if positions[-1] >= len(kept_indices) or \
+            not np.array_equal(kept_indices[positions], indices):
+            return None
+        return positions
+
+    def scale_xyz(self, records):
+        '''Returns scaled coordinates of records as (N,3) float64 array
+
+        '''
+        h = self.metadata.header
+        return np.column_stack([
+            records['X'] * h.x_scale_factor + h.x_offset,
+            records['Y'] * h.y_scale_factor + h.y_offset,
+            records['Z'] * h.z_scale_factor + h.z_offset])
+
+    def get_las_bytes(self, indices=None):
+        '''Returns contents of a LAS file (bytes) with the selected points
+
+        @param indices: optional sorted index array or mask selecting the points
+        The header and VLRs are copied from the input file, with the point
+        counts and bounds updated for the selected points. Compressed input
+        is written as uncompressed (LAS) output.
+        '''
+        if indices is not None:
+            indices = np.asarray(indices)
+            if indices.dtype == bool:
+                indices = np.flatnonzero(indices)
+
+        head = self._get_las_head()
+        raw_type = np.dtype(('V', self._dtype.itemsize))
+        blocks = list()
+        count = 0
+        by_return = np.zeros(16, dtype=np.int64)
+        mins = np.full(3, np.inf)
+        maxs = np.full(3, -np.inf)
+        for chunk_indices, records in self.iter_selected(indices):
+            if len(records) == 0:
+                continue
+            # Copy records as raw bytes, which includes any extra bytes
+            blocks.append(np.ascontiguousarray(records).view(raw_type).tobytes())
+            count += len(records)
+            by_return += np.bincount(records['flags'] & 0x07, minlength=16)[:16]
+            xyz = self.scale_xyz(records)
+            mins = np.minimum(mins, xyz.min(axis=0))
+            maxs = np.maximum(maxs, xyz.max(axis=0))
+
+        by_return = [int(n) for n in by_return[1:]]
+        struct.pack_into('<I5I', head, 107, count, *by_return[:5])
+        if count > 0:
+            struct.pack_into('<6d', head, 179,
+                maxs[0], mins[0], maxs[1], mins[1], maxs[2], mins[2])
+        if self.metadata.header.version_minor >= 4:
+            # Extended vlrs (after the point data) are not copied
+            struct.pack_into('<QIQ15Q', head, 235, 0, 0, count, *by_return)
+        return bytes(head) + b''.join(blocks)
+
+    def _get_las_head(self):
+        '''Returns header and vlr blocks (bytearray) for LAS output
+
+        For compressed input, the laszip vlr is removed and the point
+        data record format is changed to the uncompressed format.
+        '''
+        h = self.metadata.header
+        with open(self.filename, 'rb') as f:
+            head = bytearray(f.read(h.offset_to_points))
+        if not self.compressed:
+            return head
+
+        vlr_blocks = list()
+        pos = h.header_size
+        for i in range(h.number_of_vlr):
+            reserved, user_id_bytes, record_id, record_length, description_bytes = \
+                _vlr_header_struct.unpack_from(head, pos)
+            end = pos + _vlr_header_struct.size + record_length
+            if user_id_bytes.split(b'\0', 1)[0] != b'laszip encoded':
+                vlr_blocks.append(bytes(head[pos:end]))
+            pos = end
+
+        head = head[:h.header_size] + b''.join(vlr_blocks)
+        struct.pack_into('<IIB', head, 96, len(head), len(vlr_blocks),
+            h.point_data_record_format % 128)
+        return head
+
+    def _convert_laspy_records(self, array):
+        '''Returns laspy point array as records array (self._dtype)
+
+        '''
+        if array.dtype.itemsize == self._dtype.itemsize:
+            # Same record layout, so the bytes can be reinterpreted
+            return np.frombuffer(array.tobytes(), dtype=self._dtype)
+
+        records = np.zeros(len(array), dtype=self._dtype)
+        for name in self._dtype.names:
+            records[name] = array[_laspy_field_names.get(name, name)]
+        return records
+
+    def get_x(self, indices=None):
+        '''Returns scaled x coordinates (float64 array)
+
+        @param indices: optional index array, mask or slice to select points
+        '''
+        return self._scale_field('X', indices)
+
+    def get_y(self, indices=None):
+        '''Returns scaled y coordinates (float64 array)
+
+        '''
+        return self._scale_field('Y', indices)
+
+    def get_z(self, indices=None):
+        '''Returns scaled z coordinates (float64 array)
+
+        '''
+        return self._scale_field('Z', indices)
+
+    def get_xyz(self, indices=None):
+        '''Returns scaled coordinates as (N,3) float64 array
+
+        '''
+        return np.column_stack(
+            [self.get_x(indices), self.get_y(indices), self.get_z(indices)])
+
+    def get_field(self, name, indices=None):
+        '''Returns values of one record field, e.g., "intensity"
+
+        '''
+        values = self.get_records()[name]
+        return values if indices is None else values[indices]
+
+    def get_return_numbers(self, indices=None):
+        '''Returns return number (1-5) of each point
+
+        '''
+        return self.get_field('flags', indices) & 0x07
+
+    def get_number_of_returns(self, indices=None):
+        '''Returns number of returns (given pulse) of each point
+
+        '''
+        return (self.get_field('flags', indices) >> 3) & 0x07
+
+    def get_classifications(self, indices=None):
+        '''Returns classification code of each point (without flag bits)
+
+        '''
+        return self.get_field('classification', indices) & 0x1f
+
+    def _scale_field(self, name, indices):
+        h = self.metadata.header
+        axis = name.lower()
+        scale = getattr(h, '{}_scale_factor'.format(axis))
+        offset = getattr(h, '{}_offset'.format(axis))
+        values = self.get_field(name, indices)
+        return values * scale + offset
+
+
+# Names of the laspy point fields that differ from LASPointFields
+_laspy_field_names = {'flags': 'bit_fields', 'classification': 'raw_classification'}
+
+# Field names and numpy formats (little endian) for the point data record
+# formats that can be decoded by LASPointReader
+_LASBaseFields = (
+    ('X', '<i4'), ('Y', '<i4'), ('Z', '<i4'), ('intensity', '<u2'),
+    ('flags', 'u1'), ('classification', 'u1'), ('scan_angle_rank', 'i1'),
+    ('user_data', 'u1'), ('point_source_id', '<u2')
+    )
+_LASGPSFields = (('gps_time', '<f8'),)
+_LASRGBFields = (('red', '<u2'), ('green', '<u2'), ('blue', '<u2'))
+LASPointFields = dict()
+LASPointFields[0] = _LASBaseFields
+LASPointFields[1] = _LASBaseFields + _LASGPSFields
+LASPointFields[2] = _LASBaseFields + _LASRGBFields
+LASPointFields[3] = _LASBaseFields + _LASGPSFields + _LASRGBFields
+
+
 # Transcribe point attribute names for point data record formats,
 # as of July 2018, LAS version 1.4, per https://www.asprs.org
 # Transcribed by hand, so user beware
@@ -1,14 +1,85 @@
 import base64
+from concurrent.futures import ThreadPoolExecutor
 from operator import add
 import os
 
-from . import gdalutils
+from . import gdalutils, lasutils, pointcloudutils, pointoctree
 from .geojsfeature import GeoJSFeature
-from .lasutils import LASMetadata, LASParser, LASPointAttributes
+from .lasutils import HAS_NUMPY, LASHeaderCache, LASPointAttributes, LASPointReader
+if HAS_NUMPY:
+    import numpy as np
 
 class PointCloudFeature(GeoJSFeature):
-    ''''''
+    '''Initialize point cloud feature
+
+    @param data LAS/LAZ filename or list of filenames
+
+    LAZ (compressed) files require laspy. They are decompressed in the
+    kernel, one chunk of points at a time, and sent to the client as LAS
+    data, after any decimation.
+
+    Optional keyword arguments for reading headers of many input files:
+    @param max_workers (int) number of threads used to read the file
+           headers (default: ThreadPoolExecutor default)
+    @param header_cache (string) path of a json file caching the file
+           headers, which are reused while file mtime and size are unchanged
+
+    Optional keyword arguments for filtering the points sent to the
+    client, which require numpy. Points must match all of the filters:
+    @param bbox (list) [xmin, ymin, xmax, ymax] or
+           [xmin, ymin, zmin, xmax, ymax, zmax], in data coordinates
+    @param classifications (list) classification codes, e.g., [2] for ground
+    @param return_numbers (list) return numbers, e.g., [1] for first returns
+    @param intensity_range (list) [min, max] intensity values
+    Filters are evaluated on the point records one chunk at a time, and
+    files whose header bounds are outside bbox are not read.
+
+    Optional keyword arguments for decimating the points sent to the
+    client, which require numpy:
+    @param voxel_size (number) keep one point in each cubic voxel of
+           this size (in data units), for even spatial coverage
+    @param max_points (int) maximum number of points to send; points
+           are selected at random, after any other decimation
+    @param sample_step (int) keep every Nth point
+    Without these options, the input files are sent unchanged.
+
+    Optional keyword arguments for level-of-detail display of large data,
+    which require numpy:
+    @param octree (boolean) build an octree of point chunks, which the
+           client loads progressively, starting with a coarse overview
+           and refining the nodes closest to the camera
+    @param octree_dir (string) folder to write the octree files to. The
+           octree is reused if the input files and options are unchanged.
+    @param octree_url (string) url prefix the client uses to fetch
+           files written to octree_dir, e.g., 'files/octree'
+    @param octree_node_points (int) maximum number of points in leaf
+           nodes (default 100000)
+    Filter and decimation options are applied before building the octree.
+    '''
     def __init__(self, data, **kwargs):
+        # Filter and decimation options are only used in the kernel
+        self._bbox = kwargs.pop('bbox', None)
+        self._classifications = kwargs.pop('classifications', None)
+        self._return_numbers = kwargs.pop('return_numbers', None)
+        self._intensity_range = kwargs.pop('intensity_range', None)
+        self._voxel_size = kwargs.pop('voxel_size', None)
+        self._max_points = kwargs.pop('max_points', None)
+        self._sample_step = kwargs.pop('sample_step', None)
+        self._octree = kwargs.pop('octree', False)
+        self._octree_dir = kwargs.pop('octree_dir', None)
+        self._octree_url = kwargs.pop('octree_url', None)
+        self._octree_node_points = kwargs.pop('octree_node_points', 100000)
+        max_workers = kwargs.pop('max_workers', None)
+        header_cache = kwargs.pop('header_cache', None)
+        if self.is_filtered() and not lasutils.is_numpy_loaded():
+            raise Exception('Cannot filter point cloud because numpy not installed')
+        if self.is_decimated() and not lasutils.is_numpy_loaded():
+            raise Exception('Cannot decimate point cloud because numpy not installed')
+        if self._octree and not lasutils.is_numpy_loaded():
+            raise Exception('Cannot build point cloud octree because numpy not installed')
+        if self._octree and (self._octree_dir is None or self._octree_url is None):
+            raise Exception('Octree display requires octree_dir and octree_url')
+
         super(PointCloudFeature, self).__init__('pointcloud', config_options=False, **kwargs)
 
         # Input source
@@ -32,13 +103,17 @@ class PointCloudFeature(GeoJSFeature):
             if not os.path.exists(f):
                 raise Exception('Cannot find file {}'.format(f))
 
-        # Parse headers to initialize member data
-        parser = LASParser()
-        for i,filename in enumerate(self._filenames):
-            metadata = None
-            with open(filename, 'rb') as instream:
-                metadata = parser.parse(instream)
-                self._check_support(metadata)
+        # Read headers concurrently (file access dominates, e.g., on
+        # network filesystems), then initialize member data
+        cache = LASHeaderCache(header_cache) if header_cache else None
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            self._metadata = list(executor.map(
+                lambda filename: lasutils.read_metadata(filename, cache), self._filenames))
+        if cache is not None:
+            cache.save()
+
+        for i,metadata in enumerate(self._metadata):
+            self._check_support(metadata)
 
             h = metadata.header
             if h.legacy_point_count:
@@ -51,12 +126,12 @@ class PointCloudFeature(GeoJSFeature):
             if self._bounds is None:
                 self._bounds = bounds
             else:
-                for i in [0, 2, 4]:
-                    if bounds[i] < self._bounds[i]:
-                        self._bounds[i] = bounds[i]
-                for i in [1, 3, 5]:
-                    if bounds[i] > self._bounds[i]:
-                        self._bounds[i] = bounds[i]
+                for k in [0, 2, 4]:
+                    if bounds[k] < self._bounds[k]:
+                        self._bounds[k] = bounds[k]
+                for k in [1, 3, 5]:
+                    if bounds[k] > self._bounds[k]:
+                        self._bounds[k] = bounds[k]
 
             # Update point formats
             format = h.point_data_record_format
@@ -130,10 +205,7 @@ class PointCloudFeature(GeoJSFeature):
         if self._projection_wkt is None:
             return None
         elif gdalutils.is_gdal_loaded():
-            from osgeo import osr
-            proj = osr.SpatialReference()
-            proj.ImportFromWkt(this._projection_wkt)
-            return proj.ExportToProj4()
+            return gdalutils.convert_wkt_to_proj(self._projection_wkt)
         else:
             raise Exception('Cannot convert projection because GDAL not installed')
 
@@ -145,6 +217,43 @@ class PointCloudFeature(GeoJSFeature):
         '''
         return self._projection_wkt
 
+    def is_filtered(self):
+        '''Returns boolean indicating if any filter option is set
+
+        '''
+        return any(value is not None for value in self._get_filters().values())
+
+    def is_decimated(self):
+        '''Returns boolean indicating if any decimation option is set
+
+        '''
+        return self._voxel_size is not None or \
+            self._max_points is not None or self._sample_step is not None
+
+    def is_compressed(self):
+        '''Returns boolean indicating if any input file is laz (compressed)
+
+        '''
+        return any(m.header.point_data_record_format >= 128 for m in self._metadata)
+
+    def get_point_readers(self):
+        '''Returns list of LASPointReader, one for each input file
+
+        Requires numpy to be installed in the python environment
+        '''
+        return [LASPointReader(filename, metadata) for filename, metadata in \
+            zip(self._filenames, self._metadata)]
+
+    def get_sample_indices(self):
+        '''Returns list of the indices of the points sent to the client
+
+        One index array for each input file. Requires numpy.
+        '''
+        readers = self.get_point_readers()
+        selections = self._sample_points(readers)
+        return [np.arange(len(reader)) if selection is None else selection \
+            for reader, selection in zip(readers, selections)]
+
 
     def _build_display_model(self):
         '''Builds data model
@@ -154,12 +263,23 @@ class PointCloudFeature(GeoJSFeature):
         # Initialize output object
         display_model = super(PointCloudFeature, self)._build_display_model()
 
-        # Build an array of base64-encoded strings, one for each LAS file
-        las_list = list()
-        for filename in self._filenames:
-            with open(filename, 'rb') as f:
-                las_data = f.read()
+        if self._octree:
+            display_model['octree'] = self._write_octree()
+            display_model['data'] = list()
+            return display_model
+
+        # Build an array of base64-encoded strings, one for each LAS file.
+        # Compressed files are decompressed here (the client only loads
+        # LAS data), one chunk at a time.
+        if self.is_filtered() or self.is_decimated() or self.is_compressed():
+            readers = self.get_point_readers()
+            selections = self._sample_points(readers)
+            las_blobs = (r.get_las_bytes(s) for r,s in zip(readers, selections))
+        else:
+            las_blobs = (self._read_file(filename) for filename in self._filenames)
 
+        las_list = list()
+        for las_data in las_blobs:
             encoded_bytes = base64.b64encode(las_data)
             # Have to decode as ascii so that Jupyter can jsonify
             encoded_string = encoded_bytes.decode('ascii')
@@ -169,19 +289,80 @@ class PointCloudFeature(GeoJSFeature):
         #print('las_list type {}: {}'.format(type(las_list), las_list))
         return display_model
 
+    def _get_filters(self):
+        '''Returns dictionary of filter options (json-serializable)
+
+        '''
+        def as_list(value):
+            return None if value is None else list(value)
+        return {
+            'bbox': as_list(self._bbox),
+            'classifications': as_list(self._classifications),
+            'return_numbers': as_list(self._return_numbers),
+            'intensity_range': as_list(self._intensity_range)
+        }
+
+    def _sample_points(self, readers):
+        '''Returns list of index arrays of the points that pass filters and decimation
+
+        Selections are None for files whose points are all selected.
+        '''
+        selections = None
+        if self.is_filtered():
+            selections = pointcloudutils.filter_points(readers, **self._get_filters())
+        return pointcloudutils.sample_points(readers, voxel_size=self._voxel_size,
+            max_points=self._max_points, step=self._sample_step, selections=selections)
+
+    def _write_octree(self):
+        '''Writes octree to octree_dir, if not current, and returns octree model
+
+        '''
+        # Identify the inputs, to check if the existing octree is current
+        files = list()
+        for filename in self._filenames:
+            stat = os.stat(filename)
+            files.append([os.path.abspath(filename), stat.st_mtime, stat.st_size])
+        source = {
+            'files': files,
+            'voxel_size': self._voxel_size,
+            'max_points': self._max_points,
+            'sample_step': self._sample_step,
+            'node_points': self._octree_node_points,
+            'filters': self._get_filters()
+        }
+
+        hierarchy = pointoctree.read_hierarchy(self._octree_dir)
+        if hierarchy is None or hierarchy.get('source') != source:
+            readers = self.get_point_readers()
+            selections = None
+            if self.is_filtered() or self.is_decimated():
+                selections = self._sample_points(readers)
+            octree = pointoctree.PointOctree(readers, selections,
+                max_node_points=self._octree_node_points)
+            octree.write(self._octree_dir, source)
+
+        return {
+            'url': self._octree_url.rstrip('/'),
+            'hierarchy': pointoctree.HIERARCHY_FILENAME
+        }
+
+    def _read_file(self, filename):
+        with open(filename, 'rb') as f:
+            return f.read()
+
     def _check_support(self, metadata):
         '''Checks las version and point record format.
 
         Our current code does not support all versions of las files:
         * Only supports file versions 1.0-1.3 (not 1.4)
         * Only supports point-record formats 0-3 (not 4-10)
-        * Only supports uncompressed data (not laz)
+        * Only supports compressed data (laz) if laspy is installed
 
         '''
         if metadata is None:
             raise Exception('LAS Metadata missing')
 
-        std_msg = 'Only LAS versions 1.0-1.3, point formats 0-3, no compression'
+        std_msg = 'Only LAS versions 1.0-1.3, point formats 0-3, laz requires laspy'
         h = metadata.header
 
         # Only LAS file versions 1.0 - 1.3
@@ -190,11 +371,11 @@ class PointCloudFeature(GeoJSFeature):
             raise Exception('INVALID: Cannot load LAS file version {}. {}'.format(
                 version_string, std_msg))
 
-        # Only uncompressed data
-        if h.point_data_record_format >= 128:
+        # Only uncompressed data, unless laz is supported
+        if h.point_data_record_format >= 128 and not lasutils.is_laz_supported():
             raise Exception('INVALID: Cannot load laz/compressed data. {}'.format(std_msg))
 
         # Only point record formats 0-3
-        if h.point_data_record_format > 3:
+        if h.point_data_record_format % 128 > 3:
             raise Exception('INVALID: Cannot load point record format {}. {}'.format(
-                h.point_data_record_format, std_msg))
+                h.point_data_record_format % 128, std_msg))
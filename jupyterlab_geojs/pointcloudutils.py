@@ -0,0 +1,225 @@
+'''
+Point cloud filtering and decimation functions, which require numpy
+
+Points are selected from LASPointReader instances, one chunk of records at
+a time, so that memory use is bounded by the chunk size and the number of
+selected points, not by the size of the input files.
+'''
+
+from .lasutils import HAS_NUMPY
+if HAS_NUMPY:
+    import numpy as np
+
+
+def filter_points(readers, bbox=None, classifications=None, return_numbers=None,
+    intensity_range=None):
+    '''Selects the points in a set of LAS files that match all filters
+
+    @param readers: list of LASPointReader
+    @param bbox: (list) [xmin, ymin, xmax, ymax] or
+           [xmin, ymin, zmin, xmax, ymax, zmax], in data coordinates
+    @param classifications: (list) classification codes to keep, e.g., [2]
+    @param return_numbers: (list) return numbers to keep, e.g., [1]
+    @param intensity_range: (list) [min, max] intensity values to keep
+    Returns list of index arrays (sorted), one for each reader.
+    Files whose header bounds are outside bbox are not read, and the
+    records of the selected points of compressed files are kept in the
+    readers (see LASPointReader.keep_selected()).
+    '''
+    if bbox is not None:
+        if len(bbox) == 4:
+            lower = [bbox[0], bbox[1], -np.inf]
+            upper = [bbox[2], bbox[3], np.inf]
+        elif len(bbox) == 6:
+            lower, upper = bbox[:3], bbox[3:]
+        else:
+            raise Exception('Invalid bbox, must have 4 or 6 values: {}'.format(bbox))
+        lower = np.array(lower, dtype=np.float64)
+        upper = np.array(upper, dtype=np.float64)
+    if classifications is not None:
+        classifications = np.array(classifications)
+    if return_numbers is not None:
+        return_numbers = np.array(return_numbers)
+
+    selections = list()
+    for reader in readers:
+        if bbox is not None:
+            h = reader.metadata.header
+            if h.min_x > upper[0] or h.max_x < lower[0] or h.min_y > upper[1] or \
+                h.max_y < lower[1] or h.min_z > upper[2] or h.max_z < lower[2]:
+                selections.append(np.zeros(0, dtype=np.int64))
+                continue
+
+        index_list = list()
+        record_list = list()
+        for indices, records in reader.iter_selected():
+            mask = np.ones(len(records), dtype=bool)
+            if classifications is not None:
+                mask &= np.isin(records['classification'] & 0x1f, classifications)
+            if return_numbers is not None:
+                mask &= np.isin(records['flags'] & 0x07, return_numbers)
+            if intensity_range is not None:
+                intensity = records['intensity']
+                mask &= (intensity >= intensity_range[0]) & (intensity <= intensity_range[1])
+            if bbox is not None:
+                # (Coordinates are only scaled for points passing other filters)
+                candidates = np.flatnonzero(mask)
+                xyz = reader.scale_xyz(records[candidates])
+                inside = np.all((xyz >= lower) & (xyz <= upper), axis=1)
+                mask[candidates[~inside]] = False
+            index_list.append(indices[mask])
+            if reader.compressed:
+                record_list.append(records[mask])
+        selection = np.concatenate(index_list) if index_list \
+            else np.zeros(0, dtype=np.int64)
+        if record_list:
+            reader.keep_selected(selection, np.concatenate(record_list))
+        selections.append(selection)
+    return selections
+
+
+def sample_points(readers, voxel_size=None, max_points=None, step=None, seed=0,
+    selections=None):
+    '''Selects a subset of the points in a set of LAS files
+
+    @param readers: list of LASPointReader
+    @param voxel_size: (number) keep one point in each cubic voxel of this
+           size (in data units), for even spatial coverage
+    @param max_points: (int) maximum total number of points to keep;
+           points are then selected at random
+    @param step: (int) keep every Nth point
+    @param seed: (int) random seed, so that results are repeatable
+    @param selections: list of index arrays (one for each reader) to
+           sample from, e.g., from filter_points(); default is all points
+    Returns list of index arrays (sorted), one for each reader, or None
+    for readers whose points are all selected.
+    Selections are applied in order: step, voxel_size, max_points.
+    '''
+    if selections is None:
+        selections = [None] * len(readers)
+    if step is not None:
+        step = int(step)
+        if step < 1:
+            raise Exception('Invalid sample step {}'.format(step))
+        selections = [np.arange(0, len(reader), step) if selection is None \
+            else selection[::step] for reader, selection in zip(readers, selections)]
+
+    if voxel_size is not None:
+        if voxel_size <= 0:
+            raise Exception('Invalid voxel size {}'.format(voxel_size))
+        selections = voxel_sample(readers, voxel_size, selections)
+
+    if max_points is not None:
+        selections = random_sample(readers, selections, int(max_points), seed)
+    return selections
+
+
+def voxel_sample(readers, voxel_size, selections, bounds=None):
+    '''Keeps the first selected point in each occupied voxel
+
+    @param readers: list of LASPointReader
+    @param voxel_size: (number) voxel edge length
+    @param selections: list of index arrays (or None for all points),
+           one for each reader
+    @param bounds: [xmin,xmax, ymin,ymax, zmin,zmax] of the voxel grid
+           (default is the union of the header bounds)
+    Returns list of index arrays. The voxel grid spans all of the readers,
+    so points from different files in the same voxel are merged too.
+    The records of the kept points of compressed files are kept in the
+    readers, as in filter_points().
+    '''
+    if bounds is None:
+        bounds = get_bounds(readers)
+    mins = np.array(bounds[0::2], dtype=np.float64)
+    maxs = np.array(bounds[1::2], dtype=np.float64)
+    shape = np.floor((maxs - mins) / voxel_size).astype(np.int64) + 1
+    if float(shape[0]) * float(shape[1]) * float(shape[2]) >= 2**62:
+        raise Exception('Voxel size {} is too small for the data bounds'.format(voxel_size))
+
+    # Find the first point in each voxel, one chunk at a time. Only the
+    # unique voxels of each chunk are kept.
+    key_list = list()
+    reader_list = list()
+    index_list = list()
+    position_list = list()
+    record_lists = [list() for reader in readers]
+    for i, (reader, selection) in enumerate(zip(readers, selections)):
+        count = 0
+        for indices, records in reader.iter_selected(selection):
+            xyz = reader.scale_xyz(records)
+            cells = np.floor((xyz - mins) / voxel_size).astype(np.int64)
+            np.clip(cells, 0, shape - 1, out=cells)
+            keys = (cells[:, 0] * shape[1] + cells[:, 1]) * shape[2] + cells[:, 2]
+            keys, first = np.unique(keys, return_index=True)
+            key_list.append(keys)
+            reader_list.append(np.full(len(keys), i, dtype=np.int32))
+            index_list.append(indices[first])
+            if reader.compressed:
+                # (Position of each candidate in the reader's kept records)
+                position_list.append(np.arange(count, count + len(first)))
+                record_lists[i].append(records[first])
+                count += len(first)
+            else:
+                position_list.append(np.zeros(len(first), dtype=np.int64))
+
+    if not key_list:
+        return [np.zeros(0, dtype=np.int64) for reader in readers]
+    keys = np.concatenate(key_list)
+    reader_ids = np.concatenate(reader_list)
+    indices = np.concatenate(index_list)
+    positions = np.concatenate(position_list)
+    # np.unique() returns the first occurrence, which preserves input order
+    keys, first = np.unique(keys, return_index=True)
+    reader_ids = reader_ids[first]
+    indices = indices[first]
+    positions = positions[first]
+
+    results = list()
+    for i, reader in enumerate(readers):
+        mask = reader_ids == i
+        order = np.argsort(indices[mask])
+        reader_indices = indices[mask][order]
+        if record_lists[i]:
+            records = np.concatenate(record_lists[i])
+            reader.keep_selected(reader_indices, records[positions[mask][order]])
+        results.append(reader_indices)
+    return results
+
+
+def get_bounds(readers):
+    '''Returns [xmin,xmax, ymin,ymax, zmin,zmax] from the reader headers
+
+    '''
+    headers = [reader.metadata.header for reader in readers]
+    return [
+        min(h.min_x for h in headers), max(h.max_x for h in headers),
+        min(h.min_y for h in headers), max(h.max_y for h in headers),
+        min(h.min_z for h in headers), max(h.max_z for h in headers)
+    ]
+
+
+def random_sample(readers, selections, max_points, seed=0):
+    '''Selects at most max_points points, at random, from a list of index arrays
+
+    @param readers: list of LASPointReader
+    @param selections: list of index arrays (or None for all points),
+           one for each reader
+    Returns list of (sorted) index arrays.
+    '''
+    sizes = [len(reader) if selection is None else len(selection) \
+        for reader, selection in zip(readers, selections)]
+    total = sum(sizes)
+    if total <= max_points:
+        return selections
+
+    # Positions of the kept points in the concatenated selections,
+    # sorted to keep the points in file order
+    random_state = np.random.RandomState(seed)
+    positions = np.sort(random_state.choice(total, max(0, max_points), replace=False))
+    offsets = np.cumsum([0] + sizes)
+    splits = np.searchsorted(positions, offsets)
+    results = list()
+    for i, selection in enumerate(selections):
+        indices = positions[splits[i]:splits[i + 1]] - offsets[i]
+        results.append(indices if selection is None else selection[indices])
+    return results
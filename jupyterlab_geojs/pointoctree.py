@@ -0,0 +1,266 @@
+'''Octree (level of detail) tiling for point clouds
+
+Points are distributed to the nodes of an octree, top down: each node
+keeps one point per cell of a grid_size^3 grid over its cube, and passes
+the remaining points to its eight children, so that the root is a coarse,
+evenly spaced sample and each level adds detail. Nodes with few points
+are leaves. Each node is written as LAS file(s), which the client loads
+progressively, starting at the root.
+
+Node names follow the Potree convention: the root is "r" and each child
+appends its index (0-7), where index = (x >= center) << 2 |
+(y >= center) << 1 | (z >= center).
+'''
+
+import json
+import os
+import shutil
+import tempfile
+
+from . import pointcloudutils
+from .lasutils import HAS_NUMPY
+if HAS_NUMPY:
+    import numpy as np
+
+# Name of the octree metadata file
+HIERARCHY_FILENAME = 'hierarchy.json'
+
+
+class PointOctree:
+    '''Builds an octree of point chunks from LAS files
+
+    @param readers: list of LASPointReader
+    @param selections: list of index arrays (one for each reader, or None
+           for all points of the reader) with the points to include;
+           default is all points
+    @param max_node_points: (int) nodes with more points are split
+    @param grid_size: (int) number of grid cells along each axis of a
+           node, which determines the point spacing at each level
+    @param max_depth: (int) maximum node level (root is level 0)
+    '''
+    def __init__(self, readers, selections=None, max_node_points=100000,
+        grid_size=128, max_depth=12):
+        self._readers = readers
+        self._selections = selections
+        self._max_node_points = max_node_points
+        self._grid_size = grid_size
+        self._max_depth = max_depth
+
+        # Octree cube, enclosing the data bounds
+        bounds = pointcloudutils.get_bounds(readers)
+        self._bounds = bounds
+        size = max(bounds[1] - bounds[0], bounds[3] - bounds[2], bounds[5] - bounds[4])
+        size = size if size > 0 else 1.0
+        self._cube = [
+            bounds[0], bounds[0] + size,
+            bounds[2], bounds[2] + size,
+            bounds[4], bounds[4] + size
+        ]
+
+    def write(self, folder, source=None):
+        '''Writes node files and hierarchy file to folder
+
+        @param folder: (string) output folder
+        @param source: json-serializable value stored in the hierarchy
+               file, for checking whether the octree is current
+        Returns the hierarchy (dict)
+        Node files are written to a new subfolder, and the hierarchy file
+        is replaced last, so that any previous octree remains complete
+        until then. The files of the previous octree are then removed.
+        '''
+        os.makedirs(folder, exist_ok=True)
+        previous = read_hierarchy(folder)
+        node_folder = tempfile.mkdtemp(prefix='nodes-', dir=folder)
+        try:
+            hierarchy = self._write_nodes(folder, os.path.basename(node_folder), source)
+            temp_path = os.path.join(node_folder, HIERARCHY_FILENAME)
+            with open(temp_path, 'w') as f:
+                json.dump(hierarchy, f, separators=(',', ':'))
+            os.replace(temp_path, os.path.join(folder, HIERARCHY_FILENAME))
+        except Exception:
+            shutil.rmtree(node_folder, ignore_errors=True)
+            raise
+
+        # Remove files of the previous octree
+        if previous is not None:
+            subfolders = set()
+            for node in previous.get('nodes', {}).values():
+                for filename in node.get('files', []):
+                    path = os.path.join(folder, filename)
+                    if os.path.exists(path):
+                        os.remove(path)
+                    subfolders.add(os.path.dirname(path))
+            for subfolder in subfolders:
+                if os.path.normpath(subfolder) != os.path.normpath(folder) and \
+                    os.path.isdir(subfolder) and not os.listdir(subfolder):
+                    os.rmdir(subfolder)
+        return hierarchy
+
+    def _write_nodes(self, folder, subfolder, source):
+        '''Writes node files to folder/subfolder and returns the hierarchy (dict)
+
+        '''
+        nodes = dict()
+        for name, bounds, selections in self.iter_nodes():
+            files = list()
+            for i, (reader, selection) in enumerate(zip(self._readers, selections)):
+                if len(selection) == 0:
+                    continue
+                filename = '{}/{}_{}.las'.format(subfolder, name, i)
+                with open(os.path.join(folder, filename), 'wb') as f:
+                    f.write(reader.get_las_bytes(selection))
+                files.append(filename)
+            nodes[name] = {
+                'bounds': bounds,
+                'points': int(sum(len(s) for s in selections)),
+                'files': files
+            }
+
+        return {
+            'source': source,
+            'bounds': self._bounds,
+            'cube': self._cube,
+            'spacing': (self._cube[1] - self._cube[0]) / self._grid_size,
+            'nodes': nodes
+        }
+
+    def iter_nodes(self):
+        '''Generator yielding (name, bounds, selections) for each non-empty node
+
+        Bounds are the node cube [xmin,xmax, ymin,ymax, zmin,zmax], and
+        selections are the index arrays (one for each reader) of the node
+        points. Nodes are yielded level by level, so parent nodes are
+        yielded before their children.
+        '''
+        selections = self._selections
+        if selections is None:
+            selections = [None] * len(self._readers)
+        # Node (position in names/cubes) of each selected point; the
+        # root level starts with all points in node 0
+        node_ids = [None] * len(self._readers)
+        names = ['r']
+        cubes = [self._cube]
+        while names:
+            level = len(names[0]) - 1
+            keep, child_codes, counts = self._assign_points(cubes, selections, node_ids)
+            is_leaf = (counts <= self._max_node_points) | (level >= self._max_depth)
+
+            # Leaf nodes keep all of their points
+            node_selections = list()
+            next_selections = list()
+            next_codes = list()
+            for i, selection in enumerate(selections):
+                keep[i] |= is_leaf[child_codes[i] // 8]
+                positions = np.flatnonzero(keep[i])
+                node_selections.append(self._group_by_node(
+                    positions if selection is None else selection[positions],
+                    child_codes[i][positions] // 8, len(names)))
+                positions = np.flatnonzero(~keep[i])
+                next_selections.append(positions if selection is None else selection[positions])
+                next_codes.append(child_codes[i][positions])
+
+            for j, (name, cube) in enumerate(zip(names, cubes)):
+                if counts[j] > 0:
+                    yield name, cube, [groups[j] for groups in node_selections]
+
+            # Remaining points go to the children (in index order)
+            codes = np.unique(np.concatenate(next_codes))
+            names = ['{}{}'.format(names[code // 8], code % 8) for code in codes.tolist()]
+            cubes = [_get_child_bounds(cubes[code // 8], code % 8) for code in codes.tolist()]
+            selections = next_selections
+            node_ids = [np.searchsorted(codes, c) for c in next_codes]
+
+    def _assign_points(self, cubes, selections, node_ids):
+        '''Assigns the points of one octree level to voxels and octants
+
+        @param cubes: list of node cubes
+        @param selections: list of index arrays (or None for all points),
+               one for each reader
+        @param node_ids: list of arrays with the node of each selected
+               point (or None for node 0), one for each reader
+        Returns tuple (keep, child_codes, counts): for each reader, a mask
+        of the first selected point in each voxel of its node, and the
+        child code (node * 8 + octant) of each selected point, and the
+        number of points in each node.
+        The points are read in one pass, one chunk at a time, and the
+        first point in each voxel is found over all of the readers.
+        '''
+        g = self._grid_size
+        cubes = np.array(cubes, dtype=np.float64)
+        mins = cubes[:, 0::2]
+        centers = (cubes[:, 0::2] + cubes[:, 1::2]) / 2.0
+        spacings = (cubes[:, 1] - cubes[:, 0]) / g
+
+        key_list = list()
+        reader_list = list()
+        position_list = list()
+        child_codes = list()
+        counts = np.zeros(len(cubes), dtype=np.int64)
+        for i, (reader, selection) in enumerate(zip(self._readers, selections)):
+            codes = np.zeros(len(reader) if selection is None else len(selection),
+                dtype=np.int64)
+            start = 0
+            for indices, records in reader.iter_selected(selection):
+                stop = start + len(indices)
+                if node_ids[i] is None:
+                    nodes = np.zeros(len(indices), dtype=np.int64)
+                else:
+                    nodes = node_ids[i][start:stop]
+                xyz = reader.scale_xyz(records)
+                cells = np.floor((xyz - mins[nodes]) / spacings[nodes, None]).astype(np.int64)
+                np.clip(cells, 0, g - 1, out=cells)
+                keys = ((nodes * g + cells[:, 0]) * g + cells[:, 1]) * g + cells[:, 2]
+                # Only the unique voxels of each chunk are kept
+                keys, first = np.unique(keys, return_index=True)
+                key_list.append(keys)
+                reader_list.append(np.full(len(keys), i, dtype=np.int32))
+                position_list.append(first + start)
+
+                above = xyz >= centers[nodes]
+                codes[start:stop] = nodes * 8 + \
+                    (above[:, 0] * 4) + (above[:, 1] * 2) + above[:, 2]
+                counts += np.bincount(nodes, minlength=len(cubes))
+                start = stop
+            child_codes.append(codes)
+
+        keep = [np.zeros(len(codes), dtype=bool) for codes in child_codes]
+        if key_list:
+            # np.unique() returns the first occurrence, which preserves input order
+            keys, first = np.unique(np.concatenate(key_list), return_index=True)
+            reader_ids = np.concatenate(reader_list)[first]
+            positions = np.concatenate(position_list)[first]
+            for i in range(len(keep)):
+                keep[i][positions[reader_ids == i]] = True
+        return keep, child_codes, counts
+
+    def _group_by_node(self, indices, nodes, node_count):
+        '''Splits sorted index array into one (sorted) array for each node
+
+        '''
+        order = np.argsort(nodes, kind='stable')
+        splits = np.searchsorted(nodes[order], np.arange(node_count + 1))
+        indices = indices[order]
+        return [indices[splits[j]:splits[j + 1]] for j in range(node_count)]
+
+
+def _get_child_bounds(bounds, index):
+    '''Returns cube of child node index (0-7)
+
+    '''
+    child = list()
+    for axis, bit in enumerate([4, 2, 1]):
+        lower, upper = bounds[2*axis], bounds[2*axis + 1]
+        middle = (lower + upper) / 2.0
+        child.extend([middle, upper] if index & bit else [lower, middle])
+    return child
+
+
+def read_hierarchy(folder):
+    '''Returns hierarchy (dict) from octree folder, or None if not found
+
+    '''
+    path = os.path.join(folder, HIERARCHY_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
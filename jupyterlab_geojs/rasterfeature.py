@@ -1,11 +1,13 @@
 import base64
-import glob
 import json
+import math
 import os
 import pkg_resources
-import time
 
+from . import gdalutils
 from .geojsfeature import GeoJSFeature
+from .imagecache import ImageCache
+from .rasterpyramid import RasterPyramid
 
 '''
 Raster features require GDAL to be installed on the kernel.
@@ -17,9 +19,9 @@ except pkg_resources.DistributionNotFound:
     HAS_GDAL = False
 else:
     HAS_GDAL = True
-    from osgeo import gdal, osr
+    from osgeo import gdal
 
-# Specify temp dir to use for copying gdal datasets
+# Specify temp dir to use for caching encoded images
 try:
     pkg_resources.get_distribution('jupyter_core.paths')
 except pkg_resources.DistributionNotFound:
@@ -31,17 +33,48 @@ else:
     TEMP_DIR = os.path.join(runtime_dir, 'geojs')
 #print('Using temp_dir {}'.format(TEMP_DIR))
 
+# Cache of encoded png images, for datasets loaded from files.
+# Use image_cache.max_bytes to set the size limit,
+# and image_cache.enabled to turn caching on or off.
+image_cache = ImageCache(os.path.join(TEMP_DIR, 'images'))
+
+# Name of the file in tile_dir that records the source of the tiles
+TILE_SOURCE_FILENAME = 'source.json'
+
 
 class RasterFeature(GeoJSFeature):
     '''Initialize raster feature
 
     @param data GDALDataset
     @param filename string
+
+    Optional keyword argument for (non-tiled) display:
+    @param max_pixels (int) maximum number of pixels in the displayed image.
+           Larger images are downsampled, using the dataset's overviews
+           when available.
+
+    Optional keyword arguments for tiled display:
+    @param tiled (boolean) display image as multi-resolution tile pyramid
+    @param tile_size (int) tile width & height in pixels (default 256)
+    @param tile_dir (string) folder to write tile images to
+    @param tile_url (string) url prefix the client uses to fetch
+           tile images written to tile_dir, e.g., 'files/tiles'
+    Tile images already in tile_dir are reused if the source file has
+    not changed since they were written.
     '''
     def __init__(self, data, **kwargs):
         ''''''
         self._gdal_dataset = None
 
+        # Image size and tiling options are only used in the kernel
+        self._max_pixels = kwargs.pop('max_pixels', None)
+        self._tiled = kwargs.pop('tiled', False)
+        self._tile_size = kwargs.pop('tile_size', 256)
+        self._tile_dir = kwargs.pop('tile_dir', None)
+        self._tile_url = kwargs.pop('tile_url', None)
+        if self._tiled and (self._tile_dir is None or self._tile_url is None):
+            raise Exception('Tiled display requires tile_dir and tile_url')
+
         if not HAS_GDAL:
             raise Exception('Cannot create raster features -- GDAL not installed')
 
@@ -84,9 +117,7 @@ class RasterFeature(GeoJSFeature):
                 corners.append([x, y])
 
         if as_lonlat:
-            spatial_ref = osr.SpatialReference()
-            spatial_ref.ImportFromWkt(self.get_wkt_string())
-            corners = self._convert_to_lonlat(corners, spatial_ref)
+            corners = self._convert_to_lonlat(corners, self.get_wkt_string())
 
         return corners
 
@@ -95,10 +126,7 @@ class RasterFeature(GeoJSFeature):
         wkt = self.get_wkt_string()
         if not wkt:
             raise Exception('dataset missing projection info')
-        ref = osr.SpatialReference()
-        ref.ImportFromWkt(wkt)
-        proj4_string = ref.ExportToProj4()
-        return proj4_string
+        return gdalutils.convert_wkt_to_proj(wkt)
 
     def get_wkt_string(self):
         ''''''
@@ -111,94 +139,192 @@ class RasterFeature(GeoJSFeature):
         display_model = super(RasterFeature, self)._build_display_model()
         options = display_model.get('options', {})
 
-        # Set up coordinate transform to lonlat coordinates
-        input_ref = osr.SpatialReference()
-        input_ref.ImportFromWkt(self._gdal_dataset.GetProjection())
-        lonlat_ref = osr.SpatialReference()
-        lonlat_ref .ImportFromEPSG(4326)
-        ref_transform = osr.CoordinateTransformation(input_ref, lonlat_ref)
+        if self._tiled:
+            # Client selects tiles to display, based on zoom and extent
+            gt, ref_transform = self._get_transforms()
+            options['data'] = []
+            options['tiles'] = self._build_tiles_model(gt, ref_transform)
+        else:
+            # Feature data is array with image & corners points for each feature
+            # We have only 1 feature
+            options['data'] = [self._build_quad_data()]
+        display_model['options'] = options
+
+        return display_model
+
+    def _build_quad_data(self):
+        '''Returns quad data (lonlat corner points and image) for the dataset
+
+        '''
+        gt, ref_transform = self._get_transforms()
+        num_cols = self._gdal_dataset.RasterXSize
+        num_rows = self._gdal_dataset.RasterYSize
+
+        # Set corner points
+        quad_data = self._compute_quad_corners(
+            gt, ref_transform, [0, 0, num_cols, num_rows])
+
+        # Encode png image in memory and convert to base64 data
+        image_size = self._compute_image_size()
+        png_bytes = self._encode_png(size=image_size)
+        quad_data['image'] = self._encode_image_url(png_bytes)
+        return quad_data
+
+    def _get_transforms(self):
+        '''Returns dataset geo transform and coordinate transform to lonlat
+
+        '''
+        # Get (cached) coordinate transform to lonlat coordinates
+        ref_transform = gdalutils.spatial_ref_cache.get_transform(
+            self._gdal_dataset.GetProjection())
 
-        # Compute corner points
         gt = self._gdal_dataset.GetGeoTransform()
         if gt is None:
             raise Exception('Cannot render raster feature -- input has no geo transform')
+        return gt, ref_transform
+
+    def _compute_image_size(self):
+        '''Returns [width, height] to downsample image to max_pixels
+
+        Returns None if image does not need to be downsampled.
+        '''
+        if self._max_pixels is None:
+            return None
         num_cols = self._gdal_dataset.RasterXSize
         num_rows = self._gdal_dataset.RasterYSize
-        corners = list()
-        for px in [0, num_cols]:
-            for py in [0, num_rows]:
+        if num_cols * num_rows <= self._max_pixels:
+            return None
+
+        # Preserve aspect ratio
+        scale = math.sqrt(self._max_pixels / (num_cols * num_rows))
+        width = max(1, int(num_cols * scale))
+        height = max(1, int(num_rows * scale))
+        return [width, height]
+
+    def _build_tiles_model(self, gt, ref_transform):
+        '''Writes tile pyramid to tile_dir and returns model of the tiles at each level
+
+        Existing tile images are not encoded again if they were written
+        from the same source file (path, modified time, and size).
+        '''
+        pyramid = RasterPyramid(
+            self._gdal_dataset.RasterXSize, self._gdal_dataset.RasterYSize,
+            self._tile_size)
+        source = self._get_tile_source()
+        source_path = os.path.join(self._tile_dir, TILE_SOURCE_FILENAME)
+        reuse_tiles = False
+        if os.path.exists(source_path):
+            with open(source_path) as f:
+                reuse_tiles = source is not None and json.load(f) == source
+            if not reuse_tiles:
+                os.remove(source_path)
+
+        levels = list()
+        for level in range(pyramid.get_level_count()):
+            tile_list = list()
+            for tile in pyramid.get_tiles(level):
+                tile_data = self._compute_quad_corners(gt, ref_transform, [
+                    tile.src_win[0],
+                    tile.src_win[1],
+                    tile.src_win[0] + tile.src_win[2],
+                    tile.src_win[1] + tile.src_win[3]
+                ])
+                tile_path = '{}/{}_{}.png'.format(level, tile.col, tile.row)
+                full_path = os.path.join(self._tile_dir, tile_path)
+                if not (reuse_tiles and os.path.exists(full_path)):
+                    # Tiles bypass the image cache, since tile_dir already stores them
+                    png_bytes = gdalutils.encode_png(self._gdal_dataset,
+                        src_win=tile.src_win, size=tile.size)
+                    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                    with open(full_path, 'wb') as f:
+                        f.write(png_bytes)
+                tile_data['image'] = '{}/{}'.format(self._tile_url.rstrip('/'), tile_path)
+                tile_list.append(tile_data)
+
+            width, height = pyramid.get_level_size(level)
+            levels.append({'width': width, 'height': height, 'tiles': tile_list})
+
+        # Source is recorded last, so that tiles are only reused once complete
+        if source is not None and not reuse_tiles:
+            with open(source_path, 'w') as f:
+                json.dump(source, f)
+
+        return {'levels': levels}
+
+    def _get_tile_source(self):
+        '''Returns json-serializable description of the tiles source
+
+        Returns None if dataset is not a file, in which case tiles are
+        always written.
+        '''
+        key = self._get_cache_key(None, None)
+        if key is None:
+            return None
+        return key[1:4] + [self._tile_size]
+
+    def _compute_quad_corners(self, gt, ref_transform, pixel_bounds):
+        '''Returns dictionary of lonlat corner points (ul, ll, ur, lr)
+
+        @param gt: dataset geo transform
+        @param ref_transform: coordinate transformation to lonlat
+        @param pixel_bounds: [x0, y0, x1, y1] in dataset pixel coordinates
+        '''
+        x0, y0, x1, y1 = pixel_bounds
+        native_corners = list()
+        for px in [x0, x1]:
+            for py in [y0, y1]:
                 native_x = gt[0] + px*gt[1] + py*gt[2]
                 native_y = gt[3] + px*gt[4] + py*gt[5]
+                native_corners.append([native_x, native_y])
 
-                # Convert to lon-lat
-                x,y,z = ref_transform.TransformPoint(native_x, native_y)
-                corners.append([x, y])
+        # Convert to lon-lat
+        corners = gdalutils.transform_points(native_corners, ref_transform)
 
-        # Feature data is array with image & corners points for each feature
-        # We have only 1 feature
-        # Set corner points
-        feature_data = dict()
-        feature_data['ul'] = {'x': corners[0][0], 'y': corners[0][1]}
-        feature_data['ll'] = {'x': corners[1][0], 'y': corners[1][1]}
-        feature_data['ur'] = {'x': corners[2][0], 'y': corners[2][1]}
-        feature_data['lr'] = {'x': corners[3][0], 'y': corners[3][1]}
-        #options['data'] = [data]
-
-        # Get dataset's gcs
-        projection = self._gdal_dataset.GetProjection()
-        spatial_ref = osr.SpatialReference(wkt=projection)
-        gcs_name = spatial_ref.GetAttrValue('AUTHORITY', 0)
-        gcs_value = spatial_ref.GetAttrValue('AUTHORITY', 1)
-        gcs_string = '{}:{}'.format(gcs_name, gcs_value)
-        #print(gcs_string)
-        #options['gcs'] = gcs_string
-
-        # Need temp directory to create png dataset
-        os.makedirs(TEMP_DIR, exist_ok=True)
-
-        # Generate filename for interim png file
-        # Use timestamp (presumes creating < 1 png image per second)
-        ts = int(time.time())
-        png_filename = '{}.png'.format(ts)
-
-        # Create png dataset
-        png_path = os.path.join(TEMP_DIR, png_filename)
-        png_driver = gdal.GetDriverByName('PNG')
-        png_dataset = png_driver.CreateCopy(png_path, self._gdal_dataset, strict=0)
-        assert(png_dataset)
-        png_dataset = None
-
-        # Read png file and convert to base64 data
-        with open(png_path, 'rb') as fp:
-            encoded_bytes = base64.b64encode(fp.read())
-        encoded_string = 'data:image/png;base64,' + encoded_bytes.decode('ascii')
-        #print(encoded_string)
-        feature_data['image'] = encoded_string
-
-        options['data'] = [feature_data]
-        display_model['options'] = options
+        quad_data = dict()
+        quad_data['ul'] = {'x': corners[0][0], 'y': corners[0][1]}
+        quad_data['ll'] = {'x': corners[1][0], 'y': corners[1][1]}
+        quad_data['ur'] = {'x': corners[2][0], 'y': corners[2][1]}
+        quad_data['lr'] = {'x': corners[3][0], 'y': corners[3][1]}
+        return quad_data
 
-        # Remove temp files (gdal creates auxilliary file in addition to .png file)
-        pattern = '{path}/{prefix}.*'.format(path=TEMP_DIR, prefix=ts)
-        for path in glob.iglob(pattern):
-            os.remove(path)
+    def _encode_png(self, src_win=None, size=None):
+        '''Encodes dataset (or window) as png image, using the image cache
 
-        return display_model
+        '''
+        key = self._get_cache_key(src_win, size)
+        if key is not None:
+            png_bytes = image_cache.get(key)
+            if png_bytes is not None:
+                return png_bytes
+
+        png_bytes = gdalutils.encode_png(self._gdal_dataset, src_win=src_win, size=size)
+        if key is not None:
+            image_cache.put(key, png_bytes)
+        return png_bytes
+
+    def _get_cache_key(self, src_win, size):
+        '''Returns image cache key, or None if dataset is not a file
+
+        The key includes the file's modified time and size, so that
+        cache entries are not used after the file changes.
+        '''
+        path = self._gdal_dataset.GetDescription()
+        if not path or not os.path.isfile(path):
+            return None
+        stat = os.stat(path)
+        return ['png', os.path.abspath(path), stat.st_mtime, stat.st_size, src_win, size]
+
+    def _encode_image_url(self, png_bytes):
+        '''Returns png image as base64 data url
+
+        '''
+        encoded_bytes = base64.b64encode(png_bytes)
+        return 'data:image/png;base64,' + encoded_bytes.decode('ascii')
 
 
-    def _convert_to_lonlat(self, points, from_spatial_ref):
+    def _convert_to_lonlat(self, points, projection_wkt):
         '''Converts a list of [x,y] points to a list with [lon, lat] coords
 
 
         '''
-        # Set up transform
-        lonlat_ref = osr.SpatialReference()
-        lonlat_ref .ImportFromEPSG(4326)
-        ref_transform = osr.CoordinateTransformation(from_spatial_ref, lonlat_ref)
-        lonlat_points = list()
-        for point in points:
-            native_x = point[0]
-            native_y = point[1]
-            x,y,z = ref_transform.TransformPoint(native_x, native_y)
-            lonlat_points.append([x, y])
-        return lonlat_points
+        return gdalutils.convert_points_to_lonlat(points, projection_wkt)
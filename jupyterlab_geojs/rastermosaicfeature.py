@@ -0,0 +1,84 @@
+from concurrent.futures import ThreadPoolExecutor
+import glob
+
+from .geojsfeature import GeoJSFeature
+from .rasterfeature import RasterFeature
+
+
+def is_glob_pattern(data):
+    '''Returns boolean indicating whether input is a filename pattern
+
+    '''
+    return isinstance(data, str) and any(c in data for c in '*?[')
+
+
+class RasterMosaicFeature(GeoJSFeature):
+    '''Initialize feature displaying multiple rasters as one quad feature
+
+    @param data list of GDALDataset and/or filenames, or filename (glob) pattern
+
+    Optional keyword arguments:
+    @param max_workers (int) number of threads used to reproject and
+           encode the rasters (default: ThreadPoolExecutor default)
+    @param max_pixels (int) maximum number of pixels in each raster image
+
+    Each raster has its own GDAL dataset, so the rasters can be encoded
+    concurrently (GDAL releases the GIL while reading and encoding).
+    The same worker threads are used for every build, so the coordinate
+    transforms cached for each thread (gdalutils.spatial_ref_cache) are
+    reused across builds.
+    '''
+    def __init__(self, data, **kwargs):
+        ''''''
+        # Kernel-only options
+        self._max_workers = kwargs.pop('max_workers', None)
+        max_pixels = kwargs.pop('max_pixels', None)
+        if kwargs.pop('tiled', False):
+            raise Exception('Tiled display not supported for multiple rasters')
+
+        super(RasterMosaicFeature, self).__init__('quad', **kwargs)
+
+        if is_glob_pattern(data):
+            sources = sorted(glob.glob(data))
+            if not sources:
+                raise Exception('No files match {}'.format(data))
+        elif isinstance(data, (list, tuple)):
+            sources = data
+        else:
+            raise Exception('Input data is not list or filename pattern: {}'.format(data))
+
+        self._rasters = [RasterFeature(source, max_pixels=max_pixels) for source in sources]
+        self._executor = None  # created on first build
+
+    def get_corner_points(self, as_lonlat=False):
+        '''Returns corners points of bounding box of all rasters: [[x0,y0], ...[x3,y3]]
+
+        Use as_lonlat if the rasters have different projections.
+        '''
+        points = list()
+        for raster in self._rasters:
+            points.extend(raster.get_corner_points(as_lonlat))
+        x_coords, y_coords = zip(*points)
+        xmin, xmax = min(x_coords), max(x_coords)
+        ymin, ymax = min(y_coords), max(y_coords)
+        return [[xmin, ymax], [xmin, ymin], [xmax, ymax], [xmax, ymin]]
+
+    def get_rasters(self):
+        '''Returns list of RasterFeature instances, one for each input
+
+        '''
+        return self._rasters
+
+    def _build_display_model(self):
+        '''Builds model as quad feature with one quad for each raster'''
+        display_model = super(RasterMosaicFeature, self)._build_display_model()
+        options = display_model.get('options', {})
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+        quad_list = list(self._executor.map(
+            lambda raster: raster._build_quad_data(), self._rasters))
+
+        options['data'] = quad_list
+        display_model['options'] = options
+        return display_model
@@ -0,0 +1,87 @@
+'''Multi-resolution tile pyramid for raster (GDAL) datasets
+
+Tiles are defined in the dataset's pixel space. Level 0 is the coarsest
+level, which fits the full image into one tile; each subsequent level
+doubles the resolution, up to the full-resolution image at the last level.
+'''
+
+import math
+
+
+class RasterTile:
+    '''One tile in a raster pyramid
+
+    '''
+    def __init__(self, level, col, row, src_win, size):
+        self.level = level
+        self.col = col
+        self.row = row
+        self.src_win = src_win  # [xoff, yoff, xsize, ysize] in dataset pixels
+        self.size = size        # [width, height] of tile image
+
+
+class RasterPyramid:
+    '''Computes the tile layout for a raster dataset
+
+    @param width, height: (int) size of the full-resolution image
+    @param tile_size: (int) width & height of (full) tiles
+    '''
+    def __init__(self, width, height, tile_size=256):
+        if tile_size < 1:
+            raise Exception('Invalid tile size {}'.format(tile_size))
+        self._width = width
+        self._height = height
+        self._tile_size = tile_size
+
+        # Number of levels needed to fit full image into one tile at level 0
+        max_dim = max(width, height)
+        self._num_levels = 1
+        if max_dim > tile_size:
+            self._num_levels += int(math.ceil(math.log2(max_dim / tile_size)))
+
+    def get_level_count(self):
+        '''Returns number of levels in the pyramid
+
+        '''
+        return self._num_levels
+
+    def get_level_scale(self, level):
+        '''Returns downsampling factor for level (1 at full resolution)
+
+        '''
+        return 2 ** (self._num_levels - 1 - level)
+
+    def get_level_size(self, level):
+        '''Returns [width, height] of the image at level
+
+        '''
+        scale = self.get_level_scale(level)
+        return [
+            int(math.ceil(self._width / scale)),
+            int(math.ceil(self._height / scale))
+        ]
+
+    def get_tiles(self, level):
+        '''Returns list of RasterTile instances for level
+
+        '''
+        scale = self.get_level_scale(level)
+        level_width, level_height = self.get_level_size(level)
+        ts = self._tile_size
+        tiles = list()
+        for row in range(int(math.ceil(level_height / ts))):
+            for col in range(int(math.ceil(level_width / ts))):
+                # Tile extent in level pixels
+                x0 = col * ts
+                y0 = row * ts
+                x1 = min(x0 + ts, level_width)
+                y1 = min(y0 + ts, level_height)
+
+                # Corresponding window in dataset pixels
+                src_x0 = x0 * scale
+                src_y0 = y0 * scale
+                src_x1 = min(x1 * scale, self._width)
+                src_y1 = min(y1 * scale, self._height)
+                src_win = [src_x0, src_y0, src_x1 - src_x0, src_y1 - src_y0]
+                tiles.append(RasterTile(level, col, row, src_win, [x1 - x0, y1 - y0]))
+        return tiles
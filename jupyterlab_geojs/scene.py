@@ -138,7 +138,7 @@ class Scene(JSON):
 
         layer_list = list()
         for layer in self._layers:
-            layer_list.append(layer._build_display_model())
+            layer_list.append(layer._get_display_model())
         data['layers'] = layer_list
         return data
 
@@ -0,0 +1,133 @@
+'''Packed R-tree spatial index
+
+The tree is built once, bottom-up, with the Sort-Tile-Recursive (STR)
+algorithm: entries are sorted into vertical slices by x, each slice is
+sorted by y, and consecutive runs of node_size entries become nodes of
+the next level. Every node is full (except the last one at each level),
+so the tree is compact and queries visit few nodes.
+'''
+
+import heapq
+import itertools
+import math
+
+
+class SpatialIndex:
+    '''Static R-tree over bounding boxes
+
+    @param boxes: list of [xmin, ymin, xmax, ymax], one for each item
+    @param node_size: (int) maximum number of children per node
+
+    Items are referenced by their index in the input list.
+    '''
+    def __init__(self, boxes, node_size=16):
+        self._node_size = max(2, int(node_size))
+        self._count = len(boxes)
+
+        # Each level is a list of entries (box, ref). At the leaf level
+        # (0), ref is the item index; at higher levels, ref is the range
+        # (start, end) of the entry's children in the level below.
+        entries = [(list(box[:4]), i) for i, box in enumerate(boxes)]
+        self._levels = [self._sort_tile(entries)]
+        while len(self._levels[-1]) > 1:
+            level = self._levels[-1]
+            parents = list()
+            for start in range(0, len(level), self._node_size):
+                end = min(start + self._node_size, len(level))
+                box = _union([entry[0] for entry in level[start:end]])
+                parents.append((box, (start, end)))
+            self._levels.append(self._sort_tile(parents))
+
+    def __len__(self):
+        return self._count
+
+    def get_bounds(self):
+        '''Returns [xmin, ymin, xmax, ymax] of all items, or None if empty
+
+        '''
+        top = self._levels[-1]
+        return _union([entry[0] for entry in top]) if top else None
+
+    def search(self, bbox):
+        '''Returns list of the indices of items that intersect bbox
+
+        @param bbox: [xmin, ymin, xmax, ymax]
+        '''
+        xmin, ymin, xmax, ymax = bbox
+        results = list()
+        top = len(self._levels) - 1
+        stack = [(top, 0, len(self._levels[top]))]
+        while stack:
+            level, start, end = stack.pop()
+            for box, ref in self._levels[level][start:end]:
+                if box[0] > xmax or box[2] < xmin or box[1] > ymax or box[3] < ymin:
+                    continue
+                if level == 0:
+                    results.append(ref)
+                else:
+                    stack.append((level - 1, ref[0], ref[1]))
+        return results
+
+    def nearest(self, x, y, k=1, max_distance=None):
+        '''Returns list of indices of the k items nearest to point (x, y)
+
+        Items are sorted by distance to their bounding box (0 for items
+        containing the point). Items farther than max_distance are omitted.
+        '''
+        max_distance2 = None if max_distance is None else max_distance * max_distance
+        counter = itertools.count()  # tie-breaker, so entries are never compared
+        heap = list()
+        top = len(self._levels) - 1
+        for box, ref in self._levels[top]:
+            heapq.heappush(heap, (_distance2(box, x, y), next(counter), top, ref))
+
+        results = list()
+        while heap and len(results) < k:
+            distance2, _, level, ref = heapq.heappop(heap)
+            if max_distance2 is not None and distance2 > max_distance2:
+                break
+            if level == 0:
+                results.append(ref)
+                continue
+            for box, child_ref in self._levels[level - 1][ref[0]:ref[1]]:
+                heapq.heappush(heap, (_distance2(box, x, y), next(counter), level - 1, child_ref))
+        return results
+
+    def _sort_tile(self, entries):
+        '''Sorts entries into STR order
+
+        '''
+        n = len(entries)
+        if n <= self._node_size:
+            return entries
+        node_count = int(math.ceil(n / self._node_size))
+        slice_count = int(math.ceil(math.sqrt(node_count)))
+        slice_size = self._node_size * int(math.ceil(node_count / slice_count))
+
+        entries = sorted(entries, key=lambda entry: entry[0][0] + entry[0][2])
+        result = list()
+        for start in range(0, n, slice_size):
+            vertical_slice = entries[start:start + slice_size]
+            result.extend(sorted(vertical_slice, key=lambda entry: entry[0][1] + entry[0][3]))
+        return result
+
+
+def _distance2(box, x, y):
+    '''Returns squared distance from point to box
+
+    '''
+    dx = max(box[0] - x, 0.0, x - box[2])
+    dy = max(box[1] - y, 0.0, y - box[3])
+    return dx*dx + dy*dy
+
+
+def _union(boxes):
+    '''Returns bounding box of list of boxes
+
+    '''
+    return [
+        min(box[0] for box in boxes),
+        min(box[1] for box in boxes),
+        max(box[2] for box in boxes),
+        max(box[3] for box in boxes)
+    ]
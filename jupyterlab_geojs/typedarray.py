@@ -0,0 +1,76 @@
+'''Functions for packing numeric arrays into typed-array models
+
+A typed-array model is a JSON-able dict with the fields:
+  * dtype: 'float32' or 'uint8' (mapped to Float32Array or Uint8Array in js)
+  * shape: list of dimensions, e.g., [n, 2] for n xy coordinates
+  * data:  base64-encoded string of the packed (little-endian) values
+
+Display models are sent to the client as JSON, so the packed values are
+base64 encoded, the same as the pointcloud feature does for LAS data.
+This is roughly 4-5 times smaller than the equivalent JSON lists, and
+the client can decode it without parsing each item.
+'''
+
+import array
+import base64
+import sys
+
+# Map dtype name to (array module typecode, numpy little-endian type string)
+TypeCodes = {
+    'float32': ('f', '<f4'),
+    'uint8': ('B', 'u1')
+}
+
+
+def encode_typed_array(values, dtype, shape=None):
+    '''Packs a flat sequence of numbers into a typed-array model
+
+    @param values: flat sequence of numbers (or numpy array)
+    @param dtype: (string) 'float32' or 'uint8'
+    @param shape: (list) dimensions of the array, defaults to [len(values)]
+    '''
+    if dtype not in TypeCodes:
+        raise Exception('Unsupported typed array dtype {}'.format(dtype))
+
+    if hasattr(values, 'astype'):
+        # Numpy arrays can be packed directly
+        packed = values.astype(TypeCodes[dtype][1]).tobytes()
+        count = values.size
+    else:
+        packed_array = array.array(TypeCodes[dtype][0], values)
+        if sys.byteorder == 'big':
+            packed_array.byteswap()
+        packed = packed_array.tobytes()
+        count = len(packed_array)
+
+    if shape is None:
+        shape = [count]
+    encoded_bytes = base64.b64encode(packed)
+    return {
+        'dtype': dtype,
+        'shape': list(shape),
+        'data': encoded_bytes.decode('ascii')
+    }
+
+
+def decode_typed_array(model):
+    '''Unpacks a typed-array model into a flat array.array instance
+
+    Mostly for testing, since typed arrays are decoded by the client.
+    '''
+    dtype = model.get('dtype')
+    if dtype not in TypeCodes:
+        raise Exception('Unsupported typed array dtype {}'.format(dtype))
+    unpacked = array.array(TypeCodes[dtype][0])
+    unpacked.frombytes(base64.b64decode(model.get('data')))
+    if sys.byteorder == 'big':
+        unpacked.byteswap()
+    return unpacked
+
+
+def is_typed_array(value):
+    '''Returns boolean indicating whether value is a typed-array model
+
+    '''
+    return isinstance(value, dict) and \
+        value.get('dtype') in TypeCodes and 'data' in value
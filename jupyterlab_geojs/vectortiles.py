@@ -0,0 +1,273 @@
+'''Vector tiles for GeoJSON data
+
+Cuts GeoJSON data into web mercator (z/x/y) tiles. At each zoom level,
+the data are simplified for that zoom, then each feature is clipped to
+the bounds (plus a small buffer) of every tile it intersects, so that the
+client only needs the tiles in the current view.
+'''
+
+import math
+
+from . import geometryutils
+
+# Latitude limit of web mercator maps
+MAX_LATITUDE = 85.0511287798
+
+# Maximum number of tiles spanned by the data extent at any zoom level
+MAX_ZOOM_TILES = 4096
+
+
+def lonlat_to_tile(lon, lat, zoom):
+    '''Returns (fractional) tile coordinates [x, y] for lon-lat position
+
+    '''
+    n = 2 ** zoom
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    rad = math.radians(lat)
+    x = (lon + 180.0) / 360.0 * n
+    y = (1.0 - math.log(math.tan(rad) + 1.0 / math.cos(rad)) / math.pi) / 2.0 * n
+    return [x, y]
+
+
+def get_tile_bounds(zoom, x, y):
+    '''Returns lon-lat bounds [xmin, ymin, xmax, ymax] of tile
+
+    '''
+    n = 2 ** zoom
+    def tile_lat(ty):
+        return math.degrees(math.atan(math.sinh(math.pi * (1.0 - 2.0 * ty / n))))
+    return [x / n * 360.0 - 180.0, tile_lat(y + 1), (x + 1) / n * 360.0 - 180.0, tile_lat(y)]
+
+
+def get_tile_range(bounds, zoom):
+    '''Returns [xmin, ymin, xmax, ymax] of the tiles intersecting lon-lat bounds
+
+    '''
+    n = 2 ** zoom
+    x0, y0 = lonlat_to_tile(bounds[0], bounds[3], zoom)
+    x1, y1 = lonlat_to_tile(bounds[2], bounds[1], zoom)
+    def clamp(value):
+        return max(0, min(n - 1, int(math.floor(value))))
+    return [clamp(x0), clamp(y0), clamp(x1), clamp(y1)]
+
+
+def get_max_zoom(bounds, min_zoom, max_zoom, max_tiles=MAX_ZOOM_TILES):
+    '''Returns the largest zoom, from min_zoom to max_zoom, at which
+    lon-lat bounds span no more than max_tiles tiles
+
+    Always returns at least min_zoom.
+    '''
+    zoom = min_zoom
+    for z in range(min_zoom + 1, max_zoom + 1):
+        xmin, ymin, xmax, ymax = get_tile_range(bounds, z)
+        if (xmax - xmin + 1) * (ymax - ymin + 1) > max_tiles:
+            break
+        zoom = z
+    return zoom
+
+
+class VectorTiler:
+    '''Cuts GeoJSON data into clipped, simplified tiles
+
+    @param data: GeoJSON object (dict) with lon-lat coordinates
+    @param simplify_pixels: (number) simplification tolerance, in pixels
+    @param buffer: (number) size of the clip buffer around each tile,
+           as fraction of the tile size
+    '''
+    def __init__(self, data, simplify_pixels=1.0, buffer=1/64.0):
+        self._data = data
+        self._simplify_pixels = simplify_pixels
+        self._buffer = buffer
+        self._latitude = geometryutils.get_max_latitude(data)
+
+    def get_tiles(self, zoom):
+        '''Generator yielding (x, y, feature collection) for non-empty tiles at zoom
+
+        '''
+        tolerance = geometryutils.get_zoom_tolerance(
+            zoom, self._simplify_pixels, self._latitude)
+        data = geometryutils.simplify_geojson(self._data, tolerance)
+        if data.get('type') == 'FeatureCollection':
+            features = data.get('features', [])
+        elif data.get('type') == 'Feature':
+            features = [data]
+        else:
+            features = [{'type': 'Feature', 'properties': {}, 'geometry': data}]
+
+        # Assign each feature to the tiles it intersects
+        tile_features = dict()
+        for feature in features:
+            bounds = geometryutils.get_bounds(feature)
+            if bounds is None:
+                continue
+            xmin, ymin, xmax, ymax = get_tile_range(bounds, zoom)
+            for x in range(xmin, xmax + 1):
+                for y in range(ymin, ymax + 1):
+                    tile_features.setdefault((x, y), []).append(feature)
+
+        for (x, y), features in sorted(tile_features.items()):
+            xmin, ymin, xmax, ymax = get_tile_bounds(zoom, x, y)
+            dx = (xmax - xmin) * self._buffer
+            dy = (ymax - ymin) * self._buffer
+            clip_bounds = [xmin - dx, ymin - dy, xmax + dx, ymax + dy]
+
+            clipped_features = list()
+            for feature in features:
+                geometry = clip_geometry(feature['geometry'], clip_bounds)
+                if geometry is not None:
+                    clipped = dict(feature)
+                    clipped['geometry'] = geometry
+                    clipped_features.append(clipped)
+            if clipped_features:
+                yield x, y, {'type': 'FeatureCollection', 'features': clipped_features}
+
+
+def clip_geometry(geometry, bounds):
+    '''Returns geometry clipped to bounds [xmin, ymin, xmax, ymax], or None if empty
+
+    Polygon rings are clipped with the Sutherland-Hodgman algorithm,
+    which can leave degenerate edges along the bounds, but those are
+    outside the tile (in the buffer) and not visible.
+    '''
+    geom_type = geometry.get('type')
+    coords = geometry.get('coordinates')
+    if geom_type == 'Point':
+        return geometry if _contains(bounds, coords) else None
+    elif geom_type == 'MultiPoint':
+        points = [p for p in coords if _contains(bounds, p)]
+        return {'type': geom_type, 'coordinates': points} if points else None
+    elif geom_type in ['LineString', 'MultiLineString']:
+        lines = [coords] if geom_type == 'LineString' else coords
+        pieces = list()
+        for line in lines:
+            pieces.extend(clip_line(line, bounds))
+        if not pieces:
+            return None
+        elif len(pieces) == 1:
+            return {'type': 'LineString', 'coordinates': pieces[0]}
+        return {'type': 'MultiLineString', 'coordinates': pieces}
+    elif geom_type == 'Polygon':
+        polygon = _clip_polygon(coords, bounds)
+        return {'type': geom_type, 'coordinates': polygon} if polygon else None
+    elif geom_type == 'MultiPolygon':
+        polygons = [_clip_polygon(polygon, bounds) for polygon in coords]
+        polygons = [polygon for polygon in polygons if polygon]
+        return {'type': geom_type, 'coordinates': polygons} if polygons else None
+    elif geom_type == 'GeometryCollection':
+        geometries = [clip_geometry(g, bounds) for g in geometry.get('geometries', [])]
+        geometries = [g for g in geometries if g is not None]
+        return {'type': geom_type, 'geometries': geometries} if geometries else None
+    return None
+
+
+def clip_line(line, bounds):
+    '''Returns list of the pieces of a line that are inside bounds
+
+    '''
+    pieces = list()
+    current = list()
+    for p, q in zip(line, line[1:]):
+        clipped = _clip_segment(p, q, bounds)
+        if clipped is None:
+            if current:
+                pieces.append(current)
+                current = list()
+            continue
+
+        a, b, start_clipped, end_clipped = clipped
+        if start_clipped or not current:
+            if current:
+                pieces.append(current)
+            current = [a]
+        current.append(b)
+        if end_clipped:
+            pieces.append(current)
+            current = list()
+    if current:
+        pieces.append(current)
+    return [piece for piece in pieces if len(piece) >= 2]
+
+
+def clip_ring(ring, bounds):
+    '''Returns (closed) ring clipped to bounds, or None if empty
+
+    '''
+    xmin, ymin, xmax, ymax = bounds
+    points = ring[:-1] if ring and ring[0] == ring[-1] else list(ring)
+    # Clip against each edge: (axis, value, keep points greater than value)
+    for axis, value, keep_greater in [(0, xmin, True), (0, xmax, False), (1, ymin, True), (1, ymax, False)]:
+        if not points:
+            break
+        def inside(p):
+            return p[axis] >= value if keep_greater else p[axis] <= value
+        def intersect(p, q):
+            t = (value - p[axis]) / (q[axis] - p[axis])
+            other = 1 - axis
+            point = [0.0, 0.0]
+            point[axis] = value
+            point[other] = p[other] + t * (q[other] - p[other])
+            return point
+
+        output = list()
+        prev = points[-1]
+        for point in points:
+            if inside(point):
+                if not inside(prev):
+                    output.append(intersect(prev, point))
+                output.append(point)
+            elif inside(prev):
+                output.append(intersect(prev, point))
+            prev = point
+        points = output
+
+    if len(points) < 3:
+        return None
+    return points + [points[0]]
+
+
+def _clip_polygon(rings, bounds):
+    '''Returns clipped rings, or empty list if exterior ring is outside bounds
+
+    '''
+    result = list()
+    for i, ring in enumerate(rings):
+        ring = clip_ring(ring, bounds)
+        if ring is not None:
+            result.append(ring)
+        elif i == 0:
+            return []
+    return result
+
+
+def _clip_segment(p, q, bounds):
+    '''Clips segment p-q to bounds (Liang-Barsky algorithm)
+
+    Returns (start, end, start_clipped, end_clipped), or None if outside
+    '''
+    xmin, ymin, xmax, ymax = bounds
+    x0, y0 = p[0], p[1]
+    dx = q[0] - x0
+    dy = q[1] - y0
+    t0, t1 = 0.0, 1.0
+    for pk, qk in [(-dx, x0 - xmin), (dx, xmax - x0), (-dy, y0 - ymin), (dy, ymax - y0)]:
+        if pk == 0:
+            if qk < 0:
+                return None
+            continue
+        t = qk / pk
+        if pk < 0:
+            if t > t1:
+                return None
+            t0 = max(t0, t)
+        else:
+            if t < t0:
+                return None
+            t1 = min(t1, t)
+
+    start = p if t0 == 0.0 else [x0 + t0*dx, y0 + t0*dy]
+    end = q if t1 == 1.0 else [x0 + t1*dx, y0 + t1*dy]
+    return start, end, t0 > 0.0, t1 < 1.0
+
+
+def _contains(bounds, position):
+    return bounds[0] <= position[0] <= bounds[2] and bounds[1] <= position[1] <= bounds[3]
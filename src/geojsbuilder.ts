@@ -9,10 +9,25 @@ import { JSONObject } from '@phosphor/coreutils';
 export interface IFeatureModel {
   data?: any;
   featureType: string;
+  levels?: IGeoJSONLevel[];
   options?: JSONObject;
+  tiles?: IGeoJSONTiles;
   url?: string;
 }
 
+// GeoJSON level of detail, displayed starting at its zoom level
+export interface IGeoJSONLevel {
+  data: any;
+  zoom: number;
+}
+
+// GeoJSON vector tiles, with url template ".../{z}/{x}/{y}.json"
+export interface IGeoJSONTiles {
+  maxZoom: number;
+  minZoom: number;
+  url: string;
+}
+
 export interface ILayerModel {
   features?: IFeatureModel[];
   layerType: string;
@@ -29,11 +44,145 @@ interface IStringMap {
   [key: string] : any;
 }
 
+// Packed array sent from the kernel as base64 string
+interface ITypedArrayModel {
+  dtype: string;
+  shape: number[];
+  data: string;
+}
+
 
+import { decode as base64Decode } from 'base64-arraybuffer';
 import { ColorFormat, ColorMap } from 'colorkit';
 import * as geo from 'geojs'
 console.debug(`Using geojs ${geo.version}`);
 
+// Returns boolean indicating if input value is a typed-array model
+function isTypedArrayModel(val: any): boolean {
+  return !!val && typeof val === 'object' && !Array.isArray(val) &&
+    ('dtype' in val) && ('data' in val);
+}
+
+// Decodes typed-array model to Float32Array or Uint8Array
+function decodeTypedArray(model: ITypedArrayModel): Float32Array | Uint8Array {
+  const buffer: ArrayBuffer = base64Decode(model.data);
+  switch (model.dtype) {
+    case 'float32':
+      return new Float32Array(buffer);
+    case 'uint8':
+      return new Uint8Array(buffer);
+    default:
+      throw Error(`Unsupported typed array dtype ${model.dtype}`);
+  }
+}
+
+// Opacity style components that go with color style components
+const colorOpacityKeys: {[key: string]: string} = {
+  color: 'opacity',
+  fillColor: 'fillOpacity',
+  strokeColor: 'strokeOpacity'
+};
+
+// Returns boolean indicating if any packed RGBA color is not opaque
+function hasTranslucentAlpha(rgba: Float32Array | Uint8Array): boolean {
+  for (let i=3; i<rgba.length; i+=4) {
+    if (rgba[i] < 255) {
+      return true;
+    }
+  }
+  return false;
+}
+
+
+// Decodes TopoJSON topology sent from the kernel to a GeoJSON object.
+// Arcs are quantized and delta-encoded; the GeoJSON data is topology
+// object "data", which is a geometry collection for feature collections.
+function decodeTopology(topology: any): any {
+  const scale: number[] = topology.transform.scale;
+  const translate: number[] = topology.transform.translate;
+  const decodePosition = (p: number[]): number[] =>
+    [p[0] * scale[0] + translate[0], p[1] * scale[1] + translate[1]];
+
+  const arcs: number[][][] = topology.arcs.map((arc: number[][]) => {
+    let x = 0;
+    let y = 0;
+    return arc.map(delta => {
+      x += delta[0];
+      y += delta[1];
+      return decodePosition([x, y]);
+    });
+  });
+
+  // Negative indices (~index) are reversed arcs
+  const decodeLine = (indices: number[]): number[][] => {
+    let coords: number[][] = [];
+    indices.forEach((index, i) => {
+      const arc = index < 0 ? arcs[~index].slice().reverse() : arcs[index];
+      coords = coords.concat(i > 0 ? arc.slice(1) : arc);
+    });
+    return coords;
+  };
+
+  const decodeGeometry = (obj: any): any => {
+    switch (obj.type) {
+      case 'Point':
+        return {type: obj.type, coordinates: decodePosition(obj.coordinates)};
+      case 'MultiPoint':
+        return {type: obj.type, coordinates: obj.coordinates.map(decodePosition)};
+      case 'LineString':
+        return {type: obj.type, coordinates: decodeLine(obj.arcs)};
+      case 'MultiLineString':
+      case 'Polygon':
+        return {type: obj.type, coordinates: obj.arcs.map(decodeLine)};
+      case 'MultiPolygon':
+        return {
+          type: obj.type,
+          coordinates: obj.arcs.map((polygon: number[][]) => polygon.map(decodeLine))
+        };
+      case 'GeometryCollection':
+        return {type: obj.type, geometries: obj.geometries.map(decodeGeometry)};
+      default:
+        return null;
+    }
+  };
+
+  const decodeFeature = (obj: any): any => {
+    let feature: IStringMap = {
+      type: 'Feature',
+      properties: obj.properties || {},
+      geometry: decodeGeometry(obj)
+    };
+    if ('id' in obj) {
+      feature.id = obj.id;
+    }
+    return feature;
+  };
+
+  const data = topology.objects.data;
+  if (data.type === 'GeometryCollection') {
+    return {type: 'FeatureCollection', features: data.geometries.map(decodeFeature)};
+  }
+  return decodeFeature(data);
+}
+
+
+// Returns the array index of a point-feature data item.
+// For columnar data, the data items are the indices themselves;
+// otherwise the index is stored in the item's __i member.
+function dataItemIndex(dataItem: any): number {
+  return (typeof dataItem === 'number') ? dataItem : dataItem.__i as number;
+}
+
+// Returns object with the column values for one data item
+function columnRow(columns: IStringMap, index: number): IStringMap {
+  let row: IStringMap = {};
+  for (let name in columns) {
+    row[name] = columns[name][index];
+  }
+  return row;
+}
+
+
 // Static var used to disable OSM layer renderer;
 // For testing, so that we don't need to mock html canvas
 let _disableOSMRenderer: boolean = false;
@@ -163,6 +312,9 @@ class GeoJSBuilder {
         case 'quad':
           let feature: any = layer.createFeature(featureModel.featureType);
           let options: JSONObject = featureModel.options || {};
+          // Columnar data is sent as a dictionary of columns; in that
+          // case, the data items passed to geojs are the point indices
+          let columns: IStringMap = null;
           if (options.data) {
             if (featureModel.featureType === 'quad') {
               // Copy the options.data array, because geojs might
@@ -173,13 +325,50 @@ class GeoJSBuilder {
               //console.log(`Same? ${dataCopy[0] == (options.data as Array<Object>)[0]}`);
               feature.data(dataCopy);
             }
+            else if (!Array.isArray(options.data)) {
+              columns = {};
+              let pointCount: number = 0;
+              const columnModels = options.data as IStringMap;
+              for (let name in columnModels) {
+                let column: any = columnModels[name];
+                if (isTypedArrayModel(column)) {
+                  column = decodeTypedArray(column as ITypedArrayModel);
+                }
+                columns[name] = column;
+                pointCount = column.length;
+              }
+              let indices: number[] = [];
+              for (let i=0; i<pointCount; ++i) {
+                indices.push(i);
+              }
+              feature.data(indices);
+            }
             else {
               feature.data(options.data);
             }
           }  // if (options.data)
 
+          // Tiled raster: quads are selected based on zoom and extent
+          if (options.tiles) {
+            this._enableRasterTiles(feature, options.tiles as JSONObject);
+          }
+
           // If position array included, set position method
           if (options.position) {
+            // Positions can be sent as typed array of packed [x,y] coords
+            let positionArray: Float32Array = null;
+            if (isTypedArrayModel(options.position)) {
+              positionArray = decodeTypedArray(
+                options.position as any as ITypedArrayModel) as Float32Array;
+            }
+            // Columnar data can specify positions as {x,y} column names
+            let xColumn: any = null;
+            let yColumn: any = null;
+            const positionModel = options.position as IStringMap;
+            if (columns && typeof positionModel.x === 'string') {
+              xColumn = columns[positionModel.x];
+              yColumn = columns[positionModel.y];
+            }
             feature.position((dataItem: any, dataIndex: number) => {
               //console.debug(`dataIndex ${dataIndex}`);
 
@@ -187,8 +376,11 @@ class GeoJSBuilder {
               // is sometimes undefined. It appears to be realted
               // to mousemove events.
               if (dataIndex === undefined) {
-                // Check for Kitware workaround
-                if ('__i' in dataItem) {
+                // Check for columnar data and Kitware workaround
+                if (typeof dataItem === 'number') {
+                  dataIndex = dataItem;
+                }
+                else if ('__i' in dataItem) {
                   //console.debug('dataItem is undefined');
                   dataIndex = dataItem.__i;
                 }
@@ -196,6 +388,15 @@ class GeoJSBuilder {
                   throw Error('dataIndex is undefined ')
                 }
               }  // if
+              if (xColumn) {
+                return {x: xColumn[dataIndex], y: yColumn[dataIndex]};
+              }
+              if (positionArray) {
+                return {
+                  x: positionArray[2*dataIndex],
+                  y: positionArray[2*dataIndex+1]
+                };
+              }
               let positions: any = options.position;
               let position: any = positions[dataIndex];
               // console.debug(`Position ${position}`);
@@ -216,9 +417,45 @@ class GeoJSBuilder {
           let useStyle: IStringMap = {};
           for (let key in styleProperties) {
             let val: any = styleProperties[key]
-            if (Array.isArray(val)) {
-              useStyle[key] = function(d: IStringMap): any {
-                let index = d.__i as number;
+            if (isTypedArrayModel(val)) {
+              const typedModel = val as ITypedArrayModel;
+              const typedArray = decodeTypedArray(typedModel);
+              if (typedModel.dtype === 'uint8') {
+                // Colors are packed as RGBA bytes
+                useStyle[key] = function(d: any): any {
+                  let index = 4 * dataItemIndex(d);
+                  return {
+                    r: typedArray[index] / 255.0,
+                    g: typedArray[index+1] / 255.0,
+                    b: typedArray[index+2] / 255.0
+                  };
+                }
+                // GeoJS colors have no alpha, so alpha is passed through
+                // as the matching opacity, unless that is also specified
+                const opacityKey: string = colorOpacityKeys[key];
+                if (opacityKey && !(opacityKey in styleProperties) &&
+                  hasTranslucentAlpha(typedArray)) {
+                  useStyle[opacityKey] = function(d: any): any {
+                    return typedArray[4 * dataItemIndex(d) + 3] / 255.0;
+                  }
+                }
+              }
+              else {
+                useStyle[key] = function(d: any): any {
+                  return typedArray[dataItemIndex(d)];
+                }
+              }
+            }
+            else if (columns && val && typeof val === 'object' && 'column' in val) {
+              // Style value from column in columnar data
+              const column: any = columns[val.column as string];
+              useStyle[key] = function(d: any): any {
+                return column[dataItemIndex(d)];
+              }
+            }
+            else if (Array.isArray(val)) {
+              useStyle[key] = function(d: any): any {
+                let index = dataItemIndex(d);
                 return val[index];
               }
             }
@@ -239,7 +476,8 @@ class GeoJSBuilder {
                 this._tooltip.position(evt.mouse.geo);
 
                 // Work from a copy of the event data
-                let userData: any = Object.assign({}, evt.data);
+                let userData: any = columns ?
+                  columnRow(columns, evt.data as number) : Object.assign({}, evt.data);
                 delete userData.__i;
                 let jsData:string = JSON.stringify(
                   userData, Object.keys(userData).sort(), 2);
@@ -289,7 +527,7 @@ class GeoJSBuilder {
                 // console.log(dataItem);
                 // console.log(`field: ${field}`);
                 //return '#993399';
-                let val = dataItem[field] as number;
+                let val = (columns ? columns[field][dataItem] : dataItem[field]) as number;
                 // console.log(`input value ${val}`)
                 if (val) {
                   let color: string= this._colorMap.interpolateColor(val, ColorFormat.HEX);
@@ -310,8 +548,89 @@ class GeoJSBuilder {
     }
   }  // _createFeatures()
 
+  // Sets quad feature data to the tiles at the pyramid level that best
+  // matches the current zoom, and that intersect the current view.
+  // Only those tile images are loaded by the browser.
+  _enableRasterTiles(feature: any, tilesModel: JSONObject): void {
+    const levels = tilesModel.levels as any[];
+    if (!levels || levels.length == 0) {
+      return;
+    }
+
+    // Compute lonlat bounds of each tile
+    const tileBounds = function(tile: any): IStringMap {
+      const corners = [tile.ul, tile.ll, tile.ur, tile.lr];
+      const xs = corners.map((pt: any) => pt.x);
+      const ys = corners.map((pt: any) => pt.y);
+      return {
+        left: Math.min(...xs),
+        right: Math.max(...xs),
+        bottom: Math.min(...ys),
+        top: Math.max(...ys)
+      };
+    };
+    for (let level of levels) {
+      for (let tile of level.tiles) {
+        tile.bounds = tileBounds(tile);
+      }
+    }
+    // Full image is the (one) tile at level 0
+    const imageBounds: IStringMap = levels[0].tiles[0].bounds;
+
+    let currentKey: string = null;
+    const updateTiles = (): void => {
+      // Use the coarsest level with at least as many pixels as the display
+      const ul = this._geoMap.gcsToDisplay(
+        {x: imageBounds.left, y: imageBounds.top}, 'EPSG:4326');
+      const lr = this._geoMap.gcsToDisplay(
+        {x: imageBounds.right, y: imageBounds.bottom}, 'EPSG:4326');
+      const displayWidth: number = Math.abs(lr.x - ul.x);
+      let levelIndex: number = levels.length - 1;
+      for (let i=0; i<levels.length; ++i) {
+        if (levels[i].width >= displayWidth) {
+          levelIndex = i;
+          break;
+        }
+      }
+
+      // Cull tiles outside the current view
+      const view = this._geoMap.bounds(undefined, 'EPSG:4326');
+      let indices: number[] = [];
+      const tiles = levels[levelIndex].tiles as any[];
+      tiles.forEach((tile: any, index: number) => {
+        const b = tile.bounds;
+        if (b.right >= view.left && b.left <= view.right &&
+            b.top >= view.bottom && b.bottom <= view.top) {
+          indices.push(index);
+        }
+      });
+
+      const key = `${levelIndex}:${indices.join(',')}`;
+      if (key === currentKey) {
+        return;
+      }
+      currentKey = key;
+      // Copy the tile objects, same as other quad data
+      const data = indices.map(index => {
+        const tile = tiles[index];
+        return {ul: tile.ul, ll: tile.ll, ur: tile.ur, lr: tile.lr, image: tile.image};
+      });
+      feature.data(data).draw();
+    };
+
+    updateTiles();
+    this._geoMap.geoOn(geo.event.pan, updateTiles);
+    this._geoMap.geoOn(geo.event.zoom, updateTiles);
+  }  // _enableRasterTiles()
+
   // Generates GeoJSON feature from feature model
   _createGeoJSONFeature(layer: any, featureModel: IFeatureModel): void {
+    if (featureModel.tiles) {
+      this._enableGeoJSONTiles(layer, featureModel.tiles);
+    }
+    if (featureModel.levels) {
+      this._enableGeoJSONLevels(layer, featureModel.levels);
+    }
     if (featureModel.data) {
       let p: Promise<void | {}> = this._loadGeoJSONObject(layer, featureModel.data);
       this._promiseList.push(p);
@@ -322,8 +641,141 @@ class GeoJSBuilder {
     }
   }
 
-  // Loads GeoJSON object
-  _loadGeoJSONObject(layer:any, data: any): Promise<void> {
+  // Displays the GeoJSON level of detail for the current map zoom.
+  // Each level is loaded when it is first displayed; after that,
+  // its features are shown or hidden as the zoom level changes.
+  _enableGeoJSONLevels(layer: any, levels: IGeoJSONLevel[]): void {
+    if (levels.length == 0) {
+      return;
+    }
+    const levelFeatures: any[][] = levels.map(() => null as any[]);
+    let currentIndex: number = -1;
+
+    const setVisible = (index: number, visible: boolean): void => {
+      if (levelFeatures[index]) {
+        levelFeatures[index].forEach(feature => feature.visible(visible));
+      }
+    };
+
+    const updateLevel = (): Promise<void> => {
+      // Use the last level whose zoom is not greater than the map zoom
+      const zoom: number = this._geoMap.zoom();
+      let index: number = 0;
+      levels.forEach((level, i) => {
+        if (level.zoom <= zoom) {
+          index = i;
+        }
+      });
+      if (index === currentIndex) {
+        return Promise.resolve();
+      }
+
+      if (currentIndex >= 0) {
+        setVisible(currentIndex, false);
+      }
+      currentIndex = index;
+      if (levelFeatures[index]) {
+        setVisible(index, true);
+        layer.draw();
+        return Promise.resolve();
+      }
+
+      return this._loadGeoJSONObject(layer, levels[index].data)
+        .then((features: any[]) => {
+          levelFeatures[index] = features || [];
+          // Zoom level might have changed while loading
+          setVisible(index, index === currentIndex);
+          layer.draw();
+        });
+    };
+
+    this._promiseList.push(updateLevel());
+    this._geoMap.geoOn(geo.event.zoom, updateLevel);
+  }  // _enableGeoJSONLevels()
+
+  // Loads the GeoJSON vector tiles in the current view, at the zoom level
+  // nearest the map zoom. Tiles that leave the view are removed from the
+  // layer, so that only the tiles in view are kept in memory.
+  _enableGeoJSONTiles(layer: any, tilesModel: IGeoJSONTiles): void {
+    // Loaded (or loading) tiles, indexed by "z/x/y"; value is feature list
+    let tileFeatures: {[key: string]: any[]} = {};
+    let currentKeys: string[] = [];
+
+    const removeTile = (key: string): void => {
+      const features = tileFeatures[key];
+      if (features) {
+        features.forEach(feature => layer.deleteFeature(feature));
+      }
+      delete tileFeatures[key];
+    };
+
+    const loadTile = (key: string): Promise<void> => {
+      tileFeatures[key] = null;
+      const [z, x, y] = key.split('/');
+      const url = tilesModel.url.replace('{z}', z).replace('{x}', x).replace('{y}', y);
+      return fetch(url)
+        .then(response => response.ok ? response.json() : null)
+        .then(data => data ? this._loadGeoJSONObject(layer, data) : [])
+        .then((features: any[]) => {
+          features = features || [];
+          if (key in tileFeatures) {
+            tileFeatures[key] = features;
+          }
+          else {
+            // Tile left the view while loading
+            features.forEach(feature => layer.deleteFeature(feature));
+          }
+          layer.draw();
+        })
+        .catch(error => {
+          console.error(error);
+        });
+    };
+
+    const updateTiles = (): Promise<void> => {
+      const maxZoom = tilesModel.maxZoom;
+      const z = Math.max(tilesModel.minZoom, Math.min(maxZoom, Math.round(this._geoMap.zoom())));
+      const n = Math.pow(2, z);
+
+      // Compute the range of tiles in the current view
+      const view = this._geoMap.bounds(undefined, 'EPSG:4326');
+      const tileX = (lon: number): number =>
+        Math.max(0, Math.min(n - 1, Math.floor((lon + 180) / 360 * n)));
+      const tileY = (lat: number): number => {
+        const rad = Math.max(-85.0511, Math.min(85.0511, lat)) * Math.PI / 180;
+        const y = (1 - Math.log(Math.tan(rad) + 1 / Math.cos(rad)) / Math.PI) / 2 * n;
+        return Math.max(0, Math.min(n - 1, Math.floor(y)));
+      };
+      let keys: string[] = [];
+      for (let x = tileX(view.left); x <= tileX(view.right); ++x) {
+        for (let y = tileY(view.top); y <= tileY(view.bottom); ++y) {
+          keys.push(`${z}/${x}/${y}`);
+        }
+      }
+
+      if (keys.join(',') === currentKeys.join(',')) {
+        return Promise.resolve();
+      }
+      currentKeys = keys;
+      Object.keys(tileFeatures)
+        .filter(key => keys.indexOf(key) < 0)
+        .forEach(removeTile);
+      const promises: Promise<void>[] = keys
+        .filter(key => !(key in tileFeatures))
+        .map(loadTile);
+      return Promise.all(promises).then(() => undefined);
+    };
+
+    this._promiseList.push(updateTiles());
+    this._geoMap.geoOn(geo.event.pan, updateTiles);
+    this._geoMap.geoOn(geo.event.zoom, updateTiles);
+  }  // _enableGeoJSONTiles()
+
+  // Loads GeoJSON object; the promise resolves to the created features
+  _loadGeoJSONObject(layer:any, data: any): Promise<any> {
+    if (data.type === 'Topology') {
+      data = decodeTopology(data);
+    }
     // console.dir(layer);
     // console.dir(data);
 
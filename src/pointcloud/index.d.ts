@@ -3,6 +3,7 @@ export class LASPointCloud {
   dispose(): void;
   loadBuffers(arraybuffers: ArrayBuffer[]): Promise<void>;
   loadFiles(files: Blob[]): Promise<void>;
+  loadOctree(url: string, hierarchyName: string): Promise<void>;
   bounds(): number[];
   pointCount(): number;
   render(elem: HTMLElement): void;
@@ -18,6 +18,7 @@ class LASPointCloud {
       formats: {},    // <point-record-format, point-count>
       pointCount: 0,  // overall point count
     }
+    this.octree = null;  // set by loadOctree()
   }  // constructor()
 
   // Deletes resources
@@ -103,6 +104,8 @@ class LASPointCloud {
         })  // then (headers)
         .then(() => {
           this.setZRange(this.input.bounds[4], this.input.bounds[5]);
+          const b = this.input.bounds;
+          this.particleSystem.setOrigin([b[0], b[2], b[4]]);
           //console.log(`bounds ${this.input.bounds}`);
           // Load each buffer in sequence
           return Promise.each(arraybuffers, buffer => this.loadData(buffer));
@@ -159,6 +162,114 @@ class LASPointCloud {
     });  // new Promise()
   }  // loadData()
 
+  // Loads octree hierarchy and its root node.
+  // The remaining nodes are loaded as needed, after render().
+  // Returns promise
+  loadOctree(url, hierarchyName) {
+    return fetch(`${url}/${hierarchyName}`)
+      .then(response => response.json())
+      .then(hierarchy => {
+        this.octree = {
+          url: url,
+          hierarchy: hierarchy,
+          requested: new Set(),  // names of nodes loaded or loading
+          loading: false,
+          maxPoints: 10000000,   // point budget
+          maxSpacing: 2.0,       // refine nodes with larger spacing (pixels)
+          timer: null
+        };
+        const b = hierarchy.bounds;
+        this.updateBounds(b);
+        this.setZRange(b[4], b[5]);
+        this.particleSystem.setOrigin([b[0], b[2], b[4]]);
+        return this.loadOctreeNode('r');
+      });
+  }  // loadOctree()
+
+  // Fetches and loads the files of one octree node
+  // Returns promise
+  loadOctreeNode(name) {
+    const node = this.octree.hierarchy.nodes[name];
+    this.octree.requested.add(name);
+    if (!node) {
+      return Promise.resolve();
+    }
+    const requests = node.files.map(filename =>
+      fetch(`${this.octree.url}/${filename}`).then(response => response.arrayBuffer()));
+    return Promise.all(requests)
+      .then(buffers => Promise.each(buffers, buffer => this.loadData(buffer)));
+  }  // loadOctreeNode()
+
+  // Loads the children of loaded nodes whose point spacing, projected
+  // to the screen, is larger than octree.maxSpacing, nearest first,
+  // until the point budget is used. Returns promise.
+  refineOctree() {
+    const octree = this.octree;
+    if (!octree || octree.loading) {
+      return Promise.resolve();
+    }
+
+    const camera = this.particleSystem.getCamera();
+    const position = camera.getPosition();
+    const height = this.particleSystem.getViewSize()[1];
+    const pixelsPerUnit = height / (2.0 * Math.tan(camera.getViewAngle() * Math.PI / 360.0));
+    const origin = [this.input.bounds[0], this.input.bounds[2], this.input.bounds[4]];
+
+    let candidates = [];
+    for (let name of octree.requested) {
+      for (let i=0; i<8; ++i) {
+        const childName = `${name}${i}`;
+        const child = octree.hierarchy.nodes[childName];
+        if (!child || octree.requested.has(childName)) {
+          continue;
+        }
+
+        // Distance from camera to node (bounding sphere)
+        const b = child.bounds;
+        const size = b[1] - b[0];
+        let distance2 = 0.0;
+        for (let axis=0; axis<3; ++axis) {
+          const center = 0.5 * (b[2*axis] + b[2*axis+1]) - origin[axis];
+          distance2 += (center - position[axis]) * (center - position[axis]);
+        }
+        const distance = Math.max(Math.sqrt(distance2) - 0.866 * size, 1e-6);
+
+        const spacing = octree.hierarchy.spacing / Math.pow(2, childName.length - 1);
+        const projected = spacing * pixelsPerUnit / distance;
+        if (projected > octree.maxSpacing) {
+          candidates.push({name: childName, projected: projected, points: child.points});
+        }
+      }  // for (i)
+    }  // for (name)
+
+    // Load the nodes with the largest projected spacing first
+    candidates.sort((a, b) => b.projected - a.projected);
+    let names = [];
+    let pointCount = this.pointCount();
+    for (let candidate of candidates.slice(0, 4)) {
+      if (pointCount + candidate.points > octree.maxPoints) {
+        break;
+      }
+      pointCount += candidate.points;
+      names.push(candidate.name);
+    }
+    if (!names.length) {
+      return Promise.resolve();
+    }
+
+    octree.loading = true;
+    return Promise.each(names, name => this.loadOctreeNode(name))
+      .then(() => {
+        octree.loading = false;
+        this.particleSystem.render();
+        return this.refineOctree();
+      })
+      .catch(err => {
+        octree.loading = false;
+        console.error(err);
+      });
+  }  // refineOctree()
+
   bounds() {
     return this.input.bounds;
   }
@@ -176,6 +287,15 @@ class LASPointCloud {
     this.particleSystem.init(elem);
     this.particleSystem.render(true);
     this.particleSystem.resize(elem);
+
+    if (this.octree) {
+      // Refine when the camera stops changing
+      this.particleSystem.onCameraModified(() => {
+        clearTimeout(this.octree.timer);
+        this.octree.timer = setTimeout(() => this.refineOctree(), 200);
+      });
+      this.refineOctree();
+    }
   }
 
   setZRange(zmin, zmax) {
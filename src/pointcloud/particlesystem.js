@@ -29,7 +29,9 @@ var ParticleSystem = function() {
     this.klass = null;
     this.pointsSoFar = 0;
     this.zrange = null;
+    this.origin = null;  // subtracted from point coordinates
 
+    this.actors = [];  // one for each particle system rendered
     this.renderer = null;
     this.renderWindow = null;
 };
@@ -54,18 +56,20 @@ ParticleSystem.prototype.push = function(lasBuffer) {
     var scalarBuffer = new Float32Array(count);
     cellBuffer[0] = count;
     var maxz, minz;
+    // Use common origin, if set, so that multiple buffers line up
+    var origin = this.origin || lasBuffer.mins;
 
     if (this.zrange) {
         // Offset values by same amount as point conversion
-        minz = this.zrange[0] - lasBuffer.mins[2];
-        maxz = this.zrange[1] - lasBuffer.mins[2];
+        minz = this.zrange[0] - origin[2];
+        maxz = this.zrange[1] - origin[2];
     }
     else {
         // Autoscale
         for ( var i = 0; i < count; i ++) {
             p = lasBuffer.getPoint(i);
             z = p.position[2] * lasBuffer.scale[2] +
-                        (lasBuffer.offset[2] - lasBuffer.mins[2]);
+                        (lasBuffer.offset[2] - origin[2]);
             if (maxz === undefined) {
                 maxz = z;
                 minz = z;
@@ -85,11 +89,11 @@ ParticleSystem.prototype.push = function(lasBuffer) {
         var p = lasBuffer.getPoint(i);
 
         pointBuffer[i*3]   = p.position[0] * lasBuffer.scale[0] +
-            (lasBuffer.offset[0] - lasBuffer.mins[0]);
+            (lasBuffer.offset[0] - origin[0]);
         pointBuffer[i*3+1] = p.position[1] * lasBuffer.scale[1] +
-            (lasBuffer.offset[1] - lasBuffer.mins[1]);
+            (lasBuffer.offset[1] - origin[1]);
         pointBuffer[i*3+2] = p.position[2] * lasBuffer.scale[2] +
-            (lasBuffer.offset[2] - lasBuffer.mins[2]);
+            (lasBuffer.offset[2] - origin[2]);
 
         cellBuffer[i+1] = i;
         scalarBuffer[i] = (pointBuffer[i*3+2] - minz)/(maxz - minz);
@@ -173,20 +177,50 @@ ParticleSystem.prototype.setZRange = function(zmin, zmax) {
     this.zrange[1] = zmax;
 }
 
+/**
+ * Set origin [x, y, z] subtracted from the coordinates of subsequent points
+ */
+ParticleSystem.prototype.setOrigin = function(origin) {
+    this.origin = origin.slice();
+}
+
+/**
+ * Returns vtk camera (after init() is called)
+ */
+ParticleSystem.prototype.getCamera = function() {
+    return this.renderer.getActiveCamera();
+}
+
+/**
+ * Returns render window size [width, height] in pixels
+ */
+ParticleSystem.prototype.getViewSize = function() {
+    return this.openglRenderWindow.getSize();
+}
+
+/**
+ * Calls function whenever the camera is modified (e.g., by interaction)
+ */
+ParticleSystem.prototype.onCameraModified = function(callback) {
+    this.getCamera().onModified(callback);
+}
+
 /**
  * Render particle system using vtk.js
+ * Adds actors for any particle systems pushed since the last render.
  */
 ParticleSystem.prototype.render = function(firstTime) {
-    if (firstTime) {
-        for (var i = 0; i < this.pss.length; ++i) {
-            const actor = vtkActor.newInstance();
-            actor.getProperty().setPointSize(5);
-            const mapper = vtkMapper.newInstance();
-            mapper.setInputData(this.pss[i]);
-            actor.setMapper(mapper);
-            this.renderer.addActor(actor);
-        }
+    for (var i = this.actors.length; i < this.pss.length; ++i) {
+        const actor = vtkActor.newInstance();
+        actor.getProperty().setPointSize(5);
+        const mapper = vtkMapper.newInstance();
+        mapper.setInputData(this.pss[i]);
+        actor.setMapper(mapper);
+        this.renderer.addActor(actor);
+        this.actors.push(actor);
+    }
 
+    if (firstTime) {
         this.renderer.resetCamera();
     }
 
@@ -215,6 +249,7 @@ ParticleSystem.prototype.destroy = function() {
         this.renderer.removeActor(actor);
         actor.delete();
     }
+    this.actors = [];
 
     this.renderWindow.delete();
     this.renderer.delete();
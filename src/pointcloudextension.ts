@@ -8,9 +8,15 @@ import { decode as base64Decode } from 'base64-arraybuffer';
 import { LASPointCloud } from '../lib/JUPYTERLAB_FILE_LOADER_pointcloud.bundle.js';
 
 // Local interface definitions - do these need to be exported?
+export interface IOctreeModel {
+  url: string;
+  hierarchy: string;
+}
+
 export interface IFeatureModel {
   data: string[];
   featureType: string;
+  octree?: IOctreeModel;
   options?: JSONObject;
   url?: string;
 }
@@ -72,6 +78,7 @@ class OutputWidget extends Widget implements IRenderMime.IRenderer {
 
     let pointcloud = new LASPointCloud();
     let buffers: ArrayBuffer[] = [];
+    let octreeModel: IOctreeModel = null;
 
     let layerModels: ILayerModel[] = mapModel.layers || [];
     for (let layerModel of layerModels) {
@@ -79,6 +86,9 @@ class OutputWidget extends Widget implements IRenderMime.IRenderer {
       for (let featureModel of featureModels) {
         // console.log('featureModel:')
         // console.dir(featureModel);
+        if (featureModel.octree) {
+          octreeModel = featureModel.octree;
+        }
         const lasArray: string[] = featureModel.data;
         for (let lasString of lasArray) {
           const binaryData: ArrayBuffer = base64Decode(lasString);
@@ -86,7 +96,10 @@ class OutputWidget extends Widget implements IRenderMime.IRenderer {
         }  // lasString
       }  // for (featureModel)
     }  // for (layerModel)
-    pointcloud.loadBuffers(buffers)
+    let loaded: Promise<void> = octreeModel ?
+      pointcloud.loadOctree(octreeModel.url, octreeModel.hierarchy) :
+      pointcloud.loadBuffers(buffers);
+    loaded
       .then(() => {
         if (!pointcloud.pointCount()) {
           // If we reach here, then no pointcloud features detected, so...
@@ -80,6 +80,15 @@ describe('GeoJSBuilder', () => {
     expect(layer1.features().length).toBe(2)  // 1 polygon with 1 edge
   });
 
+  it('should load a geojson topology', async () => {
+    geoMap = await initGeoMap('../models/geojson-topology_model.json');
+
+    let layers = geoMap.layers()
+    expect(layers.length).toBe(2);
+    let layer1 = layers[1];
+    expect(layer1.features().length).toBe(2)  // same as geojson object
+  });
+
   it('should load basic features', async () => {
     geoMap = await initGeoMap('../models/basic-features_model.json');
 
@@ -91,6 +100,28 @@ describe('GeoJSBuilder', () => {
     expect(layer1.features().length).toBe(2)
   });
 
+  it('should load point features with typed arrays', async () => {
+    geoMap = await initGeoMap('../models/typed-arrays_model.json');
+
+    let layers = geoMap.layers()
+    expect(layers.length).toBe(1);
+    let feature = layers[0].features()[0];
+    let position = feature.position()(feature.data()[1], 1);
+    expect(position.x).toBeCloseTo(-118.2436849, 4);
+    expect(position.y).toBeCloseTo(34.0522342, 4);
+  });
+
+  it('should load columnar point features', async () => {
+    geoMap = await initGeoMap('../models/columnar-points_model.json');
+
+    let feature = geoMap.layers()[0].features()[0];
+    // Data items are the point indices
+    expect(feature.data()).toEqual([0, 1, 2]);
+    let position = feature.position()(feature.data()[2], 2);
+    expect(position.x).toBeCloseTo(-87.6297982, 6);
+    expect(feature.style.get('fillColor')(1, 1)).toBe('#0000ff');
+  });
+
   it('should load raster features', async () => {
     geoMap = await initGeoMap('../models/raster-rgb_model.json')
 
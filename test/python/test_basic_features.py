@@ -1,3 +1,4 @@
+import json
 import logging
 import math
 import unittest
@@ -10,10 +11,29 @@ except ImportError:
     MPL_LOADED = False
 print('matplotlib loaded? {}'.format(MPL_LOADED))
 
+try:
+    import numpy as np
+    NUMPY_LOADED = True
+except ImportError:
+    NUMPY_LOADED = False
+
 logging.basicConfig(level=logging.DEBUG)
 
+try:
+    import pandas as pd
+    PANDAS_LOADED = True
+except ImportError:
+    PANDAS_LOADED = False
+
+try:
+    import pyarrow as pa
+    ARROW_LOADED = True
+except ImportError:
+    ARROW_LOADED = False
+
 from . import utils
-from jupyterlab_geojs import Scene, LayerType, FeatureType
+from jupyterlab_geojs import Scene, LayerType, FeatureType, vectorized
+from jupyterlab_geojs.typedarray import decode_typed_array
 
 
 class TestBasicFeatures(unittest.TestCase):
@@ -89,5 +109,329 @@ class TestBasicFeatures(unittest.TestCase):
         # Optionally write result to model file
         utils.write_model(display_model, 'basic-features_model.json')
 
+    def test_cached_display_model(self):
+        '''Test that feature display models are only rebuilt when modified'''
+        scene = Scene()
+        feature_layer = scene.create_layer(LayerType.FEATURE)
+        points = [{'x': -73.8, 'y': 42.7}, {'x': -76.1, 'y': 43.0}]
+        num_calls = [0]
+        def radius(point):
+            num_calls[0] += 1
+            return 5
+        point_feature = feature_layer.create_feature(
+            FeatureType.POINT, points, style={'radius': radius})
+
+        model1 = scene._build_display_model()
+        self.assertEqual(num_calls[0], 2)
+        model2 = scene._build_display_model()
+        self.assertEqual(num_calls[0], 2)
+        self.assertIs(model1['layers'][0], model2['layers'][0])
+
+        # Setting an option rebuilds the feature model
+        point_feature.style = {'radius': radius, 'fillColor': 'red'}
+        model3 = scene._build_display_model()
+        self.assertEqual(num_calls[0], 4)
+        feature_model = model3['layers'][0]['features'][0]
+        self.assertEqual(feature_model['options']['style']['fillColor'], 'red')
+        self.assertEqual(feature_model['options']['style']['radius'], [5, 5])
+
+        # In-place changes to the data require explicit modified() call
+        data_version = point_feature.get_data_version()
+        points.append({'x': -74.0, 'y': 40.7})
+        point_feature.modified()
+        self.assertGreater(point_feature.get_data_version(), data_version)
+        scene._build_display_model()
+        self.assertEqual(num_calls[0], 7)
+
+        # Viewport changes rebuild the model, but are not data changes
+        data_version = point_feature.get_data_version()
+        point_feature.set_viewport([-80, 40, -70, 45])
+        self.assertEqual(point_feature.get_data_version(), data_version)
+        point_feature.set_viewport(None)
+        scene._build_display_model()
+        self.assertEqual(num_calls[0], 10)
+
+        # Adding a feature rebuilds the layer but not the existing feature
+        feature_layer.create_feature(FeatureType.QUAD, [])
+        model4 = scene._build_display_model()
+        self.assertEqual(num_calls[0], 10)
+        self.assertEqual(len(model4['layers'][0]['features']), 2)
+
+    def test_typed_arrays(self):
+        '''Test sending point positions and styles as typed arrays'''
+        scene = Scene(zoom=4)
+        feature_layer = scene.create_layer(LayerType.FEATURE)
+        cities = [
+            {'lon': -74.0059413, 'lat': 40.7127837, 'population': 8405837},
+            {'lon': -118.2436849, 'lat': 34.0522342, 'population': 3884307},
+            {'lon': -87.6297982, 'lat': 41.8781136, 'population': 2718782}
+        ]
+        position = lambda city: {'x': city['lon'], 'y': city['lat']}
+        style = {
+            'fillColor': lambda city: (1.0, 0.0, 0.5),
+            'radius': lambda city: city['population'] / 1e6,
+            'strokeColor': 'black'
+        }
+        feature_layer.create_feature(
+            FeatureType.POINT, cities, position=position, style=style,
+            typedArrays=True)
+
+        display_model = scene._build_display_model()
+        utils.validate_model(display_model)
+        utils.write_model(display_model, 'typed-arrays_model.json')
+
+        options = display_model['layers'][0]['features'][0]['options']
+        self.assertNotIn('typedArrays', options)  # (kernel option only)
+        self.assertEqual(options['position']['dtype'], 'float32')
+        self.assertEqual(options['position']['shape'], [3, 2])
+        coords = decode_typed_array(options['position'])
+        self.assertAlmostEqual(coords[2], -118.2436849, 4)
+        self.assertAlmostEqual(coords[3], 34.0522342, 4)
+
+        radius = options['style']['radius']
+        self.assertEqual(radius['dtype'], 'float32')
+        self.assertAlmostEqual(decode_typed_array(radius)[0], 8.405837, 5)
+
+        fill_color = options['style']['fillColor']
+        self.assertEqual(fill_color['dtype'], 'uint8')
+        self.assertEqual(fill_color['shape'], [3, 4])
+        self.assertEqual(list(decode_typed_array(fill_color)[:4]), [255, 0, 127, 255])
+        self.assertEqual(options['style']['strokeColor'], 'black')
+
+    def test_vectorized_functions(self):
+        '''Test position and style functions called once per feature'''
+        scene = Scene()
+        feature_layer = scene.create_layer(LayerType.FEATURE)
+        points = [{'x': float(i), 'y': 2.0 * i} for i in range(5)]
+
+        num_calls = [0]
+        @vectorized
+        def radius(data):
+            num_calls[0] += 1
+            return [item['x'] + 1 for item in data]
+
+        feature = feature_layer.create_feature(
+            FeatureType.POINT, points, style={'radius': radius})
+        display_model = scene._build_display_model()
+        options = display_model['layers'][0]['features'][0]['options']
+        self.assertEqual(num_calls[0], 1)
+        self.assertEqual(options['style']['radius'], [1.0, 2.0, 3.0, 4.0, 5.0])
+
+    @unittest.skipUnless(NUMPY_LOADED, 'numpy not installed')
+    def test_vectorized_numpy_functions(self):
+        '''Test vectorized functions that return numpy arrays'''
+        scene = Scene()
+        feature_layer = scene.create_layer(LayerType.FEATURE)
+        points = [{'x': float(i), 'y': 2.0 * i} for i in range(5)]
+        position = vectorized(lambda data: np.array([[p['x'], p['y']] for p in data]))
+        radius = vectorized(lambda data: np.arange(len(data)) + 1)
+
+        feature = feature_layer.create_feature(
+            FeatureType.POINT, points, position=position, style={'radius': radius})
+        display_model = scene._build_display_model()
+        options = display_model['layers'][0]['features'][0]['options']
+        self.assertEqual(options['position'][3], {'x': 3.0, 'y': 6.0})
+        self.assertEqual(options['style']['radius'], [1, 2, 3, 4, 5])
+
+        # Same functions with typed arrays
+        feature.typedArrays = True
+        display_model = scene._build_display_model()
+        options = display_model['layers'][0]['features'][0]['options']
+        coords = decode_typed_array(options['position'])
+        self.assertEqual(list(coords[6:8]), [3.0, 6.0])
+        self.assertEqual(list(decode_typed_array(options['style']['radius'])),
+            [1.0, 2.0, 3.0, 4.0, 5.0])
+
+    @unittest.skipUnless(NUMPY_LOADED, 'numpy not installed')
+    def test_typed_arrays_numpy_scalars(self):
+        '''Test packing style values that are numpy scalars'''
+        scene = Scene()
+        feature_layer = scene.create_layer(LayerType.FEATURE)
+        points = [{'x': float(i), 'y': 2.0 * i} for i in range(3)]
+        style = {
+            'radius': lambda p: np.int64(p['x']) + 1,
+            'strokeWidth': lambda p: np.float32(p['y'])
+        }
+        feature_layer.create_feature(
+            FeatureType.POINT, points, style=style, typedArrays=True)
+
+        display_model = scene._build_display_model()
+        json.dumps(display_model)
+        options = display_model['layers'][0]['features'][0]['options']
+        radius = options['style']['radius']
+        self.assertEqual(radius['dtype'], 'float32')
+        self.assertEqual(list(decode_typed_array(radius)), [1.0, 2.0, 3.0])
+        stroke_width = options['style']['strokeWidth']
+        self.assertEqual(list(decode_typed_array(stroke_width)), [0.0, 2.0, 4.0])
+
+    def test_columnar_point_feature(self):
+        '''Test creating point feature from dictionary of columns'''
+        scene = Scene(zoom=4)
+        feature_layer = scene.create_layer(LayerType.FEATURE)
+        columns = {
+            'lon': [-74.0059413, -118.2436849, -87.6297982],
+            'lat': [40.7127837, 34.0522342, 41.8781136],
+            'name': ['New York', 'Los Angeles', 'Chicago']
+        }
+        position = vectorized(lambda cols: [
+            {'x': x, 'y': y} for x,y in zip(cols['lon'], cols['lat'])])
+        style = {
+            'fillColor': lambda row: (1.0, 0.0, 0.0) if row['lat'] > 40 else (0.0, 0.0, 1.0),
+            'radius': 5
+        }
+        feature = feature_layer.create_feature(
+            FeatureType.POINT, columns, position=position, style=style,
+            enableTooltip=True)
+        self.assertEqual(feature.get_point_count(), 3)
+
+        display_model = scene._build_display_model()
+        utils.validate_model(display_model)
+        utils.write_model(display_model, 'columnar-points_model.json')
+
+        options = display_model['layers'][0]['features'][0]['options']
+        self.assertEqual(options['data'], columns)
+        self.assertEqual(options['position'][1], {'x': -118.2436849, 'y': 34.0522342})
+        self.assertEqual(options['style']['fillColor'], ['#ff0000', '#0000ff', '#ff0000'])
+        # Input data must not be modified
+        self.assertEqual(sorted(columns.keys()), ['lat', 'lon', 'name'])
+
+        # Columns must be the same length
+        self.assertRaises(Exception, feature_layer.create_feature,
+            FeatureType.POINT, {'x': [1, 2], 'y': [1]})
+
+    def _check_table_feature(self, table):
+        '''Common checks for point features created from tables'''
+        scene = Scene()
+        feature_layer = scene.create_layer(LayerType.FEATURE)
+        feature = feature_layer.create_feature(
+            FeatureType.POINT, table, position={'x': 'lon', 'y': 'lat'},
+            style={'radius': {'column': 'size'}})
+        self.assertEqual(feature.get_point_count(), 3)
+
+        display_model = scene._build_display_model()
+        utils.validate_model(display_model)
+        options = display_model['layers'][0]['features'][0]['options']
+        self.assertEqual(options['position'], {'x': 'lon', 'y': 'lat'})
+        self.assertEqual(options['data']['size'], [4, 8, 12])
+        self.assertEqual(options['data']['name'], ['a', 'b', 'c'])
+
+        # Numeric columns sent as typed arrays
+        feature.typedArrays = True
+        display_model = scene._build_display_model()
+        options = display_model['layers'][0]['features'][0]['options']
+        self.assertEqual(list(decode_typed_array(options['data']['size'])), [4.0, 8.0, 12.0])
+
+        # Unknown column names
+        feature.position = {'x': 'longitude', 'y': 'lat'}
+        self.assertRaises(Exception, scene._build_display_model)
+
+    def test_spatial_index(self):
+        '''Test spatial queries and viewport culling for point features'''
+        scene = Scene()
+        feature_layer = scene.create_layer(LayerType.FEATURE)
+        cities = [
+            {'name': 'New York', 'lon': -74.0059413, 'lat': 40.7127837},
+            {'name': 'Los Angeles', 'lon': -118.2436849, 'lat': 34.0522342},
+            {'name': 'Chicago', 'lon': -87.6297982, 'lat': 41.8781136}
+        ]
+        feature = feature_layer.create_feature(FeatureType.POINT, cities,
+            position=lambda city: {'x': city['lon'], 'y': city['lat']},
+            style={'radius': lambda city: len(city['name'])})
+        self.assertEqual(sorted(feature.search([-100, 30, -70, 45])), [0, 2])
+        self.assertEqual(feature.nearest(-90, 40), [2])
+
+        # Only points in viewport are sent, with consecutive indices
+        feature.set_viewport([-100, 30, -80, 45])
+        display_model = scene._build_display_model()
+        utils.validate_model(display_model)
+        options = display_model['layers'][0]['features'][0]['options']
+        self.assertEqual([item['name'] for item in options['data']], ['Chicago'])
+        self.assertEqual(options['data'][0]['__i'], 0)
+        self.assertEqual(options['style']['radius'], [7])
+        self.assertEqual(len(cities), 3)
+
+        # Index is rebuilt when items are added in place, or after modified()
+        cities.append({'name': 'Denver', 'lon': -104.990251, 'lat': 39.7392358})
+        self.assertEqual(sorted(feature.search([-110, 30, -70, 45])), [0, 2, 3])
+        cities[3]['lon'] = -74.0
+        feature.modified()
+        self.assertEqual(sorted(feature.search([-110, 30, -100, 45])), [])
+        cities.pop()
+
+        # Items that are not dictionaries
+        feature = feature_layer.create_feature(FeatureType.POINT,
+            [[-74.0, 40.7], [-118.2, 34.1]], position=lambda p: {'x': p[0], 'y': p[1]},
+            viewport=[-80, 30, -70, 45])
+        self.assertEqual(feature._build_display_model()['options']['data'], [[-74.0, 40.7]])
+
+        # Columnar data
+        columns = {
+            'lon': [city['lon'] for city in cities],
+            'lat': [city['lat'] for city in cities],
+            'name': [city['name'] for city in cities]
+        }
+        feature = feature_layer.create_feature(FeatureType.POINT, columns,
+            position={'x': 'lon', 'y': 'lat'}, viewport=[-80, 30, -70, 45])
+        self.assertEqual(feature.nearest(-120, 30, k=2), [1, 2])
+        options = feature._build_display_model()['options']
+        self.assertEqual(options['data']['name'], ['New York'])
+
+    @unittest.skipUnless(PANDAS_LOADED, 'pandas not installed')
+    def test_dataframe_point_feature(self):
+        '''Test creating point feature from pandas DataFrame'''
+        df = pd.DataFrame({
+            'lon': [-74.0, -118.2, -87.6],
+            'lat': [40.7, 34.1, 41.9],
+            'size': [4, 8, 12],
+            'name': ['a', 'b', 'c']
+        })
+        self._check_table_feature(df)
+
+    @unittest.skipUnless(PANDAS_LOADED, 'pandas not installed')
+    def test_dataframe_missing_values(self):
+        '''Test sending missing values in DataFrame columns as null'''
+        df = pd.DataFrame({
+            'x': [1.5, 2.5, 3.5],
+            'y': [3.0, float('nan'), 5.0],
+            'v': pd.array([2, None, 6], dtype='Int64'),
+            'b': pd.array([True, None, False], dtype='boolean')
+        })
+        scene = Scene()
+        feature_layer = scene.create_layer(LayerType.FEATURE)
+        feature_layer.create_feature(FeatureType.POINT, df, position={'x': 'x', 'y': 'y'})
+
+        display_model = scene._build_display_model()
+        data = display_model['layers'][0]['features'][0]['options']['data']
+        self.assertEqual(data['y'], [3.0, None, 5.0])
+        self.assertEqual(data['v'], [2, None, 6])
+        self.assertEqual(data['b'], [True, None, False])
+        json.dumps(display_model, allow_nan=False)  # must not raise
+
+    @unittest.skipUnless(PANDAS_LOADED, 'pandas not installed')
+    def test_dataframe_row_functions(self):
+        '''Test per-row functions with DataFrame data return python scalars'''
+        df = pd.DataFrame({'x': [1.5, 2.5], 'y': [3.0, 4.0], 'v': [2, 4]})
+        scene = Scene()
+        feature_layer = scene.create_layer(LayerType.FEATURE)
+        feature_layer.create_feature(FeatureType.POINT, df,
+            position={'x': 'x', 'y': 'y'}, style={'radius': lambda row: row['v']})
+
+        display_model = scene._build_display_model()
+        options = display_model['layers'][0]['features'][0]['options']
+        self.assertEqual(options['style']['radius'], [2, 4])
+        self.assertIs(type(options['style']['radius'][0]), int)
+        json.dumps(display_model)  # must not raise
+
+    @unittest.skipUnless(ARROW_LOADED, 'pyarrow not installed')
+    def test_arrow_point_feature(self):
+        '''Test creating point feature from Arrow table'''
+        table = pa.table({
+            'lon': [-74.0, -118.2, -87.6],
+            'lat': [40.7, 34.1, 41.9],
+            'size': [4, 8, 12],
+            'name': ['a', 'b', 'c']
+        })
+        self._check_table_feature(table)
+
 if __name__ == '__main__':
     unittest.main()
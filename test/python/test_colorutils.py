@@ -0,0 +1,35 @@
+import unittest
+
+from jupyterlab_geojs import colorutils
+from jupyterlab_geojs.geojsfeature import GeoJSFeature
+
+
+@unittest.skipUnless(colorutils.is_numpy_loaded(), 'numpy not installed')
+class TestColorUtils(unittest.TestCase):
+
+    def test_colors_to_hex(self):
+        '''Test bulk conversion matches per-item conversion'''
+        feature = GeoJSFeature('point')
+        doubles = [(1.0, 0.0, 0.5), (0.2, 0.4, 0.6, 0.5), (0.0, 0.0, 0.0)]
+        expected = [feature._double_to_hex(c) for c in doubles]
+        self.assertEqual(colorutils.colors_to_hex(doubles), expected)
+
+        rgbs = [(255, 0, 128), (16, 32, 48)]
+        expected = [feature._rgb_to_hex(c) for c in rgbs]
+        self.assertEqual(colorutils.colors_to_hex(rgbs), expected)
+
+        # Unrecognized input
+        self.assertIsNone(colorutils.colors_to_hex(['red', 'blue']))
+        self.assertIsNone(colorutils.colors_to_hex([(300, 0, 0)]))
+
+    def test_colors_to_rgba(self):
+        '''Test conversion to RGBA bytes'''
+        rgba = colorutils.colors_to_rgba([(1.0, 0.0, 0.5), (0.2, 0.4, 0.6, 0.5)])
+        self.assertEqual(rgba.dtype.name, 'uint8')
+        self.assertEqual(rgba.tolist(), [[255, 0, 127, 255], [51, 102, 153, 127]])
+
+        rgba = colorutils.colors_to_rgba([(255, 0, 128, 64)])
+        self.assertEqual(rgba.tolist(), [[255, 0, 128, 64]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+
+try:
+    import numpy as np
+    NUMPY_LOADED = True
+except ImportError:
+    NUMPY_LOADED = False
+
+from jupyterlab_geojs import gdalutils
+
+
+@unittest.skipUnless(gdalutils.is_gdal_loaded(), 'GDAL not installed')
+class TestGDALUtils(unittest.TestCase):
+
+    def setUp(self):
+        from osgeo import osr
+        utm_ref = osr.SpatialReference()
+        utm_ref.ImportFromEPSG(32618)  # UTM zone 18N
+        self.wkt = utm_ref.ExportToWkt()
+        # Points near Albany NY
+        self.points = [[600000.0, 4700000.0], [601000.0, 4701000.0, 10.0], [590000.0, 4690000.0]]
+
+    def test_convert_points_to_lonlat(self):
+        '''Test batched conversion of point list'''
+        lonlat = gdalutils.convert_points_to_lonlat(self.points, self.wkt)
+        self.assertEqual(len(lonlat), 3)
+        lon, lat = lonlat[0]
+        self.assertAlmostEqual(lon, -73.79, places=1)
+        self.assertAlmostEqual(lat, 42.45, places=1)
+        self.assertEqual(len(lonlat[1]), 2)
+
+    @unittest.skipUnless(NUMPY_LOADED, 'numpy not installed')
+    def test_convert_array_to_lonlat(self):
+        '''Test batched conversion of numpy array, across chunks'''
+        chunk_size = gdalutils.TRANSFORM_CHUNK_SIZE
+        gdalutils.TRANSFORM_CHUNK_SIZE = 2
+        try:
+            array = np.array([p[:2] for p in self.points])
+            lonlat = gdalutils.convert_points_to_lonlat(array, self.wkt)
+        finally:
+            gdalutils.TRANSFORM_CHUNK_SIZE = chunk_size
+        self.assertEqual(lonlat.shape, (3, 2))
+        expected = gdalutils.convert_points_to_lonlat(self.points, self.wkt)
+        self.assertTrue(np.allclose(lonlat, expected))
+
+    def test_spatial_ref_cache(self):
+        '''Test caching spatial references and transforms'''
+        cache = gdalutils.SpatialRefCache(max_size=4)
+        transform = cache.get_transform(self.wkt)
+        self.assertEqual(cache.get_stats()['misses'], 3)  # transform, 2 spatial refs
+
+        # Whitespace differences map to same entry
+        wkt = '  {}\n'.format(self.wkt)
+        self.assertIs(cache.get_transform(wkt), transform)
+        self.assertEqual(cache.get_stats(), {'hits': 1, 'misses': 3, 'size': 3})
+
+        # Entries are evicted in least-recently-used order
+        cache.get_spatial_ref(3857)
+        cache.get_spatial_ref(32617)
+        self.assertEqual(cache.get_stats()['size'], 4)
+        self.assertIs(cache.get_transform(self.wkt), transform)
+
+        cache.clear()
+        self.assertEqual(cache.get_stats(), {'hits': 0, 'misses': 0, 'size': 0})
+
+class OffsetTransform:
+    '''Stand-in for osr.CoordinateTransformation that adds 1 to x and y
+
+    @param accept_arrays: (boolean) if False, raise TypeError for numpy input
+    '''
+    def __init__(self, accept_arrays):
+        self.accept_arrays = accept_arrays
+        self.input_types = list()
+
+    def TransformPoints(self, points):
+        self.input_types.append(type(points))
+        if not self.accept_arrays and not isinstance(points, list):
+            raise TypeError('not a list')
+        return [(p[0] + 1.0, p[1] + 1.0, 0.0) for p in points]
+
+
+@unittest.skipUnless(NUMPY_LOADED, 'numpy not installed')
+class TestTransformPoints(unittest.TestCase):
+
+    def test_array_input(self):
+        '''Test passing numpy arrays to TransformPoints without list conversion'''
+        array = np.array([[1.0, 2.0], [3.0, 4.0]])
+        transform = OffsetTransform(accept_arrays=True)
+        result = gdalutils.transform_points(array, transform)
+        np.testing.assert_allclose(result, [[2.0, 3.0], [4.0, 5.0]])
+        self.assertEqual(transform.input_types, [np.ndarray])
+
+        # Falls back to lists for bindings that don't accept arrays
+        transform = OffsetTransform(accept_arrays=False)
+        result = gdalutils.transform_points(array, transform)
+        np.testing.assert_allclose(result, [[2.0, 3.0], [4.0, 5.0]])
+        self.assertEqual(transform.input_types, [np.ndarray, list])
+
+if __name__ == '__main__':
+    unittest.main()
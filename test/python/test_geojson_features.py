@@ -1,11 +1,15 @@
+import io
+import json
 import logging
 import os
+import tempfile
 import unittest
 
 logging.basicConfig(level=logging.DEBUG)
 
 from . import utils
-from jupyterlab_geojs import Scene
+from jupyterlab_geojs import Scene, gdalutils, geometryutils
+from jupyterlab_geojs.geojsonstream import GeoJSONStreamReader
 
 ny_polygons = { "type": "Feature",
   "geometry": {
@@ -58,5 +62,239 @@ class TestGeoJSONFeatures(unittest.TestCase):
         utils.validate_model(display_model)
         utils.write_model(display_model, 'shpfile_model.json')
 
+    @unittest.skipUnless(gdalutils.is_gdal_loaded(), 'GDAL not installed')
+    def test_ogr_filters(self):
+        '''Test reading vector file with OGR filters and column selection'''
+        scene = Scene()
+        feature_layer = scene.create_layer('feature', features=['polygon'])
+        filename = os.path.join(utils.data_folder, 'polygons.shp')
+
+        # Only the 3rd polygon (bounds [2,2,5,5]) intersects bbox
+        feature = feature_layer.create_feature('polygon', filename, bbox=[4.5, 4.5, 6, 6])
+        features = feature._json_data['features']
+        self.assertEqual([f['properties']['FID'] for f in features], [2])
+
+        feature = feature_layer.create_feature('polygon', filename,
+            where='FID < 2', properties=[])
+        features = feature._json_data['features']
+        self.assertEqual(len(features), 2)
+        self.assertEqual(features[0]['properties'], {})
+        self.assertEqual(features[0]['geometry']['type'], 'Polygon')
+
+        display_model = scene._build_display_model()
+        utils.validate_model(display_model)
+
+    def test_spatial_index(self):
+        '''Test spatial queries and viewport culling for geojson features'''
+        points = [{
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [float(i), float(i)]},
+            'properties': {'id': i}
+        } for i in range(10)]
+        fc = {'type': 'FeatureCollection', 'features': points + [ny_polygons]}
+
+        scene = Scene()
+        feature_layer = scene.create_layer('feature', features=['point', 'polygon'])
+        feature = feature_layer.create_feature('geojson', data=fc)
+        self.assertEqual(sorted(feature.search([2.5, 2.5, 5, 5])), [3, 4, 5])
+        self.assertEqual(feature.search([-77, 43, -76, 44]), [10])
+        self.assertEqual(feature.nearest(7.2, 7.4, k=2), [7, 8])
+
+        feature.set_viewport([-80, 40, 1, 50])
+        display_model = scene._build_display_model()
+        utils.validate_model(display_model)
+        data = display_model['layers'][0]['features'][0]['data']
+        self.assertEqual(data['features'], [ny_polygons])
+        self.assertEqual(len(fc['features']), 11)
+
+    def test_stream_reader(self):
+        '''Test parsing geojson incrementally, with small read size'''
+        fc = {
+            'type': 'FeatureCollection',
+            'features': [ny_polygons] * 3,
+            'bbox': [-78.878369, 42.083639, -73.756232, 43.974784]
+        }
+        text = json.dumps(fc, indent=2)
+        reader = GeoJSONStreamReader(io.StringIO(text), chunk_size=7)
+        features = list(reader.iter_features())
+        self.assertEqual(features, fc['features'])
+        self.assertEqual(reader.members, {'type': fc['type'], 'bbox': fc['bbox']})
+
+    def test_stream_reader_errors(self):
+        '''Test that malformed geojson is reported without reading to the end'''
+        padding = ' ' * 100000
+        text = '{"type": "FeatureCollection", "features": [{"type": "Feature",, ' + \
+            '"geometry": null}' + padding + ']}'
+        f = io.StringIO(text)
+        reader = GeoJSONStreamReader(f, chunk_size=100)
+        self.assertRaises(ValueError, list, reader.iter_features())
+        self.assertLess(f.tell(), 1000)
+
+        # Values larger than max_value_size
+        text = '{"type": "FeatureCollection", "features": ["' + 'x' * 100000 + '"]}'
+        f = io.StringIO(text)
+        reader = GeoJSONStreamReader(f, chunk_size=100, max_value_size=1000)
+        self.assertRaises(Exception, list, reader.iter_features())
+        self.assertLess(f.tell(), 3000)
+
+    def test_geojson_file_filter(self):
+        '''Test loading geojson file with feature filter and properties'''
+        points = [{
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [-76.0 + i, 43.0]},
+            'properties': {'id': i, 'name': 'point{}'.format(i)}
+        } for i in range(5)]
+        fc = {'type': 'FeatureCollection', 'features': points}
+
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'points.geojson')
+            with open(filename, 'w') as f:
+                json.dump(fc, f)
+
+            scene = Scene()
+            feature_layer = scene.create_layer('feature', features=['point'])
+            feature = feature_layer.create_feature('geojson', filename)
+            self.assertEqual(feature._json_data, fc)
+
+            feature = feature_layer.create_feature('geojson', filename,
+                feature_filter=lambda f: f['properties']['id'] % 2 == 0,
+                properties=['id'])
+            display_model = scene._build_display_model()
+            utils.validate_model(display_model)
+
+        features = feature._json_data['features']
+        self.assertEqual([f['properties'] for f in features], [{'id': 0}, {'id': 2}, {'id': 4}])
+        self.assertNotIn('feature_filter', feature._options)
+
+    def test_simplify_levels(self):
+        '''Test geojson feature with simplified levels of detail'''
+        scene = Scene()
+        feature_layer = scene.create_layer('feature', features=['polygon'])
+        feature = feature_layer.create_feature('geojson', data=ny_polygons,
+            simplify_zoom=[8, 1], simplify_pixels=2)
+        display_model = scene._build_display_model()
+        utils.validate_model(display_model)
+
+        feature_model = display_model['layers'][0]['features'][0]
+        self.assertNotIn('data', feature_model)
+        levels = feature_model['levels']
+        self.assertEqual([level['zoom'] for level in levels], [1, 8])
+
+        # Lower zoom levels have fewer vertices
+        counts = [len(level['data']['geometry']['coordinates'][0]) for level in levels]
+        self.assertLess(counts[0], counts[1])
+        self.assertLessEqual(counts[1], len(ny_polygons['geometry']['coordinates'][0]))
+
+        # Levels that are the same as the next lower zoom are not sent
+        feature = feature_layer.create_feature('geojson', data=ny_polygons,
+            simplify_zoom=[1, 8, 20, 21], simplify_pixels=2)
+        levels = feature._build_display_model()['levels']
+        self.assertEqual([level['zoom'] for level in levels], [1, 8])
+
+        # Single zoom level replaces the data
+        feature = feature_layer.create_feature('geojson', data=ny_polygons, simplify_zoom=1)
+        feature_model = feature._build_display_model()
+        coords = feature_model['data']['geometry']['coordinates'][0]
+        self.assertLess(len(coords), len(ny_polygons['geometry']['coordinates'][0]))
+        self.assertNotIn('levels', feature_model)
+
+    def test_quantized_topology(self):
+        '''Test geojson feature sent as quantized topology'''
+        scene = Scene()
+        scene.center = {'x': -76.5, 'y': 43.0};
+        scene.zoom = 7;
+        scene.create_layer('osm', renderer='canvas');
+        feature_layer = scene.create_layer('feature', features=['point', 'line', 'polygon'])
+        feature_layer.create_feature('geojson', data=ny_polygons, quantize=10000)
+
+        display_model = scene._build_display_model()
+        utils.validate_model(display_model)
+        utils.write_model(display_model, 'geojson-topology_model.json')
+
+        topology = display_model['layers'][1]['features'][0]['data']
+        self.assertEqual(topology['type'], 'Topology')
+        self.assertEqual(topology['objects']['data']['properties'], ny_polygons['properties'])
+
+        # Decoded coordinates are within one grid step
+        feature = geometryutils.decode_topology(topology)
+        expected = ny_polygons['geometry']['coordinates'][0]
+        decoded = feature['geometry']['coordinates'][0]
+        self.assertEqual(len(decoded), len(expected))
+        scale = topology['transform']['scale']
+        for p in expected:
+            self.assertTrue(any(abs(p[0]-q[0]) <= scale[0] and abs(p[1]-q[1]) <= scale[1] \
+                for q in decoded))
+
+    def test_vector_tiles(self):
+        '''Test geojson feature displayed as vector tiles'''
+        scene = Scene()
+        feature_layer = scene.create_layer('feature', features=['polygon'])
+        with tempfile.TemporaryDirectory() as folder:
+            feature_layer.create_feature('geojson', data=ny_polygons,
+                tiled=True, tile_dir=folder, tile_url='files/tiles/', tile_zoom_range=[4, 6])
+            display_model = scene._build_display_model()
+            utils.validate_model(display_model)
+
+            tiles = display_model['layers'][0]['features'][0]['tiles']
+            self.assertEqual(tiles, {'url': 'files/tiles/{z}/{x}/{y}.json', 'minZoom': 4, 'maxZoom': 6})
+
+            # NY polygon is within one tile at zoom 4 (x 4, y 5)
+            filename = os.path.join(folder, '4', '4', '5.json')
+            with open(filename) as f:
+                topology = json.load(f)
+            self.assertEqual(topology['type'], 'Topology')
+            feature = geometryutils.decode_topology(topology)['features'][0]
+            self.assertEqual(feature['properties'], ny_polygons['properties'])
+            self.assertEqual(sorted(os.listdir(folder)), ['4', '5', '6', 'source.json'])
+
+            # Tiles for unchanged data are reused
+            os.utime(filename, (0, 0))
+            scene._build_display_model()
+            self.assertEqual(os.stat(filename).st_mtime, 0)
+
+    def test_vector_tiles_reuse(self):
+        '''Test reusing and clearing vector tiles written from file'''
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'ny.geojson')
+            with open(filename, 'w') as f:
+                json.dump(ny_polygons, f)
+            tile_dir = os.path.join(folder, 'tiles')
+
+            def build(zoom_range):
+                scene = Scene()
+                feature_layer = scene.create_layer('feature', features=['polygon'])
+                feature_layer.create_feature('geojson', data=filename, tiled=True,
+                    tile_dir=tile_dir, tile_url='files/tiles', tile_zoom_range=zoom_range)
+                display_model = scene._build_display_model()
+                return display_model['layers'][0]['features'][0]['tiles']
+
+            build([4, 6])
+            self.assertEqual(sorted(os.listdir(tile_dir)), ['4', '5', '6', 'source.json'])
+
+            # Tiles are reused while the source is unchanged
+            tile_path = os.path.join(tile_dir, '4', '4', '5.json')
+            os.utime(tile_path, (0, 0))
+            build([4, 6])
+            self.assertEqual(os.stat(tile_path).st_mtime, 0)
+
+            # Tiles are cleared when the source or options change
+            os.utime(filename, (1, 1))
+            build([4, 5])
+            self.assertNotEqual(os.stat(tile_path).st_mtime, 0)
+            self.assertEqual(sorted(os.listdir(tile_dir)), ['4', '5', 'source.json'])
+
+            # Max zoom is limited by the data extent
+            tiles = build([0, 30])
+            self.assertLess(tiles['maxZoom'], 30)
+
+            # Files that were not written by the feature are kept
+            other_path = os.path.join(tile_dir, '4', 'other.txt')
+            with open(other_path, 'w') as f:
+                f.write('other')
+            build([4, 6])
+            self.assertTrue(os.path.exists(other_path))
+            os.remove(os.path.join(tile_dir, 'source.json'))
+            self.assertRaises(Exception, build, [4, 6])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+
+from jupyterlab_geojs import geometryutils
+
+
+def wiggly_line(x0, x1, n, amplitude):
+    '''Returns line from (x0,0) to (x1,0) with small zigzag'''
+    dx = (x1 - x0) / (n - 1)
+    return [[x0 + i*dx, amplitude if i % 2 else 0.0] for i in range(n)]
+
+
+class TestGeometryUtils(unittest.TestCase):
+
+    def test_simplify_points(self):
+        '''Test Douglas-Peucker simplification of a line'''
+        line = [[0,0], [1,0.1], [2,-0.1], [3,5], [4,6], [5,7.1], [6,8]]
+        self.assertEqual(geometryutils.simplify_points(line, 0.5), [[0,0], [2,-0.1], [3,5], [6,8]])
+        self.assertEqual(geometryutils.simplify_points(line, 100), [[0,0], [6,8]])
+        self.assertEqual(geometryutils.simplify_points(line, 0.0), line)
+
+    def test_zoom_tolerance(self):
+        '''Test computing tolerance from zoom level'''
+        self.assertAlmostEqual(geometryutils.get_zoom_tolerance(0), 360.0 / 256)
+        self.assertAlmostEqual(geometryutils.get_zoom_tolerance(2, pixels=2), 720.0 / 1024)
+        self.assertAlmostEqual(
+            geometryutils.get_zoom_tolerance(0, latitude=60), 0.5 * 360.0 / 256)
+
+    def test_shared_border(self):
+        '''Test that polygons sharing a border are simplified the same way'''
+        # Two squares that share a wiggly edge along x == 1
+        border = [[1.0, y] for y in [0.0, 0.3, 0.5, 0.7, 1.0]]
+        for i, pos in enumerate(border):
+            pos[0] += 0.01 if i % 2 else 0.0
+        left = [[0.0,0.0]] + border + [[0.0,1.0], [0.0,0.0]]
+        right = [[2.0,1.0]] + list(reversed(border)) + [[2.0,0.0], [2.0,1.0]]
+        fc = {
+            'type': 'FeatureCollection',
+            'features': [
+                {'type': 'Feature', 'properties': {'name': 'left'},
+                    'geometry': {'type': 'Polygon', 'coordinates': [left]}},
+                {'type': 'Feature', 'properties': {'name': 'right'},
+                    'geometry': {'type': 'Polygon', 'coordinates': [right]}},
+            ]
+        }
+        result = geometryutils.simplify_geojson(fc, 0.1)
+
+        # Input is not modified
+        self.assertEqual(fc['features'][0]['geometry']['coordinates'], [left])
+
+        left_ring = result['features'][0]['geometry']['coordinates'][0]
+        right_ring = result['features'][1]['geometry']['coordinates'][0]
+        self.assertLess(len(left_ring), len(left))
+        self.assertEqual(result['features'][0]['properties'], {'name': 'left'})
+
+        # Both polygons have the same vertices along the border
+        left_border = {tuple(p) for p in left_ring if p[0] > 0.5}
+        right_border = {tuple(p) for p in right_ring if p[0] < 1.5}
+        self.assertEqual(left_border, right_border)
+        self.assertEqual(left_border, {(1.0, 0.0), (1.0, 1.0)})
+
+    def test_collapsed_geometry(self):
+        '''Test removing polygons that collapse'''
+        tiny = [[0,0], [0.001,0], [0.001,0.001], [0,0]]
+        big = [[10,10], [20,10], [20,20], [10,20], [10,10]]
+        line = wiggly_line(0.0, 10.0, 21, 0.01)
+        fc = {
+            'type': 'FeatureCollection',
+            'features': [
+                {'type': 'Feature', 'properties': {},
+                    'geometry': {'type': 'Polygon', 'coordinates': [tiny]}},
+                {'type': 'Feature', 'properties': {},
+                    'geometry': {'type': 'MultiPolygon', 'coordinates': [[tiny], [big, tiny]]}},
+                {'type': 'Feature', 'properties': {},
+                    'geometry': {'type': 'LineString', 'coordinates': line}},
+                {'type': 'Feature', 'properties': {},
+                    'geometry': {'type': 'Point', 'coordinates': [1, 2]}},
+            ]
+        }
+        result = geometryutils.simplify_geojson(fc, 0.1)
+        features = result['features']
+        self.assertEqual(len(features), 3)
+        self.assertEqual(features[0]['geometry']['coordinates'], [[big]])
+        self.assertEqual(features[1]['geometry']['coordinates'], [[0.0, 0.0], [10.0, 0.0]])
+        self.assertEqual(features[2]['geometry']['coordinates'], [1, 2])
+
+    def test_encode_topology(self):
+        '''Test encoding geojson as topology with shared arcs'''
+        # Two squares sharing the edge x == 1
+        left = [[0,0], [1,0], [1,1], [0,1], [0,0]]
+        right = [[1,0], [2,0], [2,1], [1,1], [1,0]]
+        fc = {
+            'type': 'FeatureCollection',
+            'features': [
+                {'type': 'Feature', 'id': 1, 'properties': {'name': 'left'},
+                    'geometry': {'type': 'Polygon', 'coordinates': [left]}},
+                {'type': 'Feature', 'properties': {'name': 'right'},
+                    'geometry': {'type': 'Polygon', 'coordinates': [right]}},
+                {'type': 'Feature', 'properties': {},
+                    'geometry': {'type': 'Point', 'coordinates': [0.5, 0.5]}},
+            ]
+        }
+        topology = geometryutils.encode_topology(fc, quantization=3)
+        self.assertEqual(topology['transform'], {'scale': [1.0, 0.5], 'translate': [0, 0]})
+
+        # Shared edge is stored once, and used reversed by one polygon
+        self.assertEqual(len(topology['arcs']), 3)
+        geometries = topology['objects']['data']['geometries']
+        left_arcs = geometries[0]['arcs'][0]
+        right_arcs = geometries[1]['arcs'][0]
+        shared = set(left_arcs) & {~i for i in right_arcs}
+        self.assertEqual(len(shared), 1)
+
+        # Arcs are delta encoded
+        for arc in topology['arcs']:
+            for delta in arc[1:]:
+                self.assertLessEqual(abs(delta[0]) + abs(delta[1]), 2)
+
+        result = geometryutils.decode_topology(topology)
+        self.assertEqual(result['features'][0]['id'], 1)
+        self.assertEqual(result['features'][1]['properties'], {'name': 'right'})
+        self.assertEqual(result['features'][2]['geometry'], {'type': 'Point', 'coordinates': [0.0, 0.5]})
+        for feature, ring in zip(result['features'], [left, right]):
+            decoded = feature['geometry']['coordinates'][0]
+            self.assertEqual(len(decoded), 5)
+            self.assertEqual(decoded[0], decoded[-1])
+            self.assertEqual({tuple(p) for p in decoded}, {tuple(map(float, p)) for p in ring})
+
+if __name__ == '__main__':
+    unittest.main()
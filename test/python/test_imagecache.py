@@ -0,0 +1,69 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from jupyterlab_geojs.imagecache import ImageCache
+
+
+class TestImageCache(unittest.TestCase):
+
+    def test_get_put(self):
+        '''Test adding and retrieving cache entries'''
+        with tempfile.TemporaryDirectory() as folder:
+            cache = ImageCache(folder)
+            key = ['png', '/path/to/file.tif', 1234.5, 100, None, [10, 20]]
+            self.assertIsNone(cache.get(key))
+            cache.put(key, b'image bytes')
+            self.assertEqual(cache.get(key), b'image bytes')
+
+            # Any change to the key is a cache miss
+            other_key = ['png', '/path/to/file.tif', 1234.6, 100, None, [10, 20]]
+            self.assertIsNone(cache.get(other_key))
+
+            cache.enabled = False
+            self.assertIsNone(cache.get(key))
+            cache.enabled = True
+
+            cache.clear()
+            self.assertIsNone(cache.get(key))
+            self.assertEqual(cache.get_size(), 0)
+
+    def test_eviction(self):
+        '''Test removing least-recently-used entries'''
+        with tempfile.TemporaryDirectory() as folder:
+            cache = ImageCache(folder, max_bytes=250)
+            cache.put(['a'], b'a' * 100)
+            cache.put(['b'], b'b' * 100)
+
+            # Set file times so that 'a' is most recently used
+            now = time.time()
+            os.utime(cache._get_path(['b']), (now - 10, now - 10))
+            os.utime(cache._get_path(['a']), (now - 5, now - 5))
+
+            cache.put(['c'], b'c' * 100)
+            self.assertIsNone(cache.get(['b']))
+            self.assertIsNotNone(cache.get(['a']))
+            self.assertIsNotNone(cache.get(['c']))
+            self.assertLessEqual(cache.get_size(), 250)
+
+    def test_running_size(self):
+        '''Test that the folder is only listed when over the size limit'''
+        with tempfile.TemporaryDirectory() as folder:
+            cache = ImageCache(folder, max_bytes=250)
+            cache.put(['a'], b'a' * 100)  # first put scans the folder
+            with mock.patch.object(cache, '_list_entries',
+                side_effect=cache._list_entries) as list_entries:
+                cache.put(['b'], b'b' * 100)
+                cache.put(['b'], b'b' * 50)  # replaced entry
+                self.assertEqual(list_entries.call_count, 0)
+                cache.put(['c'], b'c' * 100)
+                self.assertEqual(list_entries.call_count, 0)
+                cache.put(['d'], b'd' * 100)
+                self.assertEqual(list_entries.call_count, 1)
+            self.assertLessEqual(cache.get_size(), 250)
+            self.assertEqual(cache._total_bytes, cache.get_size())
+
+if __name__ == '__main__':
+    unittest.main()
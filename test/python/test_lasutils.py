@@ -0,0 +1,141 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from . import utils
+from jupyterlab_geojs import lasutils, pointcloudutils
+
+if lasutils.is_numpy_loaded():
+    import numpy as np
+
+
+@unittest.skipUnless(lasutils.is_numpy_loaded(), 'numpy not installed')
+class TestLASPointReader(unittest.TestCase):
+
+    def test_read_100points(self):
+        '''Test decoding point records (format 3)'''
+        filename = os.path.join(utils.data_folder, '100-points.las')
+        reader = lasutils.LASPointReader(filename)
+        self.assertEqual(len(reader), 100)
+
+        records = reader.get_records()
+        self.assertEqual(records.shape, (100,))
+        self.assertEqual(records.dtype.itemsize, 34)
+
+        # Scaled coordinates match header bounds
+        h = reader.metadata.header
+        self.assertAlmostEqual(reader.get_x().min(), h.min_x)
+        self.assertAlmostEqual(reader.get_y().max(), h.max_y)
+        self.assertAlmostEqual(reader.get_z().max(), 530.61)
+
+        # Return numbers match header counts
+        returns = reader.get_return_numbers()
+        counts = tuple(int((returns == n).sum()) for n in range(1, 6))
+        self.assertEqual(counts, (89, 10, 1, 0, 0))
+
+        # Subsets
+        xyz = reader.get_xyz([0, 10, 20])
+        self.assertEqual(xyz.shape, (3, 3))
+        self.assertAlmostEqual(xyz[1][0], reader.get_x()[10])
+
+    def test_iter_chunks(self):
+        '''Test reading point records one chunk at a time'''
+        filename = os.path.join(utils.data_folder, '100-points.las')
+        reader = lasutils.LASPointReader(filename)
+        records = reader.get_records()
+
+        chunks = list(reader.iter_chunks(chunk_size=30))
+        self.assertEqual([start for start, chunk in chunks], [0, 30, 60, 90])
+        self.assertEqual(sum(len(chunk) for start, chunk in chunks), 100)
+
+        indices = np.array([1, 2, 40, 99])
+        selected = list(reader.iter_selected(indices, chunk_size=3))
+        self.assertEqual(len(selected), 2)
+        self.assertEqual(list(np.concatenate([s[0] for s in selected])), list(indices))
+        xyz = reader.scale_xyz(np.concatenate([s[1] for s in selected]))
+        np.testing.assert_allclose(xyz, reader.get_xyz(indices))
+
+    @unittest.skipUnless(lasutils.is_laz_supported(), 'laz backend not installed')
+    def test_read_laz(self):
+        '''Test decompressing laz point records'''
+        filename = os.path.join(utils.data_folder, '100-points.las')
+        las_reader = lasutils.LASPointReader(filename)
+        with tempfile.TemporaryDirectory() as folder:
+            laz_filename = os.path.join(folder, '100-points.laz')
+            lasutils.laspy.read(filename).write(laz_filename)
+
+            reader = lasutils.LASPointReader(laz_filename)
+            self.assertTrue(reader.compressed)
+            self.assertEqual(len(reader), 100)
+            self.assertRaises(Exception, reader.get_records)
+            chunks = [chunk for start, chunk in reader.iter_chunks(chunk_size=30)]
+            xyz = reader.scale_xyz(np.concatenate(chunks))
+            np.testing.assert_allclose(xyz, las_reader.get_xyz())
+
+            # Selected points are written as uncompressed LAS data
+            indices = np.arange(0, 100, 3)
+            las_data = reader.get_las_bytes(indices)
+            metadata = lasutils.LASParser().parse(io.BytesIO(las_data))
+            self.assertEqual(metadata.header.point_data_record_format, 3)
+            self.assertEqual(metadata.header.legacy_point_count, len(indices))
+            self.assertEqual(len(las_data),
+                metadata.header.offset_to_points + 34 * len(indices))
+
+            # Sampled points are only decompressed once
+            reader = lasutils.LASPointReader(laz_filename)
+            with mock.patch.object(lasutils.LASPointReader, 'iter_chunks',
+                autospec=True, side_effect=lasutils.LASPointReader.iter_chunks) as iter_chunks:
+                selections = pointcloudutils.filter_points([reader], return_numbers=[1])
+                selections = pointcloudutils.sample_points([reader], voxel_size=10.0,
+                    max_points=20, selections=selections)
+                las_data = reader.get_las_bytes(selections[0])
+                self.assertEqual(iter_chunks.call_count, 1)
+            expected = las_reader.get_records()[selections[0]]
+            self.assertEqual(las_data[-34 * len(expected):], expected.tobytes())
+
+    def test_point_dtypes(self):
+        '''Test record sizes of point formats 0-3'''
+        sizes = [lasutils.get_point_dtype(f).itemsize for f in range(4)]
+        self.assertEqual(sizes, [20, 28, 26, 34])
+
+        # Extra bytes
+        dtype = lasutils.get_point_dtype(1, 32)
+        self.assertEqual(dtype.itemsize, 32)
+        self.assertRaises(Exception, lasutils.get_point_dtype, 3, 20)
+        self.assertRaises(Exception, lasutils.get_point_dtype, 6)
+
+
+class TestLASHeaderCache(unittest.TestCase):
+
+    def test_header_cache(self):
+        '''Test caching parsed headers in sidecar file'''
+        for name in ['100-points.las', 'test1_4.las']:
+            with tempfile.TemporaryDirectory() as folder:
+                filename = os.path.join(folder, name)
+                shutil.copyfile(os.path.join(utils.data_folder, name), filename)
+                expected = lasutils.read_metadata(filename)
+
+                cache_path = os.path.join(folder, 'headers.json')
+                cache = lasutils.LASHeaderCache(cache_path)
+                self.assertIsNone(cache.get(filename))
+                lasutils.read_metadata(filename, cache)
+                cache.save()
+
+                # New instance reads the cache file
+                cache = lasutils.LASHeaderCache(cache_path)
+                metadata = cache.get(filename)
+                self.assertIsNotNone(metadata)
+                self.assertEqual(str(metadata.header), str(expected.header))
+                self.assertEqual(metadata.projection_wkt, expected.projection_wkt)
+                self.assertEqual(metadata.header.legacy_number_of_points_by_return,
+                    expected.header.legacy_number_of_points_by_return)
+
+                # Entry is not used after the file is modified
+                os.utime(filename, (0, 0))
+                self.assertIsNone(cache.get(filename))
+
+if __name__ == '__main__':
+    unittest.main()
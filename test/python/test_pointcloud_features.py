@@ -1,8 +1,14 @@
+import base64
+import io
 import os
+import shutil
+import tempfile
 import unittest
+from unittest import mock
 
 from . import utils
-from jupyterlab_geojs import Scene, gdalutils
+from jupyterlab_geojs import Scene, gdalutils, lasutils, pointoctree
+from jupyterlab_geojs.lasutils import LASParser, LASPointReader
 
 
 class TestPointCloudFeatures(unittest.TestCase):
@@ -40,6 +46,204 @@ class TestPointCloudFeatures(unittest.TestCase):
         self.assertIsNotNone(feature)
         self.assertTrue('data' in feature)
 
+    @unittest.skipUnless(lasutils.is_numpy_loaded(), 'numpy not installed')
+    def test_las_decimation(self):
+        '''Test decimating points sent to the client'''
+        filename = os.path.join(utils.data_folder, '100-points.las')
+
+        scene, pointcloud = utils.create_pointcloud(filename, sample_step=2)
+        self.assertEqual(len(pointcloud.get_sample_indices()[0]), 50)
+
+        # Random sampling is repeatable, and keeps points in file order
+        scene, pointcloud = utils.create_pointcloud(filename, max_points=20)
+        indices = pointcloud.get_sample_indices()[0]
+        self.assertEqual(len(indices), 20)
+        self.assertTrue(all(indices[:-1] < indices[1:]))
+        scene, pointcloud = utils.create_pointcloud(filename, max_points=20)
+        self.assertEqual(list(pointcloud.get_sample_indices()[0]), list(indices))
+
+        scene, pointcloud = utils.create_pointcloud(filename, voxel_size=10.0, max_points=20)
+        indices = pointcloud.get_sample_indices()[0]
+        self.assertLessEqual(len(indices), 20)
+        self.assertTrue(all(indices[:-1] < indices[1:]))
+
+        # Voxel sampling keeps one point per voxel
+        scene, pointcloud = utils.create_pointcloud(filename, voxel_size=500.0)
+        indices = pointcloud.get_sample_indices()[0]
+        reader = pointcloud.get_point_readers()[0]
+        cells = set(tuple(c) for c in ((reader.get_xyz(indices) - \
+            reader.get_xyz().min(axis=0)) // 500.0).astype(int))
+        self.assertEqual(len(cells), len(indices))
+        self.assertLess(len(indices), 100)
+
+        display_model = scene._build_display_model()
+        utils.validate_model(display_model)
+
+        # Client data is a LAS file with the selected points
+        feature = display_model['layers'][0]['features'][0]
+        las_data = base64.b64decode(feature['data'][0])
+        metadata = LASParser().parse(io.BytesIO(las_data))
+        self.assertEqual(metadata.header.legacy_point_count, len(indices))
+        self.assertEqual(sum(metadata.header.legacy_number_of_points_by_return), len(indices))
+        self.assertEqual(len(las_data),
+            metadata.header.offset_to_points + 34 * len(indices))
+        self.assertAlmostEqual(metadata.header.max_z, reader.get_z(indices).max())
+
+    @unittest.skipUnless(lasutils.is_numpy_loaded(), 'numpy not installed')
+    def test_las_filters(self):
+        '''Test filtering points sent to the client'''
+        filename = os.path.join(utils.data_folder, '100-points.las')
+        reader = LASPointReader(filename)
+        xyz = reader.get_xyz()
+        classes = reader.get_classifications()
+        returns = reader.get_return_numbers()
+        intensity = reader.get_field('intensity')
+
+        def count_indices(pointcloud):
+            return len(pointcloud.get_sample_indices()[0])
+
+        scene, pointcloud = utils.create_pointcloud(filename, return_numbers=[1])
+        self.assertEqual(count_indices(pointcloud), 89)
+
+        scene, pointcloud = utils.create_pointcloud(filename, classifications=[2])
+        self.assertEqual(count_indices(pointcloud), int((classes == 2).sum()))
+
+        low, high = int(intensity.min()), int(intensity.mean())
+        scene, pointcloud = utils.create_pointcloud(filename, intensity_range=[low, high])
+        self.assertEqual(count_indices(pointcloud), int((intensity <= high).sum()))
+
+        # Filters are combined
+        x_mid = float(xyz[:, 0].mean())
+        y_mid = float(xyz[:, 1].mean())
+        bbox = [x_mid, y_mid, x_mid + 10000, y_mid + 10000]
+        expected = (xyz[:, 0] >= x_mid) & (xyz[:, 1] >= y_mid) & (returns == 1)
+        scene, pointcloud = utils.create_pointcloud(filename, bbox=bbox, return_numbers=[1])
+        indices = pointcloud.get_sample_indices()[0]
+        self.assertGreater(len(indices), 0)
+        self.assertEqual(list(indices), list(expected.nonzero()[0]))
+
+        # 3D bbox
+        z_mid = float(xyz[:, 2].mean())
+        bbox = [x_mid, y_mid, z_mid, x_mid + 10000, y_mid + 10000, z_mid + 10000]
+        scene, pointcloud = utils.create_pointcloud(filename, bbox=bbox)
+        expected = (xyz[:, 0] >= x_mid) & (xyz[:, 1] >= y_mid) & (xyz[:, 2] >= z_mid)
+        self.assertEqual(count_indices(pointcloud), int(expected.sum()))
+
+        # Client data only contains matching points
+        display_model = scene._build_display_model()
+        utils.validate_model(display_model)
+        feature = display_model['layers'][0]['features'][0]
+        las_data = base64.b64decode(feature['data'][0])
+        metadata = LASParser().parse(io.BytesIO(las_data))
+        self.assertEqual(metadata.header.legacy_point_count, int(expected.sum()))
+        self.assertGreaterEqual(metadata.header.min_z, z_mid)
+
+        # Bbox outside the data
+        scene, pointcloud = utils.create_pointcloud(filename, bbox=[0, 0, 1, 1])
+        self.assertEqual(count_indices(pointcloud), 0)
+        scene, pointcloud = utils.create_pointcloud(filename, bbox=[0, 0, 1])
+        self.assertRaises(Exception, pointcloud.get_sample_indices)
+
+    @unittest.skipUnless(lasutils.is_numpy_loaded(), 'numpy not installed')
+    def test_las_octree(self):
+        '''Test building octree of point chunks'''
+        filename = os.path.join(utils.data_folder, '100-points.las')
+
+        with tempfile.TemporaryDirectory() as folder:
+            scene, pointcloud = utils.create_pointcloud(filename, octree=True,
+                octree_dir=folder, octree_url='files/octree/', octree_node_points=20)
+            display_model = scene._build_display_model()
+            utils.validate_model(display_model)
+
+            feature = display_model['layers'][0]['features'][0]
+            self.assertEqual(feature['data'], [])
+            self.assertEqual(feature['octree'], {'url': 'files/octree', 'hierarchy': 'hierarchy.json'})
+
+            hierarchy = pointoctree.read_hierarchy(folder)
+            self.assertEqual(sum(node['points'] for node in hierarchy['nodes'].values()), 100)
+
+            # Octree is reused if inputs are unchanged
+            path = os.path.join(folder, pointoctree.HIERARCHY_FILENAME)
+            mtime = os.stat(path).st_mtime_ns
+            pointcloud._build_display_model()
+            self.assertEqual(os.stat(path).st_mtime_ns, mtime)
+
+    @unittest.skipUnless(lasutils.is_numpy_loaded(), 'numpy not installed')
+    def test_las_octree_nodes(self):
+        '''Test distributing points to octree nodes'''
+        filename = os.path.join(utils.data_folder, '100-points.las')
+        reader = LASPointReader(filename)
+
+        with tempfile.TemporaryDirectory() as folder:
+            octree = pointoctree.PointOctree([reader], max_node_points=10, grid_size=4)
+            hierarchy = octree.write(folder)
+            nodes = hierarchy['nodes']
+            self.assertGreater(len(nodes), 1)
+            self.assertEqual(sum(node['points'] for node in nodes.values()), 100)
+
+            # Each point is in exactly one node, inside the node bounds
+            coords = list()
+            for name, node in nodes.items():
+                if name != 'r':
+                    self.assertIn(name[:-1], nodes)  # parent exists
+                for node_file in node['files']:
+                    node_reader = LASPointReader(os.path.join(folder, node_file))
+                    self.assertEqual(len(node_reader), node['points'])
+                    b = node['bounds']
+                    xyz = node_reader.get_xyz()
+                    self.assertTrue((xyz.min(axis=0) >= [b[0], b[2], b[4]]).all())
+                    self.assertTrue((xyz.max(axis=0) <= [b[1], b[3], b[5]]).all())
+                    coords.extend(map(tuple, xyz))
+            self.assertEqual(sorted(coords), sorted(map(tuple, reader.get_xyz())))
+
+            # Points are read once per octree level
+            with mock.patch.object(LASPointReader, 'iter_selected', autospec=True,
+                side_effect=LASPointReader.iter_selected) as iter_selected:
+                levels = set(len(name) for name, bounds, selections in octree.iter_nodes())
+                self.assertEqual(iter_selected.call_count, len(levels))
+
+            # Rewriting the octree replaces the hierarchy, then removes the previous files
+            octree = pointoctree.PointOctree([reader], max_node_points=50, grid_size=4)
+            new_hierarchy = octree.write(folder)
+            self.assertEqual(pointoctree.read_hierarchy(folder), new_hierarchy)
+            new_files = [f for node in new_hierarchy['nodes'].values() for f in node['files']]
+            for node_file in new_files:
+                self.assertTrue(os.path.exists(os.path.join(folder, node_file)))
+            self.assertEqual(len(os.listdir(folder)), 2)  # hierarchy and node folder
+            for node in nodes.values():
+                for node_file in node['files']:
+                    self.assertFalse(os.path.exists(os.path.join(folder, node_file)))
+
+    def test_las_multiple_files(self):
+        '''Test reading headers of multiple files, with header cache'''
+        source = os.path.join(utils.data_folder, '100-points.las')
+
+        with tempfile.TemporaryDirectory() as folder:
+            filenames = list()
+            for name in ['a.las', 'b.las', 'c.las']:
+                filenames.append(os.path.join(folder, name))
+                shutil.copyfile(source, filenames[-1])
+
+            cache_path = os.path.join(folder, 'headers.json')
+            for expected_parses in [3, 0]:
+                with mock.patch.object(LASParser, 'parse', autospec=True,
+                    side_effect=LASParser.parse) as parse:
+                    scene, pointcloud = utils.create_pointcloud(filenames,
+                        max_workers=2, header_cache=cache_path)
+                    self.assertEqual(parse.call_count, expected_parses)
+                self.assertEqual(pointcloud.get_point_count(), 300)
+                self.assertEqual(pointcloud.get_point_count_by_return(), (267, 30, 3, 0, 0))
+                self.assertAlmostEqual(pointcloud.get_bounds()[5], 530.61)
+                self.assertTrue(os.path.exists(cache_path))
+
+            # Modified files are parsed again
+            os.utime(filenames[1], (0, 0))
+            with mock.patch.object(LASParser, 'parse', autospec=True,
+                side_effect=LASParser.parse) as parse:
+                utils.create_pointcloud(filenames, header_cache=cache_path)
+                self.assertEqual(parse.call_count, 1)
+                self.assertEqual(parse.call_args[0][1].name, filenames[1])
+
     def test_las_v14(self):
         '''Test that creating LAS version 1.4 not supported'''
         # Load as data instead of filename
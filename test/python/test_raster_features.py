@@ -1,8 +1,13 @@
+import base64
 import os
+import struct
+import tempfile
 import unittest
+from unittest import mock
 
 from . import utils
-from jupyterlab_geojs import Scene
+from jupyterlab_geojs import Scene, gdalutils, rasterfeature
+from jupyterlab_geojs.rasterpyramid import RasterPyramid
 
 
 class TestRasterFeatures(unittest.TestCase):
@@ -49,5 +54,114 @@ class TestRasterFeatures(unittest.TestCase):
         # Write display model (don't need to validate again)
         utils.write_model(display_model, 'raster-utm_model.json')
 
+    @unittest.skipUnless(gdalutils.is_gdal_loaded(), 'GDAL not installed')
+    def test_tiled_image(self):
+        '''Test creating raster feature as tile pyramid'''
+        filename = os.path.join(utils.data_folder, 'utm.tif')
+
+        scene = Scene()
+        scene.create_layer('osm');
+        feature_layer = scene.create_layer('feature', features=['quad.image'])
+        with self.assertRaises(Exception):
+            feature_layer.create_feature('raster', data=filename, tiled=True)
+
+        with tempfile.TemporaryDirectory() as folder:
+            quad = feature_layer.create_feature('raster', data=filename,
+                tiled=True, tile_size=64, tile_dir=folder, tile_url='files/tiles/')
+
+            # Tiles are not added to the image cache
+            with mock.patch.object(rasterfeature.image_cache, 'put') as put:
+                display_model = scene._build_display_model()
+                self.assertEqual(put.call_count, 0)
+            utils.validate_model(display_model)
+
+            options = display_model['layers'][1]['features'][0]['options']
+            self.assertEqual(options['data'], [])
+            levels = options['tiles']['levels']
+            self.assertGreater(len(levels), 1)
+            self.assertEqual(len(levels[0]['tiles']), 1)
+            self.assertEqual(levels[0]['tiles'][0]['image'], 'files/tiles/0/0_0.png')
+            for tile in levels[-1]['tiles']:
+                path = os.path.join(folder, tile['image'][len('files/tiles/'):])
+                self.assertTrue(os.path.exists(path))
+
+            # Tiles from the same source file are not written again
+            tile_path = os.path.join(folder, '0', '0_0.png')
+            os.utime(tile_path, (0, 0))
+            quad.modified()
+            scene._build_display_model()
+            self.assertEqual(os.stat(tile_path).st_mtime, 0)
+
+    @unittest.skipUnless(gdalutils.is_gdal_loaded(), 'GDAL not installed')
+    def test_max_pixels(self):
+        '''Test downsampling raster image to max number of pixels'''
+        filename = os.path.join(utils.data_folder, 'utm.tif')
+
+        scene = Scene()
+        feature_layer = scene.create_layer('feature', features=['quad.image'])
+        quad = feature_layer.create_feature('raster', data=filename, max_pixels=1000)
+
+        display_model = scene._build_display_model()
+        options = display_model['layers'][0]['features'][0]['options']
+        image_url = options['data'][0]['image']
+        png_bytes = base64.b64decode(image_url.split(',', 1)[1])
+        # Image width & height are in the png IHDR chunk
+        width, height = struct.unpack('>II', png_bytes[16:24])
+        self.assertLessEqual(width * height, 1000)
+
+    @unittest.skipUnless(gdalutils.is_gdal_loaded(), 'GDAL not installed')
+    def test_raster_mosaic(self):
+        '''Test creating one feature from multiple rasters'''
+        pattern = os.path.join(utils.data_folder, '*.tif')
+
+        scene = Scene()
+        scene.create_layer('osm');
+        feature_layer = scene.create_layer('feature', features=['quad.image'])
+        mosaic = feature_layer.create_feature(
+            'raster', data=pattern, max_workers=2, max_pixels=10000)
+        self.assertEqual(len(mosaic.get_rasters()), 2)
+        scene.set_zoom_and_center(corners=mosaic.get_corner_points(as_lonlat=True))
+
+        display_model = scene._build_display_model()
+        utils.validate_model(display_model)
+        options = display_model['layers'][1]['features'][0]['options']
+        self.assertEqual(len(options['data']), 2)
+        for quad_data in options['data']:
+            self.assertTrue(quad_data['image'].startswith('data:image/png;base64,'))
+
+        # Rebuilding uses the same worker thread, so the transforms are reused
+        mosaic = feature_layer.create_feature('raster', data=pattern, max_workers=1)
+        mosaic._build_display_model()
+        misses = gdalutils.spatial_ref_cache.get_stats()['misses']
+        mosaic._build_display_model()
+        self.assertEqual(gdalutils.spatial_ref_cache.get_stats()['misses'], misses)
+
+
+class TestRasterPyramid(unittest.TestCase):
+
+    def test_pyramid_layout(self):
+        '''Test computing tile layout'''
+        pyramid = RasterPyramid(1000, 600, tile_size=256)
+        self.assertEqual(pyramid.get_level_count(), 3)
+        self.assertEqual(pyramid.get_level_size(0), [250, 150])
+        self.assertEqual(pyramid.get_level_size(2), [1000, 600])
+
+        tiles = pyramid.get_tiles(0)
+        self.assertEqual(len(tiles), 1)
+        self.assertEqual(tiles[0].src_win, [0, 0, 1000, 600])
+        self.assertEqual(tiles[0].size, [250, 150])
+
+        tiles = pyramid.get_tiles(2)
+        self.assertEqual(len(tiles), 4 * 3)
+        last = tiles[-1]
+        self.assertEqual((last.col, last.row), (3, 2))
+        self.assertEqual(last.src_win, [768, 512, 232, 88])
+        self.assertEqual(last.size, [232, 88])
+
+        # Small image has one level
+        pyramid = RasterPyramid(100, 50, tile_size=256)
+        self.assertEqual(pyramid.get_level_count(), 1)
+        self.assertEqual(pyramid.get_tiles(0)[0].size, [100, 50])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,47 @@
+import random
+import unittest
+
+from jupyterlab_geojs.spatialindex import SpatialIndex
+
+
+def random_boxes(n, seed=1):
+    rng = random.Random(seed)
+    boxes = list()
+    for i in range(n):
+        x = rng.uniform(-180, 180)
+        y = rng.uniform(-90, 90)
+        boxes.append([x, y, x + rng.uniform(0, 5), y + rng.uniform(0, 5)])
+    return boxes
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+    def test_search(self):
+        '''Test bbox search matches linear scan'''
+        boxes = random_boxes(1000)
+        index = SpatialIndex(boxes, node_size=8)
+        self.assertEqual(len(index), 1000)
+        for bbox in [[-10, -10, 10, 10], [100, 20, 101, 21], [-200, -100, 200, 100], [0, 100, 1, 101]]:
+            expected = [i for i, b in enumerate(boxes) \
+                if b[0] <= bbox[2] and b[2] >= bbox[0] and b[1] <= bbox[3] and b[3] >= bbox[1]]
+            self.assertEqual(sorted(index.search(bbox)), expected)
+
+    def test_nearest(self):
+        '''Test nearest query matches sorted distances'''
+        points = [[b[0], b[1], b[0], b[1]] for b in random_boxes(500, seed=2)]
+        index = SpatialIndex(points)
+        x, y = 12.0, 34.0
+        distances = sorted(((p[0]-x)**2 + (p[1]-y)**2, i) for i, p in enumerate(points))
+        self.assertEqual(index.nearest(x, y, k=5), [i for d,i in distances[:5]])
+        max_distance = distances[2][0] ** 0.5
+        self.assertEqual(len(index.nearest(x, y, k=10, max_distance=max_distance)), 3)
+
+    def test_empty(self):
+        '''Test index with no items'''
+        index = SpatialIndex([])
+        self.assertEqual(index.search([0, 0, 1, 1]), [])
+        self.assertEqual(index.nearest(0, 0), [])
+        self.assertIsNone(index.get_bounds())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+from jupyterlab_geojs import vectortiles
+
+
+class TestVectorTiles(unittest.TestCase):
+
+    def test_tile_coordinates(self):
+        '''Test converting between lon-lat and tile coordinates'''
+        self.assertEqual(vectortiles.lonlat_to_tile(-180.0, 0.0, 1), [0.0, 1.0])
+        bounds = vectortiles.get_tile_bounds(1, 1, 0)
+        self.assertAlmostEqual(bounds[0], 0.0)
+        self.assertAlmostEqual(bounds[1], 0.0)
+        self.assertAlmostEqual(bounds[2], 180.0)
+        self.assertAlmostEqual(bounds[3], vectortiles.MAX_LATITUDE)
+        self.assertEqual(vectortiles.get_tile_range([-10, -10, 10, 10], 2), [1, 1, 2, 2])
+        self.assertEqual(vectortiles.get_tile_range([10, 10, 20, 20], 2), [2, 1, 2, 1])
+
+    def test_max_zoom(self):
+        '''Test limiting zoom levels by the number of tiles spanned'''
+        world = [-180, -vectortiles.MAX_LATITUDE, 180, vectortiles.MAX_LATITUDE]
+        self.assertEqual(vectortiles.get_max_zoom(world, 0, 10, max_tiles=16), 2)
+        self.assertEqual(vectortiles.get_max_zoom([-10, -10, 10, 10], 3, 10, max_tiles=1), 3)
+        self.assertEqual(vectortiles.get_max_zoom([10, 10, 10, 10], 0, 20, max_tiles=1), 20)
+
+    def test_clip_line(self):
+        '''Test clipping line that leaves and reenters bounds'''
+        line = [[-1, 0.5], [0.5, 0.5], [0.5, 2], [0.8, 2], [0.8, 0.2]]
+        pieces = vectortiles.clip_line(line, [0, 0, 1, 1])
+        self.assertEqual(pieces, [[[0.0, 0.5], [0.5, 0.5], [0.5, 1.0]], [[0.8, 1.0], [0.8, 0.2]]])
+
+    def test_clip_polygon(self):
+        '''Test clipping polygon to bounds'''
+        square = {'type': 'Polygon', 'coordinates': [[[-1,-1], [1,-1], [1,1], [-1,1], [-1,-1]]]}
+        clipped = vectortiles.clip_geometry(square, [0, 0, 2, 2])
+        ring = clipped['coordinates'][0]
+        self.assertEqual(ring[0], ring[-1])
+        self.assertEqual({tuple(p) for p in ring}, {(0,0), (1,0), (1,1), (0,1)})
+        self.assertIsNone(vectortiles.clip_geometry(square, [2, 2, 3, 3]))
+
+    def test_tiler(self):
+        '''Test cutting feature collection into tiles'''
+        fc = {
+            'type': 'FeatureCollection',
+            'features': [
+                {'type': 'Feature', 'properties': {'name': 'a'},
+                    'geometry': {'type': 'LineString', 'coordinates': [[-10, 10], [10, 10]]}},
+                {'type': 'Feature', 'properties': {'name': 'b'},
+                    'geometry': {'type': 'Point', 'coordinates': [100, -45]}},
+            ]
+        }
+        tiler = vectortiles.VectorTiler(fc)
+        tiles = list(tiler.get_tiles(0))
+        self.assertEqual(len(tiles), 1)
+        self.assertEqual(len(tiles[0][2]['features']), 2)
+
+        # Line crosses the two tiles in the north, point is in southeast tile
+        tiles = {(x, y): data for x, y, data in tiler.get_tiles(1)}
+        self.assertEqual(sorted(tiles.keys()), [(0, 0), (1, 0), (1, 1)])
+        line = tiles[(0, 0)]['features'][0]['geometry']['coordinates']
+        self.assertEqual(line[0], [-10, 10])
+        self.assertAlmostEqual(line[-1][0], 180.0 / 64)
+        self.assertEqual(tiles[(1, 1)]['features'][0]['properties'], {'name': 'b'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,8 @@ import os
 
 import jsonschema
 
+from jupyterlab_geojs import Scene
+
 source_folder = os.path.abspath(os.path.dirname(__file__))
 root_folder = os.path.join(source_folder, os.pardir, os.pardir)
 
@@ -42,3 +44,14 @@ def write_model(display_model, filename, folder=model_folder):
     with open(path, 'w') as f:
         f.write(model_string)
         print('Wrote {}'.format(path))
+
+
+def create_pointcloud(filename, **kwargs):
+    '''Returns (scene, pointcloud feature) for LAS file(s)
+
+    Creates a new scene for each feature, because a scene only
+    supports one pointcloud feature.
+    '''
+    scene = Scene()
+    feature_layer = scene.create_layer('feature')
+    return scene, feature_layer.create_feature('pointcloud', data=filename, **kwargs)